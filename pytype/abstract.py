@@ -15,6 +15,8 @@ import logging
 from pytype import compat
 from pytype import datatypes
 from pytype import function
+from pytype import load_pytd
+from pytype import summary_cache
 from pytype import utils
 from pytype.pyc import loadmarshal
 from pytype.pyc import opcodes
@@ -170,6 +172,92 @@ def get_signatures(func):
     raise NotImplementedError(func.__class__.__name__)
 
 
+# Opcodes that give a call effects beyond its return value and errors, or make
+# its return value depend on more than its arguments and the globals it reads.
+_UNSUMMARIZABLE_OPCODES = (
+    opcodes.STORE_ATTR, opcodes.DELETE_ATTR, opcodes.STORE_GLOBAL,
+    opcodes.DELETE_GLOBAL, opcodes.STORE_SUBSCR, opcodes.DELETE_SUBSCR,
+    opcodes.STORE_SLICE_0, opcodes.STORE_SLICE_1, opcodes.STORE_SLICE_2,
+    opcodes.STORE_SLICE_3, opcodes.DELETE_SLICE_0, opcodes.DELETE_SLICE_1,
+    opcodes.DELETE_SLICE_2, opcodes.DELETE_SLICE_3, opcodes.STORE_NAME,
+    opcodes.DELETE_NAME, opcodes.STORE_DEREF, opcodes.DELETE_DEREF,
+    opcodes.LOAD_CLOSURE, opcodes.MAKE_FUNCTION, opcodes.MAKE_CLOSURE,
+    opcodes.LOAD_BUILD_CLASS, opcodes.BUILD_CLASS, opcodes.IMPORT_NAME,
+    opcodes.IMPORT_STAR, opcodes.YIELD_VALUE, opcodes.YIELD_FROM,
+    opcodes.EXEC_STMT)
+
+# Types that a summary would turn into plain instances, losing the members
+# that the original values had.
+_UNSUMMARIZABLE_TYPES = frozenset([
+    "__builtin__.function", "__builtin__.module", "__builtin__.type",
+    "typing.Callable"])
+
+
+class _CollectTypeNames(visitors.Visitor):
+  """Collect the names of the classes that a pytd type refers to."""
+
+  def __init__(self):
+    super(_CollectTypeNames, self).__init__()
+    self.names = set()
+    self.has_type_parameters = False
+
+  def EnterNamedType(self, t):
+    self.names.add(t.name)
+
+  def EnterClassType(self, t):
+    self.names.add(t.name)
+
+  def EnterTypeParameter(self, _):
+    self.has_type_parameters = True
+
+
+def _get_summary_type(t):
+  """Check whether a pytd type can be part of a function summary.
+
+  Summaries can only refer to types that mean the same in any module and run,
+  so types defined in the module under analysis, unknowns and type parameters
+  aren't allowed.
+
+  Args:
+    t: A pytd type.
+  Returns:
+    t, or None if it can't be part of a summary.
+  """
+  collector = _CollectTypeNames()
+  t.Visit(collector)
+  if collector.has_type_parameters or any(
+      "." not in name or name.startswith("~") or name in _UNSUMMARIZABLE_TYPES
+      for name in collector.names):
+    return None
+  return t
+
+
+def _get_summary_modules(t):
+  """Get the names of the modules that the classes in a pytd type may be from.
+
+  Args:
+    t: A pytd type.
+  Returns:
+    A set of module names: every dotted prefix of the names of the classes, so
+    that the modules of nested classes are in it, too.
+  """
+  collector = _CollectTypeNames()
+  t.Visit(collector)
+  modules = set()
+  for name in collector.names:
+    parts = name.split(".")
+    modules.update(".".join(parts[:i]) for i in range(1, len(parts)))
+  return modules
+
+
+def _get_summary_variable_type(node, var):
+  """Get the type of a variable for a function summary, or None."""
+  if not var.bindings:
+    return None
+  return _get_summary_type(
+      pytd_utils.JoinTypes(v.to_type(node) for v in var.data))
+
+
 def func_name_is_class_init(name):
   """Return True if |name| is that of a class' __init__ method."""
   # Python 3's MAKE_FUNCTION byte code takes an explicit fully qualified
@@ -3186,6 +3274,10 @@ class InterpreterFunction(SignedFunction):
 
   _function_cache = {}
 
+  # The classes whose instances _get_value_type_key describes by their types
+  # and contents rather than by identity.
+  _TYPE_KEYED_CLASSES = (Instance, List, Tuple, Dict, AbstractOrConcreteValue)
+
   @staticmethod
   def make_function(name, code, f_locals, f_globals, defaults, kw_defaults,
                     closure, annotations, late_annotations, vm):
@@ -3228,6 +3320,11 @@ class InterpreterFunction(SignedFunction):
           closure, annotations, late_annotations, vm)
     return InterpreterFunction._function_cache[key]
 
+  @staticmethod
+  def clear_function_cache():
+    """Forget the functions created by all VMs so far."""
+    InterpreterFunction._function_cache.clear()
+
   @staticmethod
   def get_arg_count(code):
     """Return the arg count given a code object."""
@@ -3250,6 +3347,7 @@ class InterpreterFunction(SignedFunction):
     self.kw_defaults = kw_defaults
     self.closure = closure
     self._call_cache = {}
+    self._type_call_cache = {}
     self._call_records = []
     self.nonstararg_count = self.code.co_argcount
     if self.code.co_kwonlyargcount >= 0:  # This is usually -1 or 0 (fast call)
@@ -3258,6 +3356,7 @@ class InterpreterFunction(SignedFunction):
     super(InterpreterFunction, self).__init__(signature, vm)
     self.last_frame = None  # for BuildClass
     self._store_call_records = False
+    self._summarizable = None  # computed by _can_summarize()
     if self.vm.PY3:
       self.is_class_builder = False  # Will be set by BuildClass.
     else:
@@ -3337,11 +3436,227 @@ class InterpreterFunction(SignedFunction):
         InterpreterFunction._hash(*args)
         for args in hash_args)).digest()
 
+  @classmethod
+  def _get_value_type_key(cls, value, path=()):
+    """Build a key that values of the same type and contents share.
+
+    Unlike get_type_key, the key also covers the members and constant contents
+    of a value, so values with the same key behave the same as arguments.
+    Values other than plain instances and containers are their own keys.
+
+    Arguments:
+      value: An AtomicAbstractValue.
+      path: The ids of the values whose keys are being built.
+
+    Returns:
+      A hashable key.
+    """
+    if type(value) not in cls._TYPE_KEYED_CLASSES:
+      return value
+    if id(value) in path:
+      return ("recursion", path.index(id(value)))
+    path += (id(value),)
+    def get_var_key(var):
+      return frozenset(cls._get_value_type_key(v, path) for v in var.data)
+    key = [frozenset(value.cls.data) if value.cls else None,
+           value.maybe_missing_members,
+           frozenset((name, get_var_key(var))
+                     for name, var in value.type_parameters.items()),
+           frozenset((name, get_var_key(var))
+                     for name, var in value.members.items())]
+    if isinstance(value, (List, Tuple)):
+      key.append(tuple(get_var_key(var) for var in value.pyval))
+    elif isinstance(value, Dict):
+      key.append(frozenset((name, get_var_key(var))
+                           for name, var in value.pyval.items()))
+    elif isinstance(value, PythonConstant):
+      try:
+        hash(value.pyval)
+      except TypeError:
+        return value
+      key.append(value.pyval)
+    key.append(getattr(value, "could_contain_anything", None))
+    return tuple(key)
+
+  def _get_reachable_mutable_ids(self, values):
+    """Get the ids of the mutable instances reachable from values.
+
+    Shared instances of primitive classes and constants don't count, since
+    any code may hold them.
+
+    Arguments:
+      values: A sequence of AtomicAbstractValue.
+
+    Returns:
+      A set of ids.
+    """
+    primitive_ids = {id(v) for v in
+                     self.vm.convert.primitive_class_instances.values()}
+    seen_ids = set()
+    mutable_ids = set()
+    stack = list(values)
+    while stack:
+      data = stack.pop()
+      if id(data) in seen_ids:
+        continue
+      seen_ids.add(id(data))
+      if (type(data) in (Instance, List, Dict) and
+          id(data) not in primitive_ids):
+        mutable_ids.add(id(data))
+      for mapping in data.get_children_maps():
+        stack.extend(mapping.data)
+    return mutable_ids
+
+  def _get_args_type_key(self, callargs):
+    return frozenset(
+        (name, frozenset(self._get_value_type_key(v) for v in var.data))
+        for name, var in callargs.items())
+
+  def _get_type_callkey(self, callargs, frame):
+    """Get the key of a call in the type-keyed call cache."""
+    return (self._get_args_type_key(callargs),
+            self._hash_all(
+                (frame.f_globals.members, set(self.code.co_names)),
+                (frame.f_locals.members,
+                 set(frame.f_locals.members) - set(self.code.co_varnames))))
+
+  def _is_reusable_by_type(self, callargs, type_callkey, args_hash, ret):
+    """Whether a call's result can be reused for arguments of the same types.
+
+    Arguments:
+      callargs: The arguments of the call, a dict of name to variable.
+      type_callkey: The key that _get_type_callkey returned before the call.
+      args_hash: The hash of callargs from before the call.
+      ret: The return value.
+
+    Returns:
+      False if the call changed its arguments or returned a mutable instance,
+      else True.
+    """
+    # The hash covers everything reachable from the arguments, and the type
+    # key covers the classes of the arguments, e.g. assignments to __class__.
+    if (self._hash(callargs, None) != args_hash or
+        self._get_args_type_key(callargs) != type_callkey[0]):
+      return False
+    # Reusing the result shares its values with the caller, so a mutable
+    # instance, whether it's a part of an argument or was created by the call,
+    # would be changed by one caller under the others' feet.
+    return not self._get_reachable_mutable_ids(ret.data)
+
   def _match_args(self, node, args):
     if not self.signature.has_param_annotations:
       return
     return super(InterpreterFunction, self)._match_args(node, args)
 
+  def _can_summarize(self):
+    """Whether calls of this function can be replaced by summaries."""
+    if self._summarizable is None:
+      code = self.code
+      self._summarizable = not (
+          code.co_freevars or code.co_cellvars or
+          code.co_flags & (loadmarshal.CodeType.CO_GENERATOR |
+                           loadmarshal.CodeType.CO_COROUTINE |
+                           loadmarshal.CodeType.CO_ITERABLE_COROUTINE |
+                           loadmarshal.CodeType.CO_ASYNC_GENERATOR) or
+          any(isinstance(op, _UNSUMMARIZABLE_OPCODES) for op in code.co_code))
+    return self._summarizable
+
+  def _get_summary_key(self, node, callargs):
+    """Get the key of a call in the summary cache, or None.
+
+    Args:
+      node: The current CFG node.
+      callargs: The arguments of the call, a dict of name to variable.
+    Returns:
+      The key, or None if the call can't be summarized.
+    """
+    cache = self.vm.summary_cache
+    if not cache or self._store_call_records or not self._can_summarize():
+      return None
+    code = self.code
+    parts = [repr(code.co_filename), code.co_name, repr(code.co_varnames),
+             repr(code.co_names), repr(code.co_consts)]
+    parts.extend(str(op) for op in code.co_code)
+    parts.append("depth %d" % self.vm.remaining_depth())
+    # The modules whose contents the call may depend on.
+    modules = set()
+    for name, annot in sorted(self.signature.annotations.items()):
+      t = _get_summary_type(annot.get_instance_type(node))
+      if t is None:
+        return None
+      parts.append("annotation %s: %s" % (name, pytd_utils.Print(t)))
+      modules |= _get_summary_modules(t)
+    for name, var in sorted(callargs.items()):
+      t = _get_summary_variable_type(node, var)
+      if t is None:
+        return None
+      parts.append("arg %s: %s" % (name, pytd_utils.Print(t)))
+      modules |= _get_summary_modules(t)
+    for name in sorted(set(code.co_names) & set(self.f_globals.members)):
+      var = self.f_globals.members[name]
+      if var.bindings and all(isinstance(v, Module) for v in var.data):
+        module_names = sorted(v.name for v in var.data)
+        parts.append("global %s: module %s" % (name, ", ".join(module_names)))
+        modules.update(module_names)
+        # Attributes of the module can be its submodules.
+        modules.update(
+            loaded for loaded in self.vm.loader.get_module_names()
+            if any(loaded.startswith(m + ".") for m in module_names))
+        continue
+      t = _get_summary_variable_type(node, var)
+      if t is None:
+        return None
+      parts.append("global %s: %s" % (name, pytd_utils.Print(t)))
+      modules |= _get_summary_modules(t)
+    # The stubs that ship with pytype are covered by its version, which is
+    # part of every key, but other .pyi files can change between runs.
+    for name, (_, source_hash) in sorted(
+        self.vm.loader.get_dependency_hashes(modules).items()):
+      parts.append("module %s: %s" % (name, source_hash))
+    return cache.get_key(self.vm.python_version, parts)
+
+  def _summary_to_variable(self, node, summary):
+    """Make the return value of a call from its summary, or return None."""
+    ast = pytd_utils.CreateModule("<summary>", constants=(
+        pytd.Constant("return", summary.return_type),))
+    try:
+      ast = self.vm.loader.resolve_ast(ast)
+    except load_pytd.BadDependencyError as e:
+      log.info("Not using summary of %r: %s", self.name, e)
+      return None
+    return_type = ast.Lookup("return").type
+    return self.vm.convert.constant_to_var(
+        AsReturnValue(return_type), {}, node)
+
+  def _summarize(self, node, callargs, ret, key, errors):
+    """Store the summary of a call.
+
+    Args:
+      node: The CFG node after the call.
+      callargs: The arguments of the call, a dict of name to variable.
+      ret: The return value.
+      key: The key that _get_summary_key returned before the call.
+      errors: The errors that the call logged.
+    Returns:
+      The return value made from the summary, so that the result is the same
+      whether or not the summary was in the cache already. If the call can't
+      be summarized, ret.
+    """
+    # If the types of the arguments or globals changed, the call had effects
+    # that a summary can't replay.
+    if self._get_summary_key(node, callargs) != key:
+      return ret
+    return_type = _get_summary_variable_type(node, ret)
+    if return_type is None:
+      return ret
+    summary = summary_cache.Summary(
+        return_type.Visit(visitors.ClearClassPointers()), errors)
+    summarized_ret = self._summary_to_variable(node, summary)
+    if summarized_ret is None:
+      return ret
+    self.vm.summary_cache.put(key, summary)
+    return summarized_ret
+
   def call(self, node, func, args, new_locals=None):
     if self.vm.is_at_maximum_depth() and not func_name_is_class_init(self.name):
       log.info("Maximum depth reached. Not analyzing %r", self.name)
@@ -3391,8 +3706,20 @@ class InterpreterFunction(SignedFunction):
       # Make the callkey the number of times this function has been called so
       # that no call has the same key as a previous one.
       callkey = len(self._call_cache)
+    if self.vm.options.skip_repeat_calls and self.vm.options.type_keyed_calls:
+      # Also look for calls with other instances of the same types.
+      type_callkey = self._get_type_callkey(callargs, frame)
+      args_hash = self._hash(callargs, None)
+    else:
+      type_callkey = None
     if callkey in self._call_cache:
-      old_ret, old_remaining_depth = self._call_cache[callkey]
+      cached, keyed_by_type = self._call_cache[callkey], False
+    elif type_callkey in self._type_call_cache:
+      cached, keyed_by_type = self._type_call_cache[type_callkey], True
+    else:
+      cached = None
+    if cached:
+      old_ret, old_remaining_depth = cached
       # Optimization: This function has already been called, with the same
       # environment and arguments, so recycle the old return value.
       # We would want to skip this optimization and reanalyze the call if we can
@@ -3406,11 +3733,27 @@ class InterpreterFunction(SignedFunction):
                  "remaining_depth = %d, old_remaining_depth = %d",
                  self.name, self.vm.remaining_depth(), old_remaining_depth)
       else:
-        ret = old_ret.AssignToNewVariable(node)
+        if keyed_by_type:
+          # The old bindings depend on the bindings of other arguments, so
+          # only reuse the values.
+          ret = self.vm.program.NewVariable(old_ret.data, [], node)
+        else:
+          ret = old_ret.AssignToNewVariable(node)
         if self._store_call_records:
           # Even if the call is cached, we might not have been recording it.
           self._call_records.append((callargs, ret, node))
         return node, ret
+    summary_key = self._get_summary_key(node, callargs)
+    if summary_key:
+      summary = self.vm.summary_cache.get(summary_key)
+      if summary:
+        ret = self._summary_to_variable(node, summary)
+        if ret is not None:
+          log.info("Using summary of %r", self.name)
+          self.vm.errorlog.merge(summary.errors)
+          self._call_cache[callkey] = ret, self.vm.remaining_depth()
+          return node, ret
+      num_errors = len(self.vm.errorlog)
     if self.code.co_flags & loadmarshal.CodeType.CO_GENERATOR:
       generator = Generator(frame, self.vm)
       # Run the generator right now, even though the program didn't call it,
@@ -3419,6 +3762,12 @@ class InterpreterFunction(SignedFunction):
       node_after_call, ret = node2, generator.to_variable(node2)
     else:
       node_after_call, ret = self.vm.run_frame(frame, node)
+      if summary_key:
+        ret = self._summarize(node_after_call, callargs, ret, summary_key,
+                              self.vm.errorlog[num_errors:])
+      if type_callkey and self._is_reusable_by_type(
+          callargs, type_callkey, args_hash, ret):
+        self._type_call_cache[type_callkey] = ret, self.vm.remaining_depth()
     self._call_cache[callkey] = ret, self.vm.remaining_depth()
     if self._store_call_records or self.vm.store_all_calls:
       self._call_records.append((callargs, ret, node_after_call))
@@ -0,0 +1,150 @@
+"""Profile the cost of analyzing each function of the input.
+
+--profile profiles pytype's own functions. This profiler instead charges the
+work of the VM to the functions of the analyzed program: for every function,
+it sums up the frames the VM ran for it, the wall time and opcodes those
+frames took, and the bindings and solver queries of the typegraph they caused.
+Costs are inclusive, i.e., counting the frames of the functions a function
+calls, and exclusive, i.e., counting only its own frames.
+"""
+
+import collections
+import time
+
+
+# The costs that the profiler measures, in the order of FunctionStats.
+COSTS = ("time", "opcodes", "bindings", "solver queries")
+_COST_FORMATS = ("%.6f", "%d", "%d", "%d")
+
+
+def get_label(code):
+  """Get the name under which the frames of a code object are profiled."""
+  return "%s (%s:%d)" % (code.co_name, code.co_filename, code.co_firstlineno)
+
+
+class FunctionStats(object):
+  """The costs of a function, summed over its frames.
+
+  Attributes:
+    label: The name of the function, see get_label.
+    frames: The number of frames the VM ran for the function.
+    inclusive: The inclusive costs, a list in the order of COSTS.
+    exclusive: The exclusive costs, a list in the order of COSTS.
+  """
+
+  def __init__(self, label):
+    self.label = label
+    self.frames = 0
+    self.inclusive = [0] * len(COSTS)
+    self.exclusive = [0] * len(COSTS)
+
+
+class _Entry(object):
+  """A function on the profiler's stack."""
+
+  def __init__(self, label, start):
+    self.label = label
+    self.start = start
+    self.children = [0] * len(COSTS)
+
+
+class AnalysisProfiler(object):
+  """Collects the costs of the frames that the VM runs.
+
+  Attributes:
+    stats: A map from labels to FunctionStats.
+  """
+
+  def __init__(self, program, clock=time.time):
+    """Initialize.
+
+    Args:
+      program: The cfg.Program that the VM builds, for counting bindings and
+        solver queries.
+      clock: A function returning the current time in seconds.
+    """
+    self._program = program
+    self._clock = clock
+    self._opcodes = 0
+    self._stack = []
+    # Map from tuples of labels, starting at the outermost function, to the
+    # exclusive time of the innermost one.
+    self._folded = collections.defaultdict(float)
+    self.stats = {}
+
+  def _get_costs(self):
+    return (self._clock(), self._opcodes, self._program.binding_count,
+            self._program.solver_query_count)
+
+  def enter(self, label):
+    """Start charging costs to the function with the given label."""
+    self._stack.append(_Entry(label, self._get_costs()))
+
+  def exit(self, opcodes=0, frame=True):
+    """Stop charging costs to the innermost function.
+
+    Args:
+      opcodes: The number of opcodes that the function ran itself.
+      frame: Whether the costs were those of a frame, or of preparing one.
+    """
+    self._opcodes += opcodes
+    entry = self._stack.pop()
+    inclusive = [end - start
+                 for end, start in zip(self._get_costs(), entry.start)]
+    exclusive = [cost - child for cost, child in zip(inclusive, entry.children)]
+    if self._stack:
+      parent = self._stack[-1]
+      parent.children = [cost + child
+                         for cost, child in zip(inclusive, parent.children)]
+    if entry.label not in self.stats:
+      self.stats[entry.label] = FunctionStats(entry.label)
+    stats = self.stats[entry.label]
+    if frame:
+      stats.frames += 1
+    # The inclusive costs of a recursive call are part of those of the
+    # outermost call already.
+    if all(e.label != entry.label for e in self._stack):
+      stats.inclusive = [a + b for a, b in zip(stats.inclusive, inclusive)]
+    stats.exclusive = [a + b for a, b in zip(stats.exclusive, exclusive)]
+    path = tuple(e.label for e in self._stack) + (entry.label,)
+    self._folded[path] += exclusive[0]
+
+  def get_report(self):
+    """Get the costs of all functions, by decreasing inclusive time."""
+    header = ["frames"]
+    for cost in COSTS:
+      header.extend(["%s (incl)" % cost, "%s (excl)" % cost])
+    lines = ["\t".join(header + ["function"])]
+    for stats in sorted(self.stats.values(),
+                        key=lambda s: (-s.inclusive[0], s.label)):
+      row = [str(stats.frames)]
+      for fmt, inclusive, exclusive in zip(
+          _COST_FORMATS, stats.inclusive, stats.exclusive):
+        row.extend([fmt % inclusive, fmt % exclusive])
+      lines.append("\t".join(row + [stats.label]))
+    return "\n".join(lines) + "\n"
+
+  def get_folded_stacks(self):
+    """Get the exclusive times of all stacks in the folded-stack format.
+
+    Each line holds the labels of a stack, separated by semicolons, and the
+    time in microseconds, which flame graph tools take as the sample count.
+
+    Returns:
+      A string.
+    """
+    lines = []
+    for path, seconds in sorted(self._folded.items()):
+      microseconds = int(round(seconds * 1e6))
+      if microseconds > 0:
+        lines.append("%s %d" % (";".join(path), microseconds))
+    return "".join(line + "\n" for line in lines)
+
+  def write(self, report_filename, folded_filename):
+    """Write the report and the folded stacks, if given filenames."""
+    if report_filename:
+      with open(report_filename, "w") as fi:
+        fi.write(self.get_report())
+    if folded_filename:
+      with open(folded_filename, "w") as fi:
+        fi.write(self.get_folded_stacks())
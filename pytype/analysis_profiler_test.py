@@ -0,0 +1,110 @@
+"""Tests for analysis_profiler.py."""
+
+from pytype import analysis_profiler
+from pytype.typegraph import cfg
+
+import unittest
+
+
+class FakeClock(object):
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+class AnalysisProfilerTest(unittest.TestCase):
+  """Tests for AnalysisProfiler."""
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.program = cfg.Program()
+    self.node = self.program.NewCFGNode("root")
+    self.profiler = analysis_profiler.AnalysisProfiler(
+        self.program, clock=self.clock)
+
+  def _add_bindings(self, n):
+    v = self.program.NewVariable()
+    for i in range(n):
+      v.AddBinding(i, [], self.node)
+
+  def test_nested(self):
+    self.profiler.enter("f")
+    self.clock.now = 1
+    self._add_bindings(2)
+    self.profiler.enter("g")
+    self.clock.now = 3
+    self._add_bindings(1)
+    self.profiler.exit(opcodes=5)
+    self.clock.now = 4
+    self.profiler.exit(opcodes=10)
+    f = self.profiler.stats["f"]
+    g = self.profiler.stats["g"]
+    self.assertEqual(f.frames, 1)
+    self.assertEqual(f.inclusive, [4, 15, 3, 0])
+    self.assertEqual(f.exclusive, [2, 10, 2, 0])
+    self.assertEqual(g.inclusive, [2, 5, 1, 0])
+    self.assertEqual(g.exclusive, [2, 5, 1, 0])
+
+  def test_solver_queries(self):
+    self.profiler.enter("f")
+    v = self.program.NewVariable()
+    b = v.AddBinding(1, [], self.node)
+    b.IsVisible(self.node)
+    self.profiler.exit()
+    self.assertEqual(self.profiler.stats["f"].inclusive[3], 1)
+
+  def test_recursion(self):
+    self.profiler.enter("f")
+    self.profiler.enter("f")
+    self.clock.now = 1
+    self.profiler.exit()
+    self.clock.now = 3
+    self.profiler.exit()
+    f = self.profiler.stats["f"]
+    self.assertEqual(f.frames, 2)
+    self.assertEqual(f.inclusive[0], 3)
+    self.assertEqual(f.exclusive[0], 3)
+
+  def test_not_a_frame(self):
+    self.profiler.enter("f")
+    self.profiler.enter("f")
+    self.clock.now = 1
+    self.profiler.exit(opcodes=2)
+    self.clock.now = 2
+    self.profiler.exit(frame=False)
+    f = self.profiler.stats["f"]
+    self.assertEqual(f.frames, 1)
+    self.assertEqual(f.inclusive[:2], [2, 2])
+    self.assertEqual(f.exclusive[:2], [2, 2])
+
+  def test_report(self):
+    for label, seconds in (("f", 1), ("g", 2)):
+      self.profiler.enter(label)
+      self.clock.now += seconds
+      self.profiler.exit(opcodes=1)
+    header, g, f = self.profiler.get_report().splitlines()
+    self.assertEqual(header.split("\t")[:3],
+                     ["frames", "time (incl)", "time (excl)"])
+    self.assertEqual(g.split("\t"),
+                     ["1", "2.000000", "2.000000", "1", "1", "0", "0", "0",
+                      "0", "g"])
+    self.assertEqual(f.split("\t")[-1], "f")
+
+  def test_folded_stacks(self):
+    self.profiler.enter("f")
+    self.clock.now = 0.5
+    self.profiler.enter("g")
+    self.clock.now = 0.75
+    self.profiler.exit()
+    self.profiler.enter("g")
+    self.profiler.exit()
+    self.profiler.exit()
+    self.assertMultiLineEqual(self.profiler.get_folded_stacks(),
+                              "f 500000\nf;g 250000\n")
+
+
+if __name__ == "__main__":
+  unittest.main()
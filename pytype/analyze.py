@@ -2,9 +2,12 @@
 
 import collections
 import logging
+import multiprocessing
+import re
 import subprocess
 
 from pytype import abstract
+from pytype import analysis_profiler
 from pytype import convert_structural
 from pytype import debug
 from pytype import function
@@ -37,6 +40,12 @@ QUICK_INFER_MAXIMUM_DEPTH = 1  # during quick inference
 _INITIALIZING = object()
 
 
+# What a worker process reports about the definitions it analyzed. See
+# CallTracer.analyze_part.
+WorkerResult = collections.namedtuple(
+    "WorkerResult", ["errors", "modules", "types", "unknowns"])
+
+
 class CallTracer(vm.VirtualMachine):
   """Virtual machine that records all function calls.
 
@@ -63,6 +72,9 @@ class CallTracer(vm.VirtualMachine):
     self._analyzed_functions = set()
     self._analyzed_classes = set()
     self._generated_classes = {}
+    # Set by _analyze_in_workers if compute_types() should use the workers'
+    # results.
+    self._worker_results = None
     self.exitpoint = None
 
   def create_varargs(self, node):
@@ -151,11 +163,37 @@ class CallTracer(vm.VirtualMachine):
           method.signature.has_return_annotation and
           fname not in self._CONSTRUCTORS):
         log.info("%r has return annotation, not analyzing further.", fname)
+      elif self.frames:
+        node = self._analyze_method(node, val)
+      elif self.budget.module_exhausted():
+        log.info("Analysis budget exhausted, not analyzing %r.", fname)
+        self._report_truncated(method, skipped=True)
       else:
-        node, args = self.create_method_arguments(node, method)
-        node, _ = self.call_function_with_args(node, val, args)
+        # Top-level functions and methods each get their own budget.
+        self.budget.start_function()
+        cut_calls = self.budget.cut_calls
+        node = self._analyze_method(node, val)
+        self.budget.end_function()
+        if self.budget.cut_calls > cut_calls:
+          self._report_truncated(method, skipped=False)
+    return node
+
+  def _analyze_method(self, node, val):
+    """Call a method with made-up arguments, charging the profiler for it."""
+    if self.profiler:
+      self.profiler.enter(analysis_profiler.get_label(
+          val.data.get_first_opcode().code))
+    node, args = self.create_method_arguments(node, val.data)
+    node, _ = self.call_function_with_args(node, val, args)
+    if self.profiler:
+      self.profiler.exit(frame=False)
     return node
 
+  def _report_truncated(self, method, skipped):
+    code = method.get_first_opcode().code
+    self.errorlog.analysis_truncated(
+        code.co_filename, code.co_firstlineno, method.name, skipped)
+
   def _call_with_fake_args(self, node0, funcv):
     """Attempt to call the given function with made-up arguments."""
     # TODO(tsudol): If expand this beyond __init__, need to handle
@@ -389,13 +427,126 @@ class CallTracer(vm.VirtualMachine):
           node = self.analyze_class(node, value)
     return node
 
-  def analyze(self, node, defs, maximum_depth):
+  def analyze(self, node, defs, maximum_depth, jobs=1, compute_types=False):
+    """Analyze the top-level definitions.
+
+    Args:
+      node: The CFG node at the end of the module-level code.
+      defs: The top-level definitions, a dict of name to variable.
+      maximum_depth: How deep to follow call chains.
+      jobs: The number of processes to analyze the definitions in.
+      compute_types: Whether compute_types() will be called. With jobs > 1,
+        the workers then report the types of the definitions they analyzed.
+    Returns:
+      The CFG node at the end of the analysis.
+    """
     assert not self.frame
     self.maximum_depth = maximum_depth
     self._analyzing = True
     node = node.ConnectNew(name="Analyze")
+    if jobs > 1 and len(defs) > 1:
+      return self._analyze_in_workers(node, defs, jobs, compute_types)
     return self.analyze_toplevel(node, defs)
 
+  def _analyze_in_workers(self, node, defs, jobs, compute_types):
+    """Split the definitions between forked worker processes.
+
+    The workers start out with a copy of this VM, so the module-level code
+    doesn't run again. Each one analyzes a share of the definitions, and we
+    merge what they report in the order of the shares, which doesn't depend on
+    which worker finishes first.
+
+    Args:
+      node: The CFG node to start the analysis at.
+      defs: The top-level definitions, a dict of name to variable.
+      jobs: The number of worker processes.
+      compute_types: Whether the workers should report types.
+    Returns:
+      The CFG node to compute types at. Since the analysis happened in other
+      processes, this is the node we started at.
+    """
+    global _worker_state
+    parts = min(jobs, len(defs))
+    _worker_state = (self, node, defs, parts, compute_types)
+    # A worker only analyzes one share, since it has to start from the state
+    # after the module-level code.
+    pool = multiprocessing.Pool(parts, maxtasksperchild=1)
+    try:
+      results = pool.map(_analyze_part, range(parts), chunksize=1)
+    finally:
+      pool.close()
+      pool.join()
+      _worker_state = None
+    # The workers may have loaded modules that the types they report refer to.
+    loaded = set(self.loader.get_module_names())
+    for result in results:
+      self.errorlog.merge(result.errors)
+      for module_name in result.modules:
+        if module_name not in loaded:
+          self.loader.import_name(module_name)
+          loaded.add(module_name)
+    if compute_types:
+      self._worker_results = results
+    return node
+
+  def _mark_analyzed_elsewhere(self, name, var):
+    """Record what analyze_toplevel would analyze for a definition."""
+    if name in self._builtin_map:
+      return
+    for value in var.data:
+      if isinstance(value, abstract.InterpreterClass):
+        self._analyzed_classes.add(value)
+        for member in value.members.values():
+          for method in member.data:
+            if isinstance(method, abstract.InterpreterFunction):
+              self._analyzed_functions.add(method.get_first_opcode())
+      elif (isinstance(value, abstract.InterpreterFunction) and
+            not value.is_attribute_of_class):
+        self._analyzed_functions.add(value.get_first_opcode())
+
+  def analyze_part(self, node, defs, part, parts, compute_types):
+    """Analyze a share of the top-level definitions, in a worker process.
+
+    Besides the sorted definitions, the share contains the functions and
+    classes that aren't top-level definitions, like decorated ones, that were
+    created by the module-level code. The ones created during the analysis
+    are analyzed by the worker that created them. The definitions in the other
+    shares count as analyzed, so that they aren't analyzed a second time as
+    hidden functions or classes.
+
+    Args:
+      node: The CFG node to start the analysis at.
+      defs: All top-level definitions.
+      part: The index of the share, from 0 to parts - 1.
+      parts: The number of shares.
+      compute_types: Whether to report types.
+    Returns:
+      A WorkerResult.
+    """
+    num_errors = len(self.errorlog)
+    first_unknown = abstract.Unknown._current_id  # pylint: disable=protected-access
+    names = sorted(defs)[part::parts]
+    for name in set(defs) - set(names):
+      self._mark_analyzed_elsewhere(name, defs[name])
+    self._interpreter_functions = self._interpreter_functions[part::parts]
+    self._interpreter_classes = self._interpreter_classes[part::parts]
+    self.exitpoint = self.analyze_toplevel(
+        node, {name: defs[name] for name in names})
+    if compute_types:
+      # The class pointers would be pickled along with the types, and the other
+      # workers number their unknowns the same way.
+      def prepare(node):
+        return node.Visit(visitors.ClearClassPointers()).Visit(
+            _RenameNewUnknowns(first_unknown, part))
+      types = {name: [prepare(d) for d in self.pytd_for_name(name, defs[name])]
+               for name in names}
+      unknowns = prepare(self.pytd_for_unknowns())
+    else:
+      types = unknowns = None
+    return WorkerResult(errors=self.errorlog[num_errors:],
+                        modules=self.loader.get_module_names(),
+                        types=types, unknowns=unknowns)
+
   def trace_module_member(self, module, name, member):
     if module is None or isinstance(module, typing.TypingOverlay):
       # TypingOverlay takes precedence over typing.pytd.
@@ -451,37 +602,43 @@ class CallTracer(vm.VirtualMachine):
   def pytd_for_types(self, defs):
     data = []
     for name, var in defs.items():
-      if name in output.TOP_LEVEL_IGNORE or self._is_builtin(name, var.data):
-        continue
-      options = var.FilteredData(self.exitpoint)
-      if (len(options) > 1 and not
-          all(isinstance(o, (abstract.Function, abstract.BoundFunction))
-              for o in options)):
-        # It's ambiguous whether this is a type, a function or something
-        # else, so encode it as a constant.
-        combined_types = pytd_utils.JoinTypes(t.to_type(self.exitpoint)
-                                              for t in options)
-        data.append(pytd.Constant(name, combined_types))
-      elif options:
-        for option in options:
-          try:
-            d = option.to_pytd_def(self.exitpoint, name)  # Deep definition
-          except NotImplementedError:
-            d = option.to_type(self.exitpoint)  # Type only
-            if isinstance(d, pytd.NothingType):
-              if isinstance(option, abstract.Empty):
-                d = pytd.AnythingType()
-              else:
-                assert isinstance(option, typing.NoReturn)
-          if isinstance(d, pytd.TYPE) and not isinstance(d, pytd.TypeParameter):
-            data.append(pytd.Constant(name, d))
-          else:
-            data.append(d)
-      else:
-        log.error("No visible options for %s", name)
-        data.append(pytd.Constant(name, pytd.AnythingType()))
+      data.extend(self.pytd_for_name(name, var))
     return pytd_utils.WrapTypeDeclUnit("inferred", data)
 
+  def pytd_for_name(self, name, var):
+    """Get the pytd definitions for a top-level definition, as a list."""
+    if name in output.TOP_LEVEL_IGNORE or self._is_builtin(name, var.data):
+      return []
+    data = []
+    options = var.FilteredData(self.exitpoint)
+    if (len(options) > 1 and not
+        all(isinstance(o, (abstract.Function, abstract.BoundFunction))
+            for o in options)):
+      # It's ambiguous whether this is a type, a function or something
+      # else, so encode it as a constant.
+      combined_types = pytd_utils.JoinTypes(t.to_type(self.exitpoint)
+                                            for t in options)
+      data.append(pytd.Constant(name, combined_types))
+    elif options:
+      for option in options:
+        try:
+          d = option.to_pytd_def(self.exitpoint, name)  # Deep definition
+        except NotImplementedError:
+          d = option.to_type(self.exitpoint)  # Type only
+          if isinstance(d, pytd.NothingType):
+            if isinstance(option, abstract.Empty):
+              d = pytd.AnythingType()
+            else:
+              assert isinstance(option, typing.NoReturn)
+        if isinstance(d, pytd.TYPE) and not isinstance(d, pytd.TypeParameter):
+          data.append(pytd.Constant(name, d))
+        else:
+          data.append(d)
+    else:
+      log.error("No visible options for %s", name)
+      data.append(pytd.Constant(name, pytd.AnythingType()))
+    return data
+
   @staticmethod
   def _call_traces_to_function(call_traces, name_transform=lambda x: x):
     funcs = collections.defaultdict(pytd_utils.OrderedSet)
@@ -551,16 +708,80 @@ class CallTracer(vm.VirtualMachine):
   def pytd_classes_for_namedtuple_instances(self):
     return tuple(v.generate_ast() for v in self._generated_classes.values())
 
-  def compute_types(self, defs):
+  def pytd_for_unknowns(self):
     classes = (tuple(self.pytd_classes_for_unknowns()) +
                tuple(self.pytd_classes_for_call_traces()) +
                self.pytd_classes_for_namedtuple_instances())
     functions = tuple(self.pytd_functions_for_call_traces())
     aliases = tuple(self.pytd_aliases())
-    ty = pytd_utils.Concat(
-        self.pytd_for_types(defs),
-        pytd_utils.CreateModule("unknowns", classes=classes,
-                                functions=functions, aliases=aliases))
+    return pytd_utils.CreateModule("unknowns", classes=classes,
+                                   functions=functions, aliases=aliases)
+
+  def _merge_worker_results(self, defs):
+    """Merge the types that the worker processes report, like a single VM."""
+    types = {}
+    for result in self._worker_results:
+      types.update(result.types)
+    data = []
+    for name in defs:
+      data.extend(types.get(name, ()))
+    # Everything that happened before the workers were forked, like the
+    # namedtuples created by the module-level code, is in every result. Other
+    # classes, like the ones that record the calls of library methods, can
+    # have different members in each result.
+    classes = collections.OrderedDict()
+    signatures = collections.OrderedDict()
+    for result in self._worker_results:
+      for cls in result.unknowns.classes:
+        classes.setdefault(cls.name, []).append(cls)
+      for f in result.unknowns.functions:
+        for sig in f.signatures:
+          signatures.setdefault(f.name, pytd_utils.OrderedSet()).add(sig)
+    functions = tuple(pytd.Function(name, tuple(sigs), pytd.METHOD)
+                      for name, sigs in signatures.items())
+    unknowns = pytd_utils.CreateModule(
+        "unknowns",
+        classes=tuple(self._merge_classes(versions)
+                      for versions in classes.values()),
+        functions=functions)
+    return pytd_utils.Concat(pytd_utils.WrapTypeDeclUnit("inferred", data),
+                             unknowns)
+
+  @staticmethod
+  def _merge_classes(versions):
+    """Merge the versions of a class that the worker processes report.
+
+    Args:
+      versions: A list of pytd.Class nodes with the same name.
+
+    Returns:
+      A pytd.Class with the signatures of the methods and the types of the
+      constants of all the versions.
+    """
+    if len(versions) == 1:
+      return versions[0]
+    methods = collections.OrderedDict()
+    constants = collections.OrderedDict()
+    for cls in versions:
+      for method in cls.methods:
+        if method.name not in methods:
+          methods[method.name] = (method, pytd_utils.OrderedSet())
+        for sig in method.signatures:
+          methods[method.name][1].add(sig)
+      for constant in cls.constants:
+        constants.setdefault(constant.name, []).append(constant.type)
+    return versions[0].Replace(
+        methods=tuple(method.Replace(signatures=tuple(sigs))
+                      for method, sigs in methods.values()),
+        constants=tuple(pytd.Constant(name, pytd_utils.JoinTypes(types))
+                        for name, types in constants.items()))
+
+  def compute_types(self, defs):
+    if self._worker_results is None:
+      ty = pytd_utils.Concat(self.pytd_for_types(defs),
+                             self.pytd_for_unknowns())
+    else:
+      ty = self._merge_worker_results(defs)
     ty = ty.Visit(optimize.CombineReturnsAndExceptions())
     ty = ty.Visit(optimize.PullInMethodClasses())
     ty = ty.Visit(visitors.DefaceUnresolved(
@@ -579,6 +800,41 @@ class CallTracer(vm.VirtualMachine):
             self.frames, combined, formal.get_instance_type(node))
 
 
+class _RenameNewUnknowns(visitors.Visitor):
+  """Give the unknowns a worker process created names of their own."""
+
+  def __init__(self, first_id, part):
+    super(_RenameNewUnknowns, self).__init__()
+    self._first_id = first_id
+    self._suffix = "~%d" % part
+
+  def _rename(self, name):
+    match = re.match(r"~unknown(\d+)$", name)
+    if match and int(match.group(1)) >= self._first_id:
+      return name + self._suffix
+    return name
+
+  def VisitNamedType(self, node):
+    return node.Replace(name=self._rename(node.name))
+
+  def VisitClassType(self, node):
+    return pytd.ClassType(self._rename(node.name))
+
+  def VisitClass(self, node):
+    return node.Replace(name=self._rename(node.name))
+
+
+# The VM that the worker processes of CallTracer._analyze_in_workers start with,
+# the node to start at, the definitions, the number of shares and whether to
+# compute types. Set while the workers run.
+_worker_state = None
+
+
+def _analyze_part(part):
+  tracer, node, defs, parts, compute_types = _worker_state
+  return tracer.analyze_part(node, defs, part, parts, compute_types)
+
+
 def check_types(src, filename, errorlog, options, loader,
                 deep=True, init_maximum_depth=INIT_MAXIMUM_DEPTH,
                 maximum_depth=None, **kwargs):
@@ -592,9 +848,11 @@ def check_types(src, filename, errorlog, options, loader,
     if maximum_depth is None:
       maximum_depth = (
           QUICK_CHECK_MAXIMUM_DEPTH if options.quick else MAXIMUM_DEPTH)
-    tracer.analyze(loc, defs, maximum_depth=maximum_depth)
+    tracer.analyze(loc, defs, maximum_depth=maximum_depth,
+                   jobs=options.analyze_jobs)
   snapshotter.take_snapshot("analyze:check_types:post")
   _maybe_output_debug(options, tracer.program)
+  _maybe_write_profile(options, tracer.profiler)
 
 
 def infer_types(src, errorlog, options, loader,
@@ -615,7 +873,8 @@ def infer_types(src, errorlog, options, loader,
     maximum_depth: Depth of the analysis. Default: unlimited.
     **kwargs: Additional parameters to pass to vm.VirtualMachine
   Returns:
-    A TypeDeclUnit
+    A tuple of a TypeDeclUnit and a pytd_utils.LazyConcat of the modules that
+    the analysis loaded.
   Raises:
     AssertionError: In case of a bad parameter combination.
   """
@@ -636,7 +895,9 @@ def infer_types(src, errorlog, options, loader,
         maximum_depth = QUICK_CHECK_MAXIMUM_DEPTH
       else:
         maximum_depth = QUICK_INFER_MAXIMUM_DEPTH
-    tracer.exitpoint = tracer.analyze(loc, defs, maximum_depth)
+    tracer.exitpoint = tracer.analyze(loc, defs, maximum_depth,
+                                      jobs=options.analyze_jobs,
+                                      compute_types=True)
   else:
     tracer.exitpoint = loc
   snapshotter.take_snapshot("analyze:infer_types:post")
@@ -668,9 +929,16 @@ def infer_types(src, errorlog, options, loader,
     # Remove "~list" etc.:
     ast = convert_structural.extract_local(ast)
   _maybe_output_debug(options, tracer.program)
+  _maybe_write_profile(options, tracer.profiler)
   return ast, builtins_pytd
 
 
+def _maybe_write_profile(options, profiler):
+  """Write the analysis profile, if requested."""
+  if profiler:
+    profiler.write(options.analysis_profile, options.analysis_profile_folded)
+
+
 def _maybe_output_debug(options, program):
   """Maybe emit debugging output."""
   if options.output_cfg or options.output_typegraph:
@@ -0,0 +1,57 @@
+"""Wall-clock budgets for analyzing a module and its functions.
+
+Unlike --timeout, which kills pytype, running out of budget only makes the
+analysis shallower: the VM stops following calls below the top-level code it
+is running, and the analyzer skips the functions it hasn't started on. The
+output is less precise, but still complete.
+"""
+
+import time
+
+
+class AnalysisBudget(object):
+  """Keeps track of the time left for the analysis.
+
+  Attributes:
+    cut_calls: The number of calls that weren't followed because the budget
+      ran out.
+  """
+
+  def __init__(self, module_seconds=None, function_seconds=None,
+               clock=time.time):
+    """Initialize.
+
+    Args:
+      module_seconds: The budget for the whole module, or None.
+      function_seconds: The budget for each top-level function and method, or
+        None.
+      clock: A function returning the current time in seconds.
+    """
+    self._clock = clock
+    if module_seconds is None:
+      self._module_deadline = None
+    else:
+      self._module_deadline = clock() + module_seconds
+    self._function_seconds = function_seconds
+    self._function_deadline = None
+    self.cut_calls = 0
+
+  def start_function(self):
+    """Start the budget of a top-level function or method."""
+    if self._function_seconds is not None:
+      self._function_deadline = self._clock() + self._function_seconds
+
+  def end_function(self):
+    self._function_deadline = None
+
+  def module_exhausted(self):
+    return (self._module_deadline is not None and
+            self._clock() >= self._module_deadline)
+
+  def exhausted(self):
+    """Whether the budget of the module or the current function ran out."""
+    if self._module_deadline is None and self._function_deadline is None:
+      return False
+    now = self._clock()
+    return any(deadline is not None and now >= deadline
+               for deadline in (self._module_deadline, self._function_deadline))
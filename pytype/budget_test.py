@@ -0,0 +1,65 @@
+"""Tests for budget.py."""
+
+from pytype import budget
+
+import unittest
+
+
+class FakeClock(object):
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+class AnalysisBudgetTest(unittest.TestCase):
+  """Tests for AnalysisBudget."""
+
+  def setUp(self):
+    self.clock = FakeClock()
+
+  def test_unlimited(self):
+    b = budget.AnalysisBudget(clock=self.clock)
+    b.start_function()
+    self.clock.now = 1e9
+    self.assertFalse(b.exhausted())
+    self.assertFalse(b.module_exhausted())
+
+  def test_module(self):
+    b = budget.AnalysisBudget(module_seconds=10, clock=self.clock)
+    self.clock.now = 9
+    self.assertFalse(b.exhausted())
+    self.assertFalse(b.module_exhausted())
+    self.clock.now = 10
+    self.assertTrue(b.exhausted())
+    self.assertTrue(b.module_exhausted())
+
+  def test_function(self):
+    b = budget.AnalysisBudget(function_seconds=5, clock=self.clock)
+    self.clock.now = 100
+    self.assertFalse(b.exhausted())
+    b.start_function()
+    self.clock.now = 104
+    self.assertFalse(b.exhausted())
+    self.clock.now = 105
+    self.assertTrue(b.exhausted())
+    self.assertFalse(b.module_exhausted())
+    b.end_function()
+    self.assertFalse(b.exhausted())
+    # The next function gets a fresh budget.
+    b.start_function()
+    self.assertFalse(b.exhausted())
+
+  def test_module_and_function(self):
+    b = budget.AnalysisBudget(
+        module_seconds=10, function_seconds=5, clock=self.clock)
+    self.clock.now = 8
+    b.start_function()
+    self.clock.now = 10
+    self.assertTrue(b.exhausted())
+
+
+if __name__ == "__main__":
+  unittest.main()
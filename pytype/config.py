@@ -128,6 +128,21 @@ def add_subtools(o):
       "--generate-builtins", action="store",
       dest="generate_builtins", default=None,
       help="Precompile builtins pytd and write to the given file.")
+  o.add_argument(
+      "--generate-builtins-jobs", type=int, action="store",
+      dest="generate_builtins_jobs", default=1,
+      help="Number of processes to use for --generate-builtins.")
+  o.add_argument(
+      "--generate-stub-archive", action="store",
+      dest="generate_stub_archive", default=None,
+      help=("Pack typeshed and pytype's own pytd files into one archive and "
+            "write it to the given file. See --stub-archive."))
+  o.add_argument(
+      "--compile-imports-info", action="store",
+      dest="compile_imports_info", default=None,
+      help=("Validate the map given with --imports_info and write it to the "
+            "given file in a compiled form. Passing that file to "
+            "--imports_info skips reading and validating the map."))
   o.add_argument(
       "--parse-pyi", action="store_true",
       dest="parse_pyi", default=False,
@@ -163,7 +178,8 @@ def add_infrastructure_options(o):
   o.add_argument(
       "--imports_info", type=str, action="store",
       dest="imports_map", default=None,
-      help=("Information for mapping import .pytd to files. "
+      help=("Information for mapping import .pytd to files, or a compiled "
+            "map written by --compile-imports-info. "
             "This options is incompatible with --pythonpath."))
   o.add_argument(
       "-M", "--module-name", action="store",
@@ -197,10 +213,60 @@ def add_infrastructure_options(o):
             "then pytype should be invoked with $OUTDIR in "
             "--pythonpath. This option is incompatible with "
             "--imports_info and --generate_builtins.") % os.pathsep)
+  o.add_argument(
+      "--daemon", type=str, action="store",
+      dest="daemon", default=None,
+      help=("Run as a daemon listening on the given Unix socket. The daemon "
+            "keeps loaded builtins and typeshed stubs in memory between "
+            "requests sent with --connect."))
+  o.add_argument(
+      "--connect", type=str, action="store",
+      dest="connect", default=None,
+      help=("Send this invocation to the pytype daemon listening on the given "
+            "Unix socket instead of running it in this process."))
   o.add_argument(
       "--touch", type=str, action="store",
       dest="touch", default=None,
       help="Output file to touch when exit status is ok.")
+  o.add_argument(
+      "--bytecode-cache-dir", type=str, action="store",
+      dest="bytecode_cache_dir", default=None,
+      help=("Directory for caching the bytecode of the analyzed sources. A "
+            "source is only compiled again if its contents, filename or "
+            "Python version change."))
+  o.add_argument(
+      "--bytecode-cache-size", type=int, action="store",
+      dest="bytecode_cache_size", default=100,
+      help=("Maximum size of the bytecode cache, in megabytes. The least "
+            "recently used entries are evicted first."))
+  o.add_argument(
+      "--pyi-cache-dir", type=str, action="store",
+      dest="pyi_cache_dir", default=None,
+      help=("Directory for caching the parsed and resolved .pyi files that "
+            "the analysis imports. A file is only parsed again if its "
+            "contents change."))
+  o.add_argument(
+      "--function-summary-dir", type=str, action="store",
+      dest="function_summary_dir", default=None,
+      help=("Directory for caching summaries of calls of functions without "
+            "side effects: the return type and errors of a call, for given "
+            "argument and global types. Later calls with the same types, in "
+            "this or another run, reuse the summary. Ignored with "
+            "--protocols."))
+  o.add_argument(
+      "--lazy-pyi-dependencies", action="store_true",
+      dest="lazy_pyi_dependencies", default=False,
+      help=("Only load the modules that a .pyi file references in function "
+            "signatures, constant types and from-imports when the analysis "
+            "uses one of those types. Saves loading the dependencies of large "
+            "stubs of which a program uses little."))
+  o.add_argument(
+      "--stub-archive", action="store",
+      dest="stub_archive", default=None,
+      help=("Read typeshed and pytype's own pytd files from an archive made "
+            "with --generate-stub-archive by the same version of pytype, "
+            "rather than from the pytype installation. This saves reading "
+            "many small files."))
   # TODO(rechen): --analyze-annotated and --quick would make more sense as
   # basic options but are currently used by pytype-all in a way that isn't
   # easily configurable.
@@ -213,6 +279,32 @@ def add_infrastructure_options(o):
       "-Z", "--quick", action="store_true",
       dest="quick", default=None,
       help=("Only do an approximation."))
+  o.add_argument(
+      "--analyze-jobs", type=int, action="store",
+      dest="analyze_jobs", default=1,
+      help=("Number of processes to analyze the top-level functions and "
+            "classes in, after the module-level code has run once. "
+            "Incompatible with --protocols."))
+  o.add_argument(
+      "--type-keyed-calls", action="store_true",
+      dest="type_keyed_calls", default=False,
+      help=("Also reuse the result of a function call for later calls whose "
+            "arguments are other instances of the same types, as long as the "
+            "call doesn't change its arguments or return part of them. "
+            "Ignored with --no-skip-calls."))
+  o.add_argument(
+      "--analysis-budget", type=float, action="store",
+      dest="analysis_budget", default=None,
+      help=("In seconds. Once the analysis of the module has taken this long, "
+            "calls below the top-level code are no longer followed and "
+            "functions that haven't been analyzed yet are skipped. Unlike "
+            "--timeout, pytype still reports errors and outputs a .pyi, with "
+            "an analysis-truncated warning for every affected function."))
+  o.add_argument(
+      "--function-analysis-budget", type=float, action="store",
+      dest="function_analysis_budget", default=None,
+      help=("In seconds. Like --analysis-budget, but for each top-level "
+            "function and method."))
 
 
 def add_debug_options(o):
@@ -255,6 +347,16 @@ def add_debug_options(o):
       "--profile", type=str, action="store",
       dest="profile", default=None,
       help="Profile pytype and output the stats to the specified file.")
+  o.add_argument(
+      "--analysis-profile", type=str, action="store",
+      dest="analysis_profile", default=None,
+      help=("Output the cost of analyzing each function of the input to the "
+            "specified file."))
+  o.add_argument(
+      "--analysis-profile-folded", type=str, action="store",
+      dest="analysis_profile_folded", default=None,
+      help=("Output the analysis time of each function of the input to the "
+            "specified file, as folded stacks for flame graph tools."))
   o.add_argument(
       # Not stored, just used to configure logging.
       "-v", "--verbosity", type=int, action="store",
@@ -282,7 +384,8 @@ def add_debug_options(o):
       dest="version", default=None,
       help=("Display pytype version and exit."))
   # Timing out kills pytype with an error code. Useful for determining whether
-  # pytype is fast enough to be enabled for a particular target.
+  # pytype is fast enough to be enabled for a particular target. See
+  # --analysis-budget for a limit that still produces output.
   o.add_argument(
       "--timeout", type=int, action="store", dest="timeout", default=None,
       help="In seconds. Abort after the given time has elapsed.")
@@ -363,7 +466,8 @@ class Postprocessor(object):
       self.error("Can't use without --output", "output_pickled")
     self.output_options.output_pickled = filename
 
-  @uses(["input", "show_config", "pythonpath", "version"])
+  @uses(["input", "show_config", "pythonpath", "version", "daemon",
+         "generate_stub_archive", "compile_imports_info"])
   def _store_generate_builtins(self, generate_builtins):
     """Store the generate-builtins option."""
     if generate_builtins:
@@ -375,10 +479,28 @@ class Postprocessor(object):
       self.output_options.pythonpath = []
     elif (not self.output_options.input and
           not self.output_options.show_config and
-          not self.output_options.version):
+          not self.output_options.version and
+          not self.output_options.daemon and
+          not self.output_options.generate_stub_archive and
+          not self.output_options.compile_imports_info):
       self.error("Need a filename.")
     self.output_options.generate_builtins = generate_builtins
 
+  @uses(["input"])
+  def _store_generate_stub_archive(self, generate_stub_archive):
+    if generate_stub_archive and self.output_options.input:
+      self.error("Not allowed with an input file", "generate-stub-archive")
+    self.output_options.generate_stub_archive = generate_stub_archive
+
+  @uses(["input", "imports_map"])
+  def _store_compile_imports_info(self, compile_imports_info):
+    if compile_imports_info:
+      if self.output_options.input:
+        self.error("Not allowed with an input file", "compile-imports-info")
+      if self.output_options.imports_map is None:
+        self.error("Need --imports_info", "compile-imports-info")
+    self.output_options.compile_imports_info = compile_imports_info
+
   @uses(["module_name"])
   def _store_read_pyi_save_pickle(self, read_pyi_save_pickle):
     if read_pyi_save_pickle and not self.output_options.module_name:
@@ -449,6 +571,36 @@ class Postprocessor(object):
           "Can output CFG or typegraph, but not both", "output-typegraph")
     self.output_options.output_typegraph = output_typegraph
 
+  @uses(["protocols"])
+  def _store_analyze_jobs(self, analyze_jobs):
+    if analyze_jobs < 1:
+      self.error("Must be at least 1", "analyze-jobs")
+    if analyze_jobs > 1 and self.output_options.protocols:
+      self.error("Not allowed with --protocols", "analyze-jobs")
+    self.output_options.analyze_jobs = analyze_jobs
+
+  def _store_analysis_budget(self, analysis_budget):
+    if analysis_budget is not None and analysis_budget <= 0:
+      self.error("Must be positive", "analysis-budget")
+    self.output_options.analysis_budget = analysis_budget
+
+  def _store_function_analysis_budget(self, function_analysis_budget):
+    if function_analysis_budget is not None and function_analysis_budget <= 0:
+      self.error("Must be positive", "function-analysis-budget")
+    self.output_options.function_analysis_budget = function_analysis_budget
+
+  @uses(["analyze_jobs"])
+  def _store_analysis_profile(self, analysis_profile):
+    if analysis_profile and self.output_options.analyze_jobs > 1:
+      self.error("Not allowed with --analyze-jobs", "analysis-profile")
+    self.output_options.analysis_profile = analysis_profile
+
+  @uses(["analyze_jobs"])
+  def _store_analysis_profile_folded(self, analysis_profile_folded):
+    if analysis_profile_folded and self.output_options.analyze_jobs > 1:
+      self.error("Not allowed with --analyze-jobs", "analysis-profile-folded")
+    self.output_options.analysis_profile_folded = analysis_profile_folded
+
   @uses(["report_errors"])
   def _store_output_errors_csv(self, output_errors_csv):
     if output_errors_csv and not self.output_options.report_errors:
@@ -473,16 +473,24 @@ class Converter(object):
       module, dot, _ = late_type.name.rpartition(".")
       assert dot
       ast = self.vm.loader.import_name(module)
+      while ast is None and "." in module:
+        # The type might be a nested class, like "foo.Outer.Inner".
+        module, _, _ = module.rpartition(".")
+        ast = self.vm.loader.import_name(module)
       if ast is not None:
         try:
           # TODO(kramm): Should this use visitor.py:ToType?
           cls = ast.Lookup(late_type.name)
         except KeyError:
-          try:
-            ast.Lookup("__getattr__")
-          except KeyError:
-            log.warning("Couldn't resolve %s", late_type.name)
-          t = pytd.AnythingType()
+          if self.vm.loader.import_name(late_type.name):
+            # A submodule, as in "from foo import bar".
+            t = pytd.Module(name=late_type.name, module_name=late_type.name)
+          else:
+            try:
+              ast.Lookup("__getattr__")
+            except KeyError:
+              log.warning("Couldn't resolve %s", late_type.name)
+            t = pytd.AnythingType()
         else:
           t = visitors.ToType(cls, allow_constants=False)
       else:
@@ -277,6 +277,9 @@ def insert_solution(result, mapping, global_lookup):
 
 def convert_pytd(ast, builtins_pytd, protocols_pytd):
   """Convert pytd with unknowns (structural types) to one with nominal types."""
+  if isinstance(builtins_pytd, pytd_utils.LazyConcat):
+    # The solver matches the unknowns against every class and function.
+    builtins_pytd = builtins_pytd.Concat()
   builtins_pytd = builtins_pytd.Visit(visitors.ClassTypeToNamedType())
   mapping, result = solve(ast, builtins_pytd, protocols_pytd)
   log_info_mapping(mapping)
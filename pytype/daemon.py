@@ -0,0 +1,220 @@
+"""A long-lived pytype server that keeps loaded pytd files in memory.
+
+Starting pytype and loading __builtin__, typing and the typeshed stubs a module
+imports often takes longer than analyzing the module itself. The daemon pays
+this cost once: it listens on a Unix socket for pytype-single command lines,
+runs them in-process, and seeds the loader of each request with the modules
+loaded by earlier requests that used the same loader options. Modules loaded
+from .pyi files are dropped once the files change.
+
+Messages in both directions are JSON objects, each preceded by its length as a
+4-byte big-endian unsigned integer. A request looks like
+  {"argv": ["-V", "3.6", "foo.py", "-o", "foo.pyi"], "cwd": "/path"}
+and is answered with
+  {"exit_status": 0, "stdout": "...", "stderr": "..."}
+A request of {"shutdown": true} stops the server.
+"""
+
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import traceback
+
+from pytype import abstract
+from pytype import config
+from pytype import file_utils
+from pytype import io
+from pytype import load_pytd
+from pytype.pytd.parse import builtins
+
+import six
+
+
+log = logging.getLogger(__name__)
+
+
+_HEADER = struct.Struct(">I")
+
+
+class AlreadyRunningError(Exception):
+  """Another daemon is listening on the socket."""
+
+
+def _recv_exactly(sock, size):
+  chunks = []
+  while size:
+    chunk = sock.recv(min(size, 1 << 16))
+    if not chunk:
+      raise EOFError("Connection closed")
+    chunks.append(chunk)
+    size -= len(chunk)
+  return b"".join(chunks)
+
+
+def send_message(sock, message):
+  data = json.dumps(message).encode("utf-8")
+  sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+  size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+  return json.loads(_recv_exactly(sock, size).decode("utf-8"))
+
+
+class Server(object):
+  """Runs pytype-single requests received on a Unix socket."""
+
+  def __init__(self, socket_path, python_versions=()):
+    self.socket_path = socket_path
+    self.python_versions = python_versions
+    # Maps a loader key to the modules a loader with that key can start with.
+    self._modules = {}
+
+  def warm_up(self):
+    for python_version in self.python_versions:
+      log.info("Loading builtins for Python %d.%d", *python_version)
+      builtins.GetBuiltinsAndTyping(python_version)
+
+  def handle_request(self, argv):
+    """Run pytype-single with the given arguments.
+
+    Args:
+      argv: The arguments, without the program name.
+
+    Returns:
+      A tuple of the exit status and what pytype wrote to stdout and stderr.
+    """
+    stdout, stderr = six.StringIO(), six.StringIO()
+    old_stdout, old_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+      exit_status = self._process_one_file(config.Options(argv))
+    except SystemExit as e:
+      # argparse reports bad options by exiting.
+      exit_status = e.code if isinstance(e.code, int) else 1
+    except Exception:  # pylint: disable=broad-except
+      traceback.print_exc()
+      exit_status = 1
+    finally:
+      sys.stdout, sys.stderr = old_stdout, old_stderr
+    return exit_status, stdout.getvalue(), stderr.getvalue()
+
+  def _process_one_file(self, options):
+    if not options.input:
+      sys.stderr.write("The pytype daemon can only process input files.\n")
+      return 2
+    key = load_pytd.get_loader_key(options)
+    # This returns a new dict, which is good, since the loader adds the modules
+    # it loads to it.
+    modules = load_pytd.filter_reusable_modules(self._modules.get(key, {}))
+    loader = load_pytd.create_loader(options, modules)
+    try:
+      exit_status = io.process_one_file(options, loader)
+    finally:
+      # The VM caches hold on to the VM that filled them, so a request's VM
+      # would otherwise live as long as the daemon.
+      abstract.InterpreterFunction.clear_function_cache()
+    self._modules[key] = loader.get_reusable_modules(include_files=True)
+    return exit_status
+
+  def _handle_connection(self, conn):
+    """Handle a single request. Returns False if the server should stop."""
+    request = recv_message(conn)
+    if request.get("shutdown"):
+      send_message(conn, {"exit_status": 0, "stdout": "", "stderr": ""})
+      return False
+    with file_utils.cd(request.get("cwd") or os.getcwd()):
+      exit_status, stdout, stderr = self.handle_request(request["argv"])
+    send_message(conn, {"exit_status": exit_status, "stdout": stdout,
+                        "stderr": stderr})
+    return True
+
+  def serve(self):
+    """Serve requests until a shutdown request is received."""
+    if os.path.exists(self.socket_path):
+      if _is_listening(self.socket_path):
+        raise AlreadyRunningError(
+            "A pytype daemon is already listening on %s" % self.socket_path)
+      # Left behind by a daemon that didn't shut down cleanly.
+      os.unlink(self.socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Whoever can connect can make the daemon write files as its owner, so
+    # only the owner may use the socket.
+    old_umask = os.umask(0o177)
+    try:
+      sock.bind(self.socket_path)
+    finally:
+      os.umask(old_umask)
+    sock.listen(5)
+    log.info("pytype daemon listening on %s", self.socket_path)
+    self.warm_up()
+    try:
+      running = True
+      while running:
+        conn, _ = sock.accept()
+        try:
+          running = self._handle_connection(conn)
+        except (EOFError, socket.error, ValueError, KeyError) as e:
+          log.error("Bad request: %s", e)
+        finally:
+          conn.close()
+    finally:
+      sock.close()
+      os.unlink(self.socket_path)
+
+
+def _is_listening(socket_path):
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(socket_path)
+  except socket.error:
+    return False
+  else:
+    return True
+  finally:
+    sock.close()
+
+
+def serve(options):
+  """Run a daemon listening on the socket given by options.daemon."""
+  try:
+    Server(options.daemon, [options.python_version]).serve()
+  except AlreadyRunningError as e:
+    log.error("%s", e)
+    return 1
+  return 0
+
+
+def send_request(socket_path, request):
+  """Send a request to a running daemon and return its response."""
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(socket_path)
+    send_message(sock, request)
+    return recv_message(sock)
+  finally:
+    sock.close()
+
+
+def run_remotely(options, argv):
+  """Have the daemon on options.connect run pytype-single with argv.
+
+  Args:
+    options: config.Options object.
+    argv: The pytype-single arguments, without the program name.
+
+  Returns:
+    The exit status of the remote pytype run.
+  """
+  try:
+    response = send_request(
+        options.connect, {"argv": argv, "cwd": os.getcwd()})
+  except (EOFError, socket.error) as e:
+    log.error("Could not talk to pytype daemon on %s: %s", options.connect, e)
+    return 1
+  sys.stdout.write(response["stdout"])
+  sys.stderr.write(response["stderr"])
+  return response["exit_status"]
@@ -0,0 +1,138 @@
+"""Tests for daemon.py."""
+
+import gc
+import os
+import socket
+import stat
+import threading
+import time
+
+from pytype import daemon
+from pytype import file_utils
+from pytype import vm
+
+import unittest
+
+
+class ServerTest(unittest.TestCase):
+  """Tests for daemon.Server."""
+
+  def setUp(self):
+    self.server = daemon.Server("unused")
+
+  def testCheck(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("foo.py", "x = 1 + ''")
+      exit_status, stdout, stderr = self.server.handle_request(
+          ["-V", "2.7", filename])
+    self.assertEqual(exit_status, 1)
+    self.assertFalse(stdout)
+    self.assertIn("wrong-arg-types", stderr)
+
+  def testInfer(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("foo.py", "import os\nx = os.getcwd()")
+      for _ in range(2):  # the second run reuses the modules of the first
+        exit_status, stdout, _ = self.server.handle_request(
+            ["-V", "2.7", filename, "-o", "-"])
+        self.assertEqual(exit_status, 0)
+        self.assertIn("x = ...  # type: str", stdout)
+
+  def testNoLeakedVMs(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("foo.py", "def f(): return [x for x in 'ab']")
+      counts = []
+      for _ in range(3):
+        exit_status, _, _ = self.server.handle_request(
+            ["-V", "2.7", filename, "-o", "-"])
+        self.assertEqual(exit_status, 0)
+        gc.collect()
+        counts.append(len([x for x in gc.get_objects()
+                           if isinstance(x, vm.VirtualMachine)]))
+    self.assertEqual(counts, [0, 0, 0])
+
+  def testBadOption(self):
+    exit_status, _, stderr = self.server.handle_request(["--no-such-option"])
+    self.assertEqual(exit_status, 2)
+    self.assertIn("unrecognized arguments", stderr)
+
+  def testNoInput(self):
+    exit_status, _, _ = self.server.handle_request(["--daemon", "foo"])
+    self.assertEqual(exit_status, 2)
+
+
+class SocketTest(unittest.TestCase):
+  """Tests for talking to a daemon over a Unix socket."""
+
+  def _start_server(self, socket_path):
+    thread = threading.Thread(target=daemon.Server(socket_path).serve)
+    thread.start()
+    deadline = time.time() + 10
+    while not daemon._is_listening(socket_path):  # pylint: disable=protected-access
+      if not thread.is_alive() or time.time() > deadline:
+        self.fail("Server didn't start listening on %s" % socket_path)
+      time.sleep(0.01)
+    return thread
+
+  def _stop_server(self, socket_path, thread):
+    daemon.send_request(socket_path, {"shutdown": True})
+    thread.join()
+
+  def testRoundTrip(self):
+    with file_utils.Tempdir() as d:
+      socket_path = d["pytype.sock"]
+      filename = d.create_file("foo.py", "def f(): return 42")
+      thread = self._start_server(socket_path)
+      try:
+        response = daemon.send_request(
+            socket_path, {"argv": ["-V", "2.7", "foo.py", "-o", "-"],
+                          "cwd": d.path})
+      finally:
+        self._stop_server(socket_path, thread)
+    self.assertEqual(response["exit_status"], 0)
+    self.assertIn("def f() -> int", response["stdout"])
+    self.assertFalse(os.path.exists(filename + "i"))
+
+  def testSocketPermissions(self):
+    with file_utils.Tempdir() as d:
+      socket_path = d["pytype.sock"]
+      thread = self._start_server(socket_path)
+      try:
+        mode = stat.S_IMODE(os.stat(socket_path).st_mode)
+      finally:
+        self._stop_server(socket_path, thread)
+    self.assertEqual(mode, 0o600)
+
+  def testAlreadyRunning(self):
+    with file_utils.Tempdir() as d:
+      socket_path = d["pytype.sock"]
+      thread = self._start_server(socket_path)
+      try:
+        self.assertRaises(daemon.AlreadyRunningError,
+                          daemon.Server(socket_path).serve)
+        self.assertTrue(os.path.exists(socket_path))
+      finally:
+        self._stop_server(socket_path, thread)
+
+  def testStaleSocket(self):
+    with file_utils.Tempdir() as d:
+      socket_path = d["pytype.sock"]
+      sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      sock.bind(socket_path)
+      sock.close()
+      thread = self._start_server(socket_path)
+      self._stop_server(socket_path, thread)
+      self.assertFalse(os.path.exists(socket_path))
+
+  def testMessage(self):
+    a, b = socket.socketpair()
+    try:
+      daemon.send_message(a, {"x": [1, u"\xe9"]})
+      self.assertEqual(daemon.recv_message(b), {"x": [1, u"\xe9"]})
+    finally:
+      a.close()
+      b.close()
+
+
+if __name__ == "__main__":
+  unittest.main()
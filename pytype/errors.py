@@ -311,6 +311,11 @@ class ErrorLogBase(object):
         _log.debug(debug.stack_trace(limit=1).rstrip())
       self._errors.append(error)
 
+  def merge(self, errors):
+    """Add errors that were logged elsewhere, e.g. in another process."""
+    for error in errors:
+      self._add(error)
+
   def warn(self, stack, message, *args):
     self._add(Error.with_stack(stack, SEVERITY_WARNING, message % args))
 
@@ -805,6 +810,16 @@ class ErrorLog(ErrorLogBase):
         SEVERITY_WARNING, "Stray type comment: %s" % comment,
         filename=filename, lineno=lineno))
 
+  @_error_name("analysis-truncated")
+  def analysis_truncated(self, filename, lineno, name, skipped):
+    if skipped:
+      message = "Analysis budget exhausted, not analyzing %s" % name
+    else:
+      message = ("Analysis budget exhausted, calls in %s were not followed" %
+                 name)
+    self._add(Error(
+        SEVERITY_WARNING, message, filename=filename, lineno=lineno))
+
   @_error_name("invalid-typevar")
   def invalid_typevar(self, stack, comment, bad_call=None):
     if bad_call:
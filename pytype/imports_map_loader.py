@@ -1,13 +1,31 @@
 """Import and set up the imports_map."""
 
+import bisect
 import collections
 import logging
+import mmap
 import os
+import struct
 import textwrap
 
 log = logging.getLogger(__name__)
 
 
+# A compiled imports map starts with this string. See CompiledImportsMap.
+MAGIC = b"pytype imports map\n"
+
+# The number of entries, which follows the magic string.
+_HEADER = struct.Struct("<I")
+
+# An entry: The offset and length of the short path, the offset and length of
+# the path it's mapped to, and flags.
+_ENTRY = struct.Struct("<IIIIB")
+
+# Entry flag: The short path is the __init__ of a directory that other entries
+# are in.
+_PACKAGE = 1
+
+
 def _read_imports_map(options_info_path):
   """Read the imports_map file, fold duplicate entries into a multimap."""
   if options_info_path is None:
@@ -26,6 +44,30 @@ def _read_imports_map(options_info_path):
           for short_path, paths in imports_multimap.items()}
 
 
+def _write_placeholder(output):
+  """Fill the output file with temporary contents.
+
+  If pytype is processing multiple files that import each other, during the
+  first pass, we don't have a .pyi for them yet, even though they might be
+  mentioned in the imports_map.
+
+  Args:
+    output: The pyi file pytype is building right now, or None.
+  """
+  if output is None:
+    return
+  if os.path.exists(output):
+    log.error("output file %r already exists; will be overwritten",
+              os.path.abspath(output))
+  with open(output, "w") as fi:
+    fi.write(textwrap.dedent("""\
+        # If you see this comment, it means pytype hasn't properly
+        # processed %r.
+        from typing import Any
+        def __getattr__(name) -> Any: ...
+    """ % output))
+
+
 def _validate_map(imports_map, output):
   """Validate the imports map against the command line arguments.
 
@@ -39,20 +81,7 @@ def _validate_map(imports_map, output):
   Raises:
     AssertionError: If we found an error in the imports map.
   """
-  # If pytype is processing multiple files that import each other, during the
-  # first pass, we don't have a .pyi for them yet, even though they might be
-  # mentioned in the imports_map. So fill them with temporary contents.
-  if output is not None:
-    if os.path.exists(output):
-      log.error("output file %r already exists; will be overwritten",
-                os.path.abspath(output))
-    with open(output, "w") as fi:
-      fi.write(textwrap.dedent("""\
-          # If you see this comment, it means pytype hasn't properly
-          # processed %r.
-          from typing import Any
-          def __getattr__(name) -> Any: ...
-      """ % output))
+  _write_placeholder(output)
 
   # Now, validate the imports_map.
   for short_path, paths in imports_map.items():
@@ -67,19 +96,41 @@ def _validate_map(imports_map, output):
         raise AssertionError("bad import map")
 
 
+def _intermediate_inits(short_path):
+  """Yield the __init__ short paths of the directories above short_path."""
+  # If we have a mapping file foo/bar/quux.py', then the pieces are ["foo",
+  # "bar", "quux"] and we want foo/__init__.py and foo/bar/__init__.py.
+  short_path_pieces = short_path.split(os.sep)
+  for i in range(1, len(short_path_pieces)):
+    yield os.path.join(*(short_path_pieces[:i] + ["__init__"]))
+
+
+def is_compiled(options_info_path):
+  """Whether a file is an imports map written by write_compiled_imports_map."""
+  with open(options_info_path, "rb") as fi:
+    return fi.read(len(MAGIC)) == MAGIC
+
+
 def build_imports_map(options_info_path, output=None):
   """Create a file mapping from a .imports_info file.
 
   Builds a dict of short_path to full name
      (e.g. "path/to/file.py" =>
            "$GENDIR/rulename~~pytype-gen/path_to_file.py~~pytype"
+  If the file is a compiled imports map, it was validated when it was written,
+  so we don't read or validate it again but look up entries in it directly.
+
   Args:
     options_info_path: The file with the info (may be None, for do-nothing)
     output: The output file from the command line. When validating
              imports_info, this output should *not* exist.
   Returns:
-    Dict of .py short_path to list of .pytd path or None if no options_info_path
+    Dict (or CompiledImportsMap) of .py short_path to .pytd path, or None if
+    no options_info_path
   """
+  if options_info_path is not None and is_compiled(options_info_path):
+    _write_placeholder(output)
+    return CompiledImportsMap(options_info_path, output)
   imports_multimap = _read_imports_map(options_info_path)
 
   # Output warnings for all multiple
@@ -112,14 +163,133 @@ def build_imports_map(options_info_path, output=None):
   dir_paths = {}
   for short_path, path in sorted(imports_map.items()):
     dir_paths[short_path] = path
-    short_path_pieces = short_path.split(os.sep)
-    # If we have a mapping file foo/bar/quux.py', then the pieces are ["foo",
-    # "bar", "quux"] and we want to add foo/__init__.py and foo/bar/__init__.py
-    for i in range(1, len(short_path_pieces)):
-      intermediate_dir_init = os.path.join(*(
-          short_path_pieces[:i] + ["__init__"]))
+    for intermediate_dir_init in _intermediate_inits(short_path):
       if (intermediate_dir_init not in imports_map and
           intermediate_dir_init not in dir_paths):
         log.warn("Created empty __init__ %r", intermediate_dir_init)
         dir_paths[intermediate_dir_init] = os.devnull
   return dir_paths
+
+
+class CompiledImportsMap(collections.Mapping):
+  """An imports map written by write_compiled_imports_map.
+
+  The file is mapped into memory, and its entries are sorted by short path, so
+  looking up a module is a binary search that only touches the pages it needs.
+  Nothing is validated when the map is opened.
+
+  Like build_imports_map, the map hides the entry for the output file, if any.
+  If that entry is the __init__ of a directory that has other entries, it's
+  mapped to the empty file instead.
+  """
+
+  def __init__(self, filename, output=None):
+    self.filename = filename
+    with open(filename, "rb") as fi:
+      self._data = mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ)
+    if self._data[:len(MAGIC)] != MAGIC:
+      self._data.close()
+      raise ValueError("%s is not a compiled imports map" % filename)
+    self._size, = _HEADER.unpack_from(self._data, len(MAGIC))
+    self._entries_start = len(MAGIC) + _HEADER.size
+    self._strings_start = self._entries_start + self._size * _ENTRY.size
+    if output:
+      self._output = os.path.abspath(os.path.splitext(output)[0])
+    else:
+      self._output = None
+    self._len = None
+
+  def _string(self, offset, length):
+    start = self._strings_start + offset
+    return self._data[start:start + length].decode("utf-8")
+
+  def _entry(self, i):
+    return _ENTRY.unpack_from(self._data, self._entries_start + i * _ENTRY.size)
+
+  def _short_path(self, i):
+    offset, length, _, _, _ = self._entry(i)
+    return self._string(offset, length)
+
+  def _path(self, i):
+    """The path entry i is mapped to, or None if it's hidden."""
+    _, _, offset, length, flags = self._entry(i)
+    path = self._string(offset, length)
+    if self._output and os.path.splitext(path)[0] == self._output:
+      return os.devnull if flags & _PACKAGE else None
+    return path
+
+  def _find(self, short_path):
+    """The index of the entry for short_path, or None."""
+    keys = _ShortPaths(self)
+    i = bisect.bisect_left(keys, short_path)
+    if i < self._size and keys[i] == short_path:
+      return i
+    return None
+
+  def __getitem__(self, short_path):
+    i = self._find(short_path)
+    path = None if i is None else self._path(i)
+    if path is None:
+      raise KeyError(short_path)
+    return path
+
+  def __iter__(self):
+    for i in range(self._size):
+      if self._path(i) is not None:
+        yield self._short_path(i)
+
+  def __len__(self):
+    if self._len is None:
+      self._len = sum(1 for _ in self)
+    return self._len
+
+  def close(self):
+    self._data.close()
+
+
+class _ShortPaths(object):
+  """The sorted short paths of a CompiledImportsMap, as a sequence for bisect."""
+
+  def __init__(self, imports_map):
+    self._imports_map = imports_map
+
+  def __getitem__(self, i):
+    return self._imports_map._short_path(i)  # pylint: disable=protected-access
+
+  def __len__(self):
+    return self._imports_map._size  # pylint: disable=protected-access
+
+
+def write_compiled_imports_map(filename, imports_map):
+  """Write an imports map in the form that CompiledImportsMap reads.
+
+  Args:
+    filename: The file to write the compiled map to.
+    imports_map: A map returned by build_imports_map, which has validated it.
+  """
+  packages = set()
+  for short_path in imports_map:
+    packages.update(_intermediate_inits(short_path))
+  # Paths are stored once, since many entries map to the empty file.
+  strings = []
+  offsets = {}
+  size = 0
+  entries = []
+  for short_path, path in sorted(imports_map.items()):
+    entry = []
+    for s in (short_path, path):
+      data = s.encode("utf-8")
+      if data not in offsets:
+        offsets[data] = size
+        strings.append(data)
+        size += len(data)
+      entry.extend((offsets[data], len(data)))
+    entry.append(_PACKAGE if short_path in packages else 0)
+    entries.append(entry)
+  with open(filename, "wb") as fi:
+    fi.write(MAGIC)
+    fi.write(_HEADER.pack(len(entries)))
+    for entry in entries:
+      fi.write(_ENTRY.pack(*entry))
+    for data in strings:
+      fi.write(data)
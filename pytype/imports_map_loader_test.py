@@ -74,5 +74,74 @@ class ImportMapLoaderTest(unittest.TestCase):
               ("%s/a/__init__" % d.path[1:], os.devnull),
           ])
 
+  def testCompiledImportsMap(self):
+    """Test reading an imports map back from its compiled form."""
+    with file_utils.Tempdir() as d:
+      files = ["a/__init__.py", "a/b.py", "c.py"]
+      for f in files:
+        d.create_file(f + "i", "")
+      d.create_file("imports_info", "\n".join(
+          "%s %s" % (f, d[f + "i"]) for f in files))
+      imports_map = imports_map_loader.build_imports_map(d["imports_info"])
+      compiled_path = os.path.join(d.path, "imports_info.compiled")
+      imports_map_loader.write_compiled_imports_map(compiled_path, imports_map)
+      self.assertTrue(imports_map_loader.is_compiled(compiled_path))
+      self.assertFalse(imports_map_loader.is_compiled(d["imports_info"]))
+      compiled = imports_map_loader.build_imports_map(compiled_path)
+      try:
+        self.assertIsInstance(compiled, imports_map_loader.CompiledImportsMap)
+        self.assertEqual(dict(compiled), imports_map)
+        self.assertEqual(compiled["a/b"], d["a/b.pyi"])
+        self.assertNotIn("a/c", compiled)
+        self.assertNotIn("", compiled)
+        self.assertNotIn("d", compiled)
+      finally:
+        compiled.close()
+
+  def testCompiledImportsMapFilter(self):
+    """Test hiding the current target's entry in a compiled imports map."""
+    with file_utils.Tempdir() as d:
+      files = ["a/__init__.py", "a/b.py", "c.py"]
+      for f in files:
+        d.create_file(f + "i", "")
+      d.create_file("imports_info", "\n".join(
+          "%s %s" % (f, d[f + "i"]) for f in files))
+      compiled_path = os.path.join(d.path, "imports_info.compiled")
+      imports_map_loader.write_compiled_imports_map(
+          compiled_path, imports_map_loader.build_imports_map(d["imports_info"]))
+      # a/__init__ is still a package, so hiding it leaves an empty module.
+      for output, hidden_path in [(d["a/__init__.pyi"], os.devnull),
+                                  (d["c.pyi"], None)]:
+        short_path = os.path.splitext(os.path.relpath(output, d.path))[0]
+        compiled = imports_map_loader.build_imports_map(compiled_path, output)
+        try:
+          self.assertEqual(compiled.get(short_path), hidden_path)
+          self.assertEqual(compiled["a/b"], d["a/b.pyi"])
+          self.assertEqual(len(compiled), len(list(compiled)))
+        finally:
+          compiled.close()
+        # The output file is filled with temporary contents.
+        with open(output) as fi:
+          self.assertIn("hasn't properly", fi.read())
+    # Only the output's own entry is hidden, not ones that it is a prefix of.
+    with file_utils.Tempdir() as d:
+      d.create_file("gen/a.pyi", "")
+      d.create_file("gen/abc.pyi", "")
+      d.create_file("imports_info", "a %s\nabc %s" % (d["gen/a.pyi"],
+                                                     d["gen/abc.pyi"]))
+      compiled_path = os.path.join(d.path, "imports_info.compiled")
+      imports_map_loader.write_compiled_imports_map(
+          compiled_path, imports_map_loader.build_imports_map(d["imports_info"]))
+      plain = imports_map_loader.build_imports_map(
+          d["imports_info"], d["gen/a.pyi"])
+      compiled = imports_map_loader.build_imports_map(
+          compiled_path, d["gen/a.pyi"])
+      try:
+        self.assertEqual(list(plain), ["abc"])
+        self.assertEqual(list(compiled), ["abc"])
+        self.assertEqual(compiled["abc"], d["gen/abc.pyi"])
+      finally:
+        compiled.close()
+
 if __name__ == "__main__":
   unittest.main()
@@ -4,6 +4,7 @@
 from __future__ import print_function
 
 import logging
+import multiprocessing
 import os
 import sys
 import tokenize
@@ -13,7 +14,9 @@ from pytype import __version__
 from pytype import analyze
 from pytype import directors
 from pytype import errors
+from pytype import imports_map_loader
 from pytype import load_pytd
+from pytype import pytype_source_utils
 from pytype import utils
 from pytype.pyc import pyc
 from pytype.pyi import parser
@@ -21,6 +24,8 @@ from pytype.pytd import optimize
 from pytype.pytd import pytd
 from pytype.pytd import pytd_utils
 from pytype.pytd import serialize_ast
+from pytype.pytd import stub_archive
+from pytype.pytd import typeshed
 from pytype.pytd import visitors
 from pytype.pytd.parse import builtins as pytd_builtins
 
@@ -97,11 +102,13 @@ def generate_pyi(input_filename, errorlog, options, loader):
   return result, mod
 
 
-def process_one_file(options):
+def process_one_file(options, loader=None):
   """Check a .py file or generate a .pyi for it, according to options.
 
   Args:
     options: config.Options object.
+    loader: Optionally, a load_pytd.Loader instance. If not given, a new one is
+      created from the options.
 
   Returns:
     An error code (0 means no error).
@@ -110,7 +117,7 @@ def process_one_file(options):
   errorlog = errors.ErrorLog()
   result = pytd_builtins.DEFAULT_SRC
   ast = pytd_builtins.GetDefaultAst(options.python_version)
-  loader = load_pytd.create_loader(options)
+  loader = loader or load_pytd.create_loader(options)
   try:
     if options.check:
       check_py(input_filename=options.input,
@@ -150,8 +157,7 @@ def process_one_file(options):
       sys.stdout.write(result)
     else:
       log.info("write pyi %r => %r", options.input, options.output)
-      with open(options.output, "w") as fi:
-        fi.write(result)
+      _write_pyi(options.output, result)
       if options.output_pickled:
         write_pickle(ast, loader, options)
   exit_status = handle_errors(errorlog, options)
@@ -168,6 +174,28 @@ def process_one_file(options):
   return exit_status
 
 
+def _write_pyi(filename, result):
+  """Write a pyi file, leaving an existing file alone if it is unchanged.
+
+  Not touching an unchanged file preserves its mtime, so build tools that track
+  our output can tell that the modules depending on it are still up to date.
+
+  Args:
+    filename: The output filename.
+    result: The pyi, as a string.
+  """
+  try:
+    with open(filename, "r") as fi:
+      unchanged = fi.read() == result
+  except IOError:
+    unchanged = False
+  if unchanged:
+    log.info("pyi %r is unchanged", filename)
+  else:
+    with open(filename, "w") as fi:
+      fi.write(result)
+
+
 def write_pickle(ast, loader, options):
   """Dump a pickle of the ast to a file."""
   try:
@@ -205,6 +233,109 @@ def handle_errors(errorlog, options):
   return 1 if errorlog.has_error() else 0  # exit code
 
 
+def generate_builtins_pickle(options):
+  """Create a pickled file with the standard library (typeshed + builtins)."""
+  t = typeshed.Typeshed()
+  module_names = t.get_all_module_names(options.python_version)
+  blacklist = set(t.blacklisted_modules(options.python_version))
+  if options.python_version[0] == 3:
+    # TODO(mdemello): plistlib should be in the typeshed blacklist and isn't.
+    blacklist.add("plistlib")
+  save_modules_to_pickle(
+      options, sorted(m for m in module_names if m not in blacklist),
+      options.generate_builtins)
+
+
+# The options of a save_modules_to_pickle worker process.
+_worker_options = None
+
+
+def _init_worker(options):
+  global _worker_options
+  _worker_options = options
+
+
+def _get_archive_items(module_names):
+  loader = load_pytd.create_loader(_worker_options)
+  for m in module_names:
+    loader.import_name(m)
+  return loader.get_archive_items()
+
+
+def save_modules_to_pickle(options, module_names, filename):
+  """Import modules (and their dependencies), and save them to a pickle.
+
+  With options.generate_builtins_jobs > 1, the modules are imported in that
+  many processes. Each process imports a contiguous range of module_names into
+  a loader of its own, and each module is taken from the first range that
+  imports it. A single loader imports it for that range, too, and since a
+  loader imports all modules of an import cycle together, the modules of
+  earlier ranges that only the single loader has loaded at that point aren't
+  part of the module's cycle. The module therefore resolves the same way in
+  both, and because the encoding of an ast only depends on its value, the
+  pickle is the same as the one a single loader writes.
+
+  Args:
+    options: config.Options object.
+    module_names: The names of the modules to import, sorted.
+    filename: The file to save the pickle to.
+  """
+  jobs = options.generate_builtins_jobs
+  if jobs <= 1:
+    loader = load_pytd.create_loader(options)
+    for m in module_names:
+      loader.import_name(m)
+    loader.save_to_pickle(filename)
+    return
+  # More ranges than processes, so that a process that drew cheap modules can
+  # take on another range. Each range loads the dependencies of its modules
+  # again, so don't make them too small either.
+  num_ranges = min(len(module_names), 4 * jobs) or 1
+  ranges = [module_names[i * len(module_names) // num_ranges:
+                         (i + 1) * len(module_names) // num_ranges]
+            for i in range(num_ranges)]
+  pool = multiprocessing.Pool(jobs, _init_worker, (options,))
+  try:
+    results = pool.map(_get_archive_items, ranges, chunksize=1)
+  finally:
+    pool.close()
+    pool.join()
+  # A module imported by several processes is taken from the first range that
+  # imports it, which is the one that a single loader would have imported it
+  # for.
+  items = {}
+  for range_items in results:
+    for item in range_items:
+      items.setdefault(item[0], item)
+  serialize_ast.StoreArchive([items[name] for name in sorted(items)], filename)
+
+
+# The directories, relative to pytype/, that a stub archive packs.
+_STUB_ARCHIVE_DIRECTORIES = ["typeshed", "pytd/builtins", "pytd/stdlib"]
+
+# The Python versions for which a stub archive has the typeshed module lookups.
+_STUB_ARCHIVE_VERSIONS = [(2, 7), (3, 4), (3, 5), (3, 6)]
+
+
+def generate_stub_archive(options):
+  """Pack typeshed and pytype's own pytd files into a stub archive."""
+  files = {}
+  for directory in _STUB_ARCHIVE_DIRECTORIES:
+    for filename in pytype_source_utils.list_pytype_files(directory):
+      path = os.path.join(directory, filename)
+      files[path] = pytype_source_utils.load_pytype_file(path)
+  t = typeshed.Typeshed()
+  modules = {"%d.%d" % version: t.find_module_files(version)
+             for version in _STUB_ARCHIVE_VERSIONS}
+  stub_archive.write(options.generate_stub_archive, files, modules)
+
+
+def compile_imports_info(options):
+  """Write the imports map given with --imports_info in its compiled form."""
+  imports_map_loader.write_compiled_imports_map(options.compile_imports_info,
+                                                options.imports_map)
+
+
 def parse_pyi(options):
   """Tries parsing a PYI file."""
   loader = load_pytd.create_loader(options)
@@ -0,0 +1,71 @@
+"""Tests for io.py."""
+
+import os
+
+from pytype import config
+from pytype import file_utils
+from pytype import io
+from pytype import load_pytd
+from pytype import pytype_source_utils
+from pytype.pytd import stub_archive
+from pytype.pytd import typeshed
+
+import unittest
+
+
+class SaveModulesToPickleTest(unittest.TestCase):
+  """Tests for io.save_modules_to_pickle."""
+
+  PYTHON_VERSION = (2, 7)
+  MODULE_NAMES = ["abc", "collections", "json", "os", "re", "textwrap"]
+
+  def _save(self, temp_dir, jobs):
+    filename = os.path.join(temp_dir.path, "builtins-%d.pickle" % jobs)
+    options = config.Options.create(python_version=self.PYTHON_VERSION,
+                                    generate_builtins_jobs=jobs)
+    io.save_modules_to_pickle(options, self.MODULE_NAMES, filename)
+    with open(filename, "rb") as fi:
+      return filename, fi.read()
+
+  def test_parallel(self):
+    with file_utils.Tempdir() as d:
+      _, serial = self._save(d, jobs=1)
+      filename, parallel = self._save(d, jobs=3)
+      self.assertEqual(serial, parallel)
+      loader = load_pytd.PickledPyiLoader.load_from_pickle(
+          filename, base_module=None, python_version=self.PYTHON_VERSION)
+      self.assertTrue(loader.import_name("textwrap").Lookup("textwrap.dedent"))
+
+
+class GenerateStubArchiveTest(unittest.TestCase):
+  """Tests for io.generate_stub_archive."""
+
+  def test_generate(self):
+    with file_utils.Tempdir() as d:
+      filename = os.path.join(d.path, "stubs")
+      options = config.Options.create(generate_stub_archive=filename)
+      io.generate_stub_archive(options)
+      plain = typeshed.Typeshed()
+      archive = stub_archive.StubArchive(filename)
+      pytype_source_utils.use_stub_archive(archive)
+      try:
+        packed = typeshed.Typeshed()
+        # (3, 3) isn't precomputed, so it's looked up in the archive's index.
+        for version in [(2, 7), (3, 6), (3, 3)]:
+          for module in ["os", "os.path", "json", "collections"]:
+            self.assertEqual(plain.get_module_file("stdlib", module, version),
+                             packed.get_module_file("stdlib", module, version))
+        self.assertEqual(plain.get_module_file("stdlib", "asyncio", (3, 6)),
+                         packed.get_module_file("stdlib", "asyncio", (3, 6)))
+        self.assertRaises(IOError, packed.get_module_file, "stdlib", "asyncio",
+                          (2, 7))
+        self.assertEqual(
+            pytype_source_utils.load_pytype_file("pytd/builtins/3/typing.pytd"),
+            archive.load_file("pytd/builtins/3/typing.pytd"))
+      finally:
+        pytype_source_utils.use_stub_archive(None)
+        archive.close()
+
+
+if __name__ == "__main__":
+  unittest.main()
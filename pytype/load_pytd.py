@@ -1,9 +1,12 @@
 """Load and link .pyi files."""
 
+import hashlib
 import logging
 import os
 
+from pytype import __version__
 from pytype import file_utils
+from pytype import metrics
 from pytype import module_utils
 from pytype import utils
 from pytype.pyi import parser
@@ -16,6 +19,8 @@ from six.moves import cPickle
 
 log = logging.getLogger(__name__)
 
+_interned_bytes = metrics.Counter("load_pytd_interned_bytes")
+
 
 LOADER_ATTR_TO_CONFIG_OPTION_MAP = {
     "base_module": "module_name",
@@ -23,14 +28,29 @@ LOADER_ATTR_TO_CONFIG_OPTION_MAP = {
     "pythonpath": "pythonpath",
     "imports_map": "imports_map",
     "use_typeshed": "typeshed",
+    "pyi_cache_dir": "pyi_cache_dir",
+    "lazy_dependencies": "lazy_pyi_dependencies",
 }
 
 
-def create_loader(options):
-  """Create a pytd loader."""
+def create_loader(options, modules=None):
+  """Create a pytd loader.
+
+  Args:
+    options: config.Options object.
+    modules: Optionally, modules to seed the loader with, as returned by
+      Loader.get_reusable_modules() of a loader created with the same options.
+
+  Returns:
+    A Loader.
+  """
   kwargs = {attr: getattr(options, opt)
             for attr, opt in LOADER_ATTR_TO_CONFIG_OPTION_MAP.items()}
-  if options.precompiled_builtins:
+  if modules:
+    loader_cls = (PickledPyiLoader if options.precompiled_builtins or
+                  options.use_pickled_files else Loader)
+    return loader_cls(modules=modules, **kwargs)
+  elif options.precompiled_builtins:
     return PickledPyiLoader.load_from_pickle(
         options.precompiled_builtins, **kwargs)
   elif options.use_pickled_files:
@@ -57,22 +77,215 @@ class Module(object):
       unique.
     ast: The parsed PyTD. Internal references will be resolved, but
       NamedType nodes referencing other modules might still be unresolved.
-    pickle: The AST as a pickled string. As long as this field is not None, the
-      ast will be None.
+    pickle: The serialize_ast.ArchiveEntry to read the AST from. As long as
+      this field is not None, the ast will be None.
     dirty: The initial value of the dirty attribute.
+    source_hash: The hash of the file the ast was parsed from, as returned by
+      get_source_hash, or None if the ast didn't come from a file on disk.
+    dependencies: For modules loaded from an archive or returned by
+      Loader.get_reusable_modules(), the names of the modules this one
+      references.
+    search_paths: For modules that were looked for on the pythonpath, the path
+      (without extension) of the module in each pythonpath entry, in order.
+    dependency_hashes: A map, module name to (filename, source hash), of the
+      modules loaded from files that the ast was resolved against, directly or
+      through other modules.
   """
 
   def __init__(self, module_name, filename, ast,
-               pickle=None, dirty=True):
+               pickle=None, dirty=True, source_hash=None, dependencies=(),
+               search_paths=(), dependency_hashes=None):
     self.module_name = module_name
     self.filename = filename
     self.ast = ast
     self.pickle = pickle
     self.dirty = dirty
+    self.source_hash = source_hash
+    self.dependencies = dependencies
+    self.search_paths = search_paths
+    self.dependency_hashes = dependency_hashes or {}
 
   def needs_unpickling(self):
     return bool(self.pickle)
 
+  def is_builtin(self):
+    """Whether the module ships with pytype (or typeshed)."""
+    # Modules from precompiled builtins have no filename.
+    return self.filename is None or self.filename.startswith(Loader.PREFIX)
+
+  def is_up_to_date(self):
+    """Whether the module can be reused without reloading it."""
+    if self.search_paths:
+      # The module resolves differently if a file or package for it has
+      # appeared earlier on the pythonpath, or if its own file is gone.
+      expected = None if self.is_builtin() else self.filename
+      if find_pyi(self.search_paths) != expected:
+        return False
+    if self.is_builtin():
+      return True
+    if self.source_hash is None:
+      return False
+    try:
+      return get_source_hash(self.filename) == self.source_hash
+    except (IOError, OSError):
+      return False
+
+
+def find_pyi(search_paths):
+  """Find the file that Loader loads a module on the pythonpath from.
+
+  Args:
+    search_paths: The path (without extension) of the module in each pythonpath
+      entry, in order.
+
+  Returns:
+    The filename, or None if the module isn't on the pythonpath. For a
+    directory without an __init__.pyi, this is the __init__.pyi that Loader
+    pretends is empty.
+  """
+  for path in search_paths:
+    if os.path.isdir(path):
+      return os.path.join(path, "__init__.pyi")
+    full_path = path + ".pyi"
+    if os.path.exists(full_path) and not os.path.isdir(full_path):
+      return full_path
+  return None
+
+
+def get_loader_key(options):
+  """The options that determine which files a loader loads for a module.
+
+  Loaders created with options that have the same key can share modules; see
+  Loader.get_reusable_modules().
+
+  Args:
+    options: config.Options object.
+
+  Returns:
+    A hashable key.
+  """
+  imports_map = options.imports_map
+  if imports_map is not None:
+    imports_map = tuple(sorted(imports_map.items()))
+  return (tuple(options.python_version), tuple(options.pythonpath), imports_map,
+          options.typeshed, options.precompiled_builtins,
+          options.use_pickled_files, options.lazy_pyi_dependencies)
+
+
+def filter_reusable_modules(modules):
+  """Drop the modules that are no longer valid.
+
+  A module loaded from a .pyi file is invalid if the file's contents have
+  changed since it was loaded, a module is invalid if it would now be loaded
+  from a different file, and a module is invalid if any module it depends on
+  is.
+
+  Args:
+    modules: A dict, module name to Module, as returned by
+      Loader.get_reusable_modules().
+
+  Returns:
+    A new dict, module name to Module.
+  """
+  valid = {name: module for name, module in modules.items()
+           if module.is_up_to_date()}
+  # Drop the modules with dependencies that aren't valid, until we reach a
+  # fixed point.
+  changed = True
+  while changed:
+    changed = False
+    for name, module in list(valid.items()):
+      if any(d != name and d not in valid for d in module.dependencies):
+        del valid[name]
+        changed = True
+  if "__builtin__" not in valid or "typing" not in valid:
+    return {}
+  return valid
+
+
+def get_source_hash(filename):
+  """Hash the contents of a file, for PyiCache and reused modules."""
+  with open(filename, "rb") as fi:
+    return hashlib.sha256(fi.read()).hexdigest()
+
+
+class PyiCache(object):
+  """A directory of parsed and resolved .pyi files.
+
+  An entry holds a module as serialize_ast.EncodeAst stores it, along with the
+  hash of the source it was parsed from and the filenames and hashes of the
+  files it was resolved against. There's one entry per filename, module name,
+  Python version, pytype version and way of resolving dependencies, which is
+  overwritten when the file changes, so the directory doesn't grow without
+  bound.
+  """
+
+  def __init__(self, directory, lazy_dependencies=False):
+    self.directory = directory
+    self.lazy_dependencies = lazy_dependencies
+
+  def _path(self, filename, module_name, python_version):
+    key = (os.path.abspath(filename), module_name, tuple(python_version),
+           __version__.__version__)
+    if self.lazy_dependencies:
+      key += ("lazy",)
+    key = repr(key)
+    return os.path.join(self.directory,
+                        hashlib.sha256(key.encode("utf-8")).hexdigest() +
+                        ".pickled")
+
+  def get(self, filename, module_name, python_version, source_hash):
+    """Get an entry for a file.
+
+    Args:
+      filename: The filename of the module.
+      module_name: The name of the module.
+      python_version: The Python version the module is loaded for.
+      source_hash: The current hash of filename.
+
+    Returns:
+      A tuple of the serialize_ast.SerializableAst and the dependency hashes
+      (see Module.dependency_hashes), or None if there is no entry or it is out
+      of date, either because filename or a file it was resolved against has
+      changed.
+    """
+    path = self._path(filename, module_name, python_version)
+    try:
+      cached_hash, dependency_hashes, data = pytd_utils.LoadPickle(path)
+      if cached_hash != source_hash:
+        return None
+      for dependency, dependency_hash in dependency_hashes.values():
+        try:
+          changed = get_source_hash(dependency) != dependency_hash
+        except (IOError, OSError):
+          changed = True
+        if changed:
+          log.info("Ignoring pyi cache entry for %s: %s has changed",
+                   filename, dependency)
+          return None
+      return serialize_ast.DecodeAst(data), dependency_hashes
+    except (IOError, OSError, EOFError, ValueError,
+            cPickle.UnpicklingError) as e:
+      if os.path.exists(path):
+        log.warning("Ignoring unreadable pyi cache entry %s: %s", path, e)
+      return None
+
+  def put(self, filename, module_name, python_version, source_hash,
+          dependency_hashes, ast):
+    """Store the resolved ast of a file."""
+    data = serialize_ast.EncodeAst(ast)
+    path = self._path(filename, module_name, python_version)
+    # Write to a temporary file first, so that concurrent readers never see a
+    # partially written entry.
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    try:
+      if not os.path.isdir(self.directory):
+        os.makedirs(self.directory)
+      pytd_utils.SavePickle((source_hash, dependency_hashes, data), tmp_path)
+      os.rename(tmp_path, path)
+    except (IOError, OSError) as e:
+      log.warning("Could not write pyi cache entry %s: %s", path, e)
+
 
 class BadDependencyError(Exception):
   """If we can't resolve a module referenced by the one we're trying to load."""
@@ -94,8 +307,18 @@ class Loader(object):
     base_module: The full name of the module we're based in (i.e., the module
       that's importing other modules using this loader).
     _modules: A map, filename to Module, for caching modules already loaded.
-    _concatenated: A concatenated pytd of all the modules. Refreshed when
-                   necessary.
+    _concatenated: A pytd_utils.LazyConcat of all the modules. Modules are
+                   added to it when concat_all is called.
+    _pyi_cache: A PyiCache for the .pyi files we load, or None.
+    _interner: A visitors.InternNodes that shares nodes between the modules we
+               load.
+    _directory_entries: A map, directory to the names of the files in it, for
+                        the directories on the pythonpath that we've looked at.
+    lazy_dependencies: Whether to load the modules that a module only
+                       references in the types of its functions and constants
+                       or in its from-imports when convert.Converter first
+                       needs one of those types (see
+                       visitors.DeferExternalTypes), rather than right away.
   """
 
   PREFIX = "pytd:"  # for pytd files that ship with pytype
@@ -106,7 +329,10 @@ class Loader(object):
                pythonpath=(),
                imports_map=None,
                use_typeshed=True,
-               modules=None):
+               modules=None,
+               pyi_cache_dir=None,
+               lazy_dependencies=False):
+    self._interner = visitors.InternNodes()
     self._modules = modules or self._base_modules(python_version)
     if self._modules["__builtin__"].needs_unpickling():
       self._unpickle_module(self._modules["__builtin__"])
@@ -119,22 +345,77 @@ class Loader(object):
     self.pythonpath = pythonpath
     self.imports_map = imports_map
     self.use_typeshed = use_typeshed
-    self._concatenated = None
+    self.pyi_cache_dir = pyi_cache_dir
+    self.lazy_dependencies = lazy_dependencies
+    self._pyi_cache = (PyiCache(pyi_cache_dir, lazy_dependencies)
+                       if pyi_cache_dir else None)
+    self._concatenated = pytd_utils.LazyConcat(name="<all>")
     self._import_name_cache = {}  # performance cache
+    self._directory_entries = {}
     # Paranoid verification that pytype.main properly checked the flags:
     if imports_map is not None:
       assert pythonpath == [""], pythonpath
 
-  def save_to_pickle(self, filename):
-    """Save to a pickle. See PickledPyiLoader.load_from_pickle for reverse."""
+  def get_archive_items(self):
+    """Encode all modules, as the items of a serialize_ast.StoreArchive call.
+
+    Returns:
+      A list of (module name, encoded ast, dependencies) tuples, sorted by
+      module name.
+    """
     # We assume that the Loader is in a consistent state here. In particular, we
     # assume that for every module in _modules, all the transitive dependencies
     # have been loaded.
-    items = tuple((name, serialize_ast.StoreAst(module.ast))
-                  for name, module in sorted(self._modules.items()))
-    # Now pickle the pickles. We keep the "inner" modules as pickles as a
-    # performance optimization - unpickling is slow.
-    pytd_utils.SavePickle(items, filename, compress=True)
+    items = []
+    for name, module in sorted(self._modules.items()):
+      dependencies = self._collect_ast_dependencies(module.ast)
+      items.append((name, serialize_ast.EncodeAst(module.ast), dependencies))
+    return items
+
+  def save_to_pickle(self, filename):
+    """Save to a pickle. See PickledPyiLoader.load_from_pickle for reverse."""
+    # Store each module separately, so that loading the archive only decodes
+    # the modules a program imports - decoding is slow.
+    serialize_ast.StoreArchive(self.get_archive_items(), filename)
+
+  def get_module_names(self):
+    """Get the names of the modules loaded so far, sorted."""
+    return sorted(self._modules)
+
+  def get_reusable_modules(self, include_files=False):
+    """Get the modules that a new loader with the same options can start with.
+
+    These are the fully resolved modules that ship with pytype or typeshed and,
+    if include_files is set, the ones loaded from .pyi files, as long as they
+    don't depend on any other modules. Their ASTs are shared with this loader,
+    which is fine since resolved ASTs aren't modified anymore.
+
+    Args:
+      include_files: Whether to include modules loaded from .pyi files on the
+        pythonpath or in the imports map. Whoever seeds a loader with these
+        should pass them through filter_reusable_modules() first, in case the
+        files have changed.
+
+    Returns:
+      A dict, module name to Module.
+    """
+    modules = {}
+    for name, module in self._modules.items():
+      if not module.is_builtin() and (
+          not include_files or module.source_hash is None):
+        continue
+      if module.needs_unpickling():
+        deps = module.dependencies
+      elif module.ast and not module.dirty:
+        deps = self._collect_ast_dependencies(module.ast)
+      else:
+        continue
+      modules[name] = Module(name, module.filename, module.ast,
+                             pickle=module.pickle, dirty=False,
+                             source_hash=module.source_hash,
+                             dependencies=deps,
+                             search_paths=module.search_paths)
+    return filter_reusable_modules(modules)
 
   def _unpickle_module(self, module):
     raise NotImplementedError()  # overwritten in PickledPyiLoader
@@ -160,18 +441,59 @@ class Loader(object):
     assert ast.name == module
     return ast
 
-  def _postprocess_pyi(self, ast):
-    """Apply all the PYI transformations we need."""
+  def _postprocess_pyi(self, ast, lazy=False, dependencies=None):
+    """Apply all the PYI transformations we need.
+
+    Args:
+      ast: The pytd.TypeDeclUnit to transform.
+      lazy: Whether to defer the types of other modules that we can.
+      dependencies: If given, a set that the names of the modules the ast is
+        resolved against are added to.
+
+    Returns:
+      The transformed pytd.TypeDeclUnit.
+    """
+    if dependencies is None:
+      dependencies = set()
     package_name = module_utils.get_package_name(ast.name, ast.is_package)
     if package_name:
       ast = ast.Visit(visitors.QualifyRelativeNames(package_name))
     ast = ast.Visit(visitors.LookupBuiltins(self.builtins, full_names=False))
     ast = ast.Visit(visitors.ExpandCompatibleBuiltins(self.builtins))
-    dependencies = self._collect_ast_dependencies(ast)
-    if dependencies:
-      self._load_ast_dependencies(dependencies, ast)
+    if lazy:
+      ignore = [ast.name, "__builtin__", "typing"]
+      # Modules that are referenced somewhere we can't defer are loaded
+      # anyway, so resolve all references to them right away.
+      ignore.extend(self._collect_ast_dependencies(
+          ast.Visit(visitors.DeferExternalTypes(ignore))))
+      ast = ast.Visit(visitors.DeferExternalTypes(ignore))
+    direct_dependencies = self._collect_ast_dependencies(ast)
+    if direct_dependencies:
+      dependencies.update(direct_dependencies)
+      self._load_ast_dependencies(direct_dependencies, ast)
       ast = self._resolve_external_types(ast)
     ast = ast.Visit(visitors.LookupLocalTypes())
+    undeferred = set()
+    while lazy:
+      # Names that we resolved to other modules' deferred from-imports, or to
+      # our own, might need to be resolved further.
+      undefer = visitors.DeferExternalTypes(ignore)
+      ast = ast.Visit(undefer)
+      if undefer.undeferred <= undeferred:
+        break
+      undeferred |= undefer.undeferred
+      direct_dependencies = self._collect_ast_dependencies(ast)
+      dependencies.update(direct_dependencies)
+      self._load_ast_dependencies(direct_dependencies, ast)
+      ast = self._resolve_external_types(ast)
+      ast = ast.Visit(visitors.LookupLocalTypes())
+    return ast
+
+  def _intern(self, ast):
+    """Share the nodes of a module that isn't resolved yet with other modules."""
+    saved_bytes = self._interner.saved_bytes
+    ast = ast.Visit(self._interner)
+    _interned_bytes.inc(self._interner.saved_bytes - saved_bytes)
     return ast
 
   def _create_empty(self, module_name, filename):
@@ -189,34 +511,86 @@ class Loader(object):
 
   def load_file(self, module_name, filename, ast=None):
     """Load (or retrieve from cache) a module and resolve its dependencies."""
-    self._concatenated = None  # invalidate
     # Check for an existing ast first
     existing = self._get_existing_ast(module_name)
     if existing:
       return existing
+    source_hash = None
     if not ast:
+      # Hash the file before parsing it, so that a concurrent change makes the
+      # module look out of date rather than up to date.
+      source_hash = get_source_hash(filename)
+      if self._pyi_cache:
+        cached = self._load_cached_file(module_name, filename, source_hash)
+        if cached:
+          return cached
       ast = parser.parse_file(filename=filename, name=module_name,
                               python_version=self.python_version)
-    return self._process_module(module_name, filename, ast)
+    return self._process_module(module_name, filename, ast, source_hash)
 
-  def _process_module(self, module_name, filename, ast):
+  def _load_cached_file(self, module_name, filename, source_hash):
+    """Load a module from the pyi cache, or return None on a cache miss."""
+    entry = self._pyi_cache.get(filename, module_name, self.python_version,
+                                source_hash)
+    if not entry:
+      return None
+    loaded_ast, dependency_hashes = entry
+    dependencies = [d for d in loaded_ast.dependencies
+                    if d != loaded_ast.ast.name]
+    loaded_ast = serialize_ast.EnsureAstName(loaded_ast, module_name, fix=True)
+    # Interning creates new nodes, so the ones in the index are stale.
+    loaded_ast = loaded_ast.Replace(ast=self._intern(loaded_ast.ast),
+                                    class_type_nodes=None,
+                                    function_type_nodes=None)
+    self._modules[module_name] = Module(module_name, filename, loaded_ast.ast,
+                                        source_hash=source_hash,
+                                        dependency_hashes=dependency_hashes)
+    try:
+      self._load_ast_dependencies(dependencies, loaded_ast.ast, module_name)
+      for name, (dependency, dependency_hash) in dependency_hashes.items():
+        existing = self._modules.get(name)
+        if existing and (existing.filename, existing.source_hash) != (
+            dependency, dependency_hash):
+          raise BadDependencyError(
+              "%s is now loaded from %s" % (name, existing.filename))
+      ast = serialize_ast.ProcessAst(loaded_ast, self._get_module_map())
+    except (BadDependencyError, serialize_ast.UnrestorableDependencyError) as e:
+      # A dependency has changed in a way that the cached ast doesn't fit, so
+      # parse the file again.
+      log.info("Ignoring pyi cache entry for %s: %s", filename, e)
+      del self._modules[module_name]
+      return None
+    self._modules[module_name].ast = ast
+    return ast
+
+  def _process_module(self, module_name, filename, ast, source_hash=None):
     """Create a module from a loaded ast and save it to the loader cache.
 
     Args:
       module_name: The fully qualified name of the module being imported.
       filename: The file the ast was generated from.
       ast: The pytd.TypeDeclUnit representing the module.
+      source_hash: The hash of filename before it was parsed, if the ast was
+        parsed from a file on disk.
 
     Returns:
       The ast (pytd.TypeDeclUnit) as represented in this loader.
     """
-    module = Module(module_name, filename, ast)
+    module = Module(module_name, filename, ast, source_hash=source_hash)
     self._modules[module_name] = module
     try:
-      module.ast = self._postprocess_pyi(module.ast)
+      dependencies = set()
+      module.ast = self._postprocess_pyi(module.ast, self.lazy_dependencies,
+                                         dependencies)
+      module.dependency_hashes = self.get_dependency_hashes(
+          dependencies - {module_name})
       # Now that any imported TypeVar instances have been resolved, adjust type
       # parameters in classes and functions.
       module.ast = module.ast.Visit(visitors.AdjustTypeParameters())
+      if self._pyi_cache and source_hash:
+        self._pyi_cache.put(filename, module_name, self.python_version,
+                            source_hash, module.dependency_hashes, module.ast)
+      module.ast = self._intern(module.ast)
       # Now we can fill in internal cls pointers to ClassType nodes in the
       # module. This code executes when the module is first loaded, which
       # happens before any others use it to resolve dependencies, so there are
@@ -230,6 +604,27 @@ class Loader(object):
       raise
     return module.ast
 
+  def get_dependency_hashes(self, dependencies):
+    """Get the files that modules were loaded from and resolved against.
+
+    Args:
+      dependencies: Module names. Names of modules that aren't loaded are
+        ignored.
+
+    Returns:
+      A dict, module name to (filename, source hash), of the named modules that
+      were loaded from files and of the ones they were resolved against.
+    """
+    hashes = {}
+    for name in dependencies:
+      module = self._modules.get(name)
+      if not module:
+        continue
+      if module.source_hash:
+        hashes[name] = (module.filename, module.source_hash)
+      hashes.update(module.dependency_hashes)
+    return hashes
+
   def _collect_ast_dependencies(self, ast):
     """Goes over an ast and returns all references module names."""
     deps = visitors.CollectDependencies()
@@ -380,21 +775,22 @@ class Loader(object):
     if mod:
       return mod
 
-    file_ast = self._import_file(module_name, module_name.split("."))
-    if file_ast:
-      return file_ast
-
-    # The standard library is (typically) towards the end of PYTHONPATH.
-    mod = self._load_builtin("stdlib", module_name)
-    if mod:
-      return mod
-
+    mod = self._import_file(module_name, module_name.split("."))
+    if not mod:
+      # The standard library is (typically) towards the end of PYTHONPATH.
+      mod = self._load_builtin("stdlib", module_name)
     # Third party modules from typeshed (typically site-packages) come last.
-    if not self.imports_map:
+    if not mod and not self.imports_map:
       mod = self._load_builtin(
           "third_party", module_name, third_party_only=True)
-      if mod:
-        return mod
+    if mod:
+      if self.imports_map is None:
+        # Remember where we looked, so that reusing the module can tell whether
+        # it would be found somewhere else now.
+        self._modules[module_name].search_paths = tuple(
+            os.path.join(searchdir, *module_name.split("."))
+            for searchdir in self.pythonpath)
+      return mod
 
     log.warning("Couldn't import module %s %r in (path=%r) imports_map: %s",
                 module_name, module_name, self.pythonpath,
@@ -422,6 +818,8 @@ class Loader(object):
     """
     for searchdir in self.pythonpath:
       path = os.path.join(searchdir, *module_name_split)
+      if self.imports_map is None and not self._may_exist(path):
+        continue
       # See if this is a directory with a "__init__.py" defined.
       # (These also get automatically created in imports_map_loader.py)
       init_path = os.path.join(path, "__init__")
@@ -443,6 +841,37 @@ class Loader(object):
           return file_ast
     return None
 
+  def _list_directory(self, directory):
+    """Get the names of the files in a directory, or an empty set."""
+    if directory not in self._directory_entries:
+      try:
+        entries = frozenset(os.listdir(directory or os.curdir))
+      except OSError:
+        entries = frozenset()
+      self._directory_entries[directory] = entries
+    return self._directory_entries[directory]
+
+  def _may_exist(self, path):
+    """Whether path is a directory or path + ".pyi" a file, or might be.
+
+    Every module we import is looked for in every directory on the pythonpath,
+    so most lookups fail. Listing each directory once and answering these from
+    the listing spares us the stats of the failed lookups.
+
+    Args:
+      path: Path to a module (without '.pyi' or similar extension).
+    Returns:
+      False if neither path nor path + ".pyi" exist.
+    """
+    directory, name = os.path.split(path)
+    if not name:
+      # The empty module name of a relative import from a top-level module
+      # leads to a path that ends in a separator. It names the search
+      # directory itself, which isn't listed.
+      return True
+    entries = self._list_directory(directory)
+    return name in entries or name + ".pyi" in entries
+
   def _load_pyi(self, path, module_name):
     """Load a pyi from the path.
 
@@ -454,12 +883,14 @@ class Loader(object):
       find the module.
     """
     if self.imports_map is not None:
+      # build_imports_map has checked that the files in the map exist, so the
+      # map itself tells us whether the module does, without a stat.
       if path in self.imports_map:
-        full_path = self.imports_map[path]
+        return self.load_file(filename=self.imports_map[path],
+                              module_name=module_name)
       else:
         return None
-    else:
-      full_path = path + ".pyi"
+    full_path = path + ".pyi"
 
     # We have /dev/null entries in the import_map - os.path.isfile() returns
     # False for those. However, we *do* want to load them. Hence exists / isdir.
@@ -469,11 +900,10 @@ class Loader(object):
       return None
 
   def concat_all(self):
-    if not self._concatenated:
-      self._concatenated = pytd_utils.Concat(
-          *(module.ast for module in self._modules.values()
-            if module.ast),
-          name="<all>")
+    """Get a pytd_utils.LazyConcat of all the modules loaded so far."""
+    for module in self._modules.values():
+      if module.ast:
+        self._concatenated.Add(module.ast)
     return self._concatenated
 
   def _get_module_map(self):
@@ -497,10 +927,22 @@ class PickledPyiLoader(Loader):
 
   @classmethod
   def load_from_pickle(cls, filename, base_module, **kwargs):
-    items = pytd_utils.LoadPickle(filename, compress=True)
+    """Create a loader from an archive written by Loader.save_to_pickle.
+
+    The modules in the archive are unpickled when they're first imported.
+
+    Args:
+      filename: The filename of the archive.
+      base_module: See Loader.
+      **kwargs: See Loader.
+
+    Returns:
+      A PickledPyiLoader.
+    """
     modules = {
-        name: Module(name, filename=None, ast=None, pickle=pickle, dirty=False)
-        for name, pickle in items
+        name: Module(name, filename=None, ast=None, pickle=entry, dirty=False,
+                     dependencies=entry.dependencies)
+        for name, entry in serialize_ast.LoadArchive(filename).items()
     }
     return cls(base_module=base_module, modules=modules, **kwargs)
 
@@ -518,9 +960,12 @@ class PickledPyiLoader(Loader):
         seen.add(m)
       if not m.pickle:
         continue
-      loaded_ast = cPickle.loads(m.pickle)
+      loaded_ast = serialize_ast.DecodeAst(m.pickle.Load())
       deps = [d for d in loaded_ast.dependencies if d != loaded_ast.ast.name]
       loaded_ast = serialize_ast.EnsureAstName(loaded_ast, m.module_name)
+      loaded_ast = loaded_ast.Replace(ast=self._intern(loaded_ast.ast),
+                                      class_type_nodes=None,
+                                      function_type_nodes=None)
       assert m.module_name in self._modules
       todo.extend(self._modules[dependency] for dependency in deps)
       newly_loaded_asts.append(loaded_ast)
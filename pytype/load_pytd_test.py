@@ -232,6 +232,229 @@ class ImportPathsTest(unittest.TestCase):
       ast = loader.import_name("pkg.sub")
       self.assertTrue(ast.Lookup("pkg.sub.X"))
 
+  def testReusableModules(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", "import sys\nx = ...  # type: sys.flags")
+      loader = load_pytd.Loader(
+          "base", self.PYTHON_VERSION, pythonpath=[d.path])
+      loader.import_name("foo")
+      modules = loader.get_reusable_modules()
+      self.assertIn("sys", modules)
+      self.assertNotIn("foo", modules)  # not shipped with pytype
+      self.assertIs(modules["sys"].ast, loader.import_name("sys"))
+      loader2 = load_pytd.Loader(
+          "base", self.PYTHON_VERSION, pythonpath=[d.path], modules=modules)
+      self.assertIs(loader2.import_name("sys"), modules["sys"].ast)
+      self.assertTrue(loader2.import_name("foo").Lookup("foo.x"))
+
+  def testReusableFileModules(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", "class X: ...")
+      d.create_file("bar.pyi", "import foo\ny = ...  # type: foo.X")
+      d.create_file("baz.pyi", "z = ...  # type: str")
+      loader = load_pytd.Loader(
+          "base", self.PYTHON_VERSION, pythonpath=[d.path])
+      loader.import_name("bar")
+      loader.import_name("baz")
+      modules = loader.get_reusable_modules(include_files=True)
+      self.assertIn("foo", modules)
+      self.assertIn("bar", modules)
+      self.assertEqual(modules,
+                       load_pytd.filter_reusable_modules(modules))
+      # Regenerating foo.pyi invalidates foo and bar, but not baz.
+      d.create_file("foo.pyi", "class X: ...\nclass Y: ...")
+      modules = load_pytd.filter_reusable_modules(modules)
+      self.assertNotIn("foo", modules)
+      self.assertNotIn("bar", modules)
+      self.assertIn("baz", modules)
+      loader2 = load_pytd.Loader(
+          "base", self.PYTHON_VERSION, pythonpath=[d.path], modules=modules)
+      self.assertIs(loader2.import_name("baz"), modules["baz"].ast)
+      self.assertTrue(loader2.import_name("foo").Lookup("foo.Y"))
+
+  def testReusableModuleShadowed(self):
+    with file_utils.Tempdir() as d1:
+      with file_utils.Tempdir() as d2:
+        d2.create_file("foo.pyi", "x = ...  # type: int")
+        loader = load_pytd.Loader(
+            "base", self.PYTHON_VERSION, pythonpath=[d1.path, d2.path])
+        loader.import_name("foo")
+        modules = loader.get_reusable_modules(include_files=True)
+        self.assertIn("foo", load_pytd.filter_reusable_modules(modules))
+        # A foo.pyi earlier on the pythonpath takes precedence.
+        d1.create_file("foo.pyi", "x = ...  # type: str")
+        modules = load_pytd.filter_reusable_modules(modules)
+        self.assertNotIn("foo", modules)
+        loader2 = load_pytd.Loader(
+            "base", self.PYTHON_VERSION, pythonpath=[d1.path, d2.path],
+            modules=modules)
+        self.assertEqual(loader2.import_name("foo").Lookup("foo.x").type.name,
+                         "__builtin__.str")
+
+  def testReusableModuleSameStat(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("foo.pyi", "x = ...  # type: int")
+      os.utime(filename, (0, 0))
+      loader = load_pytd.Loader(
+          "base", self.PYTHON_VERSION, pythonpath=[d.path])
+      loader.import_name("foo")
+      modules = loader.get_reusable_modules(include_files=True)
+      # A rewrite with the same size and mtime still invalidates the module.
+      d.create_file("foo.pyi", "x = ...  # type: str")
+      os.utime(filename, (0, 0))
+      self.assertNotIn("foo", load_pytd.filter_reusable_modules(modules))
+
+  def testPyiCache(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", "class X: ...")
+      d.create_file("bar.pyi", "import foo\ny = ...  # type: foo.X")
+      cache_dir = os.path.join(d.path, "cache")
+      loader = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                pythonpath=[d.path], pyi_cache_dir=cache_dir)
+      loader.import_name("bar")
+      self.assertEqual(len(os.listdir(cache_dir)), 2)
+      loader2 = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                 pythonpath=[d.path], pyi_cache_dir=cache_dir)
+      bar = loader2.import_name("bar")
+      self.assertIs(bar.Lookup("bar.y").type.cls,
+                    loader2.import_name("foo").Lookup("foo.X"))
+      # The first loader's ast is still intact after storing it.
+      self.assertIsNotNone(
+          loader.import_name("bar").Lookup("bar.y").type.cls)
+      # Changing foo.pyi replaces its cache entry.
+      d.create_file("foo.pyi", "class X: ...\nclass Y: ...")
+      loader3 = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                 pythonpath=[d.path], pyi_cache_dir=cache_dir)
+      self.assertTrue(loader3.import_name("foo").Lookup("foo.Y"))
+      self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+  def testPyiCacheDependencyChange(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", """
+          class A: ...
+          class C: ...
+          x = ...  # type: int
+          B = A""")
+      d.create_file("bar.pyi", "from foo import x, B")
+      cache_dir = os.path.join(d.path, "cache")
+      loader = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                pythonpath=[d.path], pyi_cache_dir=cache_dir)
+      loader.import_name("bar")
+      # bar is resolved against foo, so changing foo invalidates bar's entry.
+      d.create_file("foo.pyi", """
+          class A: ...
+          class C: ...
+          x = ...  # type: str
+          B = C""")
+      loader2 = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                 pythonpath=[d.path], pyi_cache_dir=cache_dir)
+      bar = loader2.import_name("bar")
+      self.assertEqual(bar.Lookup("bar.x").type.type.name, "__builtin__.str")
+      self.assertEqual(bar.Lookup("bar.B").type.name, "foo.C")
+
+  def testPythonpathOrder(self):
+    with file_utils.Tempdir() as d1:
+      with file_utils.Tempdir() as d2:
+        d1.create_file("foo/__init__.pyi", "x = ...  # type: int")
+        d2.create_file("foo.pyi", "x = ...  # type: str")
+        d2.create_file("bar.pyi", "y = ...  # type: str")
+        loader = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                  pythonpath=[d1.path, d2.path])
+        foo = loader.import_name("foo")
+        self.assertEqual(foo.Lookup("foo.x").type.name, "__builtin__.int")
+        self.assertTrue(loader.import_name("bar"))
+        self.assertIsNone(loader.import_name("baz"))
+
+  def testSharedNodes(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", """
+        class X: ...
+        def f(x: X) -> int: ...
+      """)
+      d.create_file("bar.pyi", """
+        import foo
+        def g(x: foo.X) -> int: ...
+      """)
+      loader = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                pythonpath=[d.path])
+      foo = loader.import_name("foo")
+      bar = loader.import_name("bar")
+      f_sig, = foo.Lookup("foo.f").signatures
+      g_sig, = bar.Lookup("bar.g").signatures
+      self.assertIs(f_sig.return_type, g_sig.return_type)
+      self.assertIs(f_sig.params[0].type, g_sig.params[0].type)
+      self.assertIs(g_sig.params[0].type.cls, foo.Lookup("foo.X"))
+      self.assertIs(g_sig.return_type.cls, loader.builtins.Lookup(
+          "__builtin__.int"))
+
+  def testLazyDependencies(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", """
+        import bar
+        import baz
+        class X(baz.Base):
+          y = ...  # type: bar.Y
+        def f(x: bar.Y) -> X: ...
+      """)
+      d.create_file("bar.pyi", "class Y: ...")
+      d.create_file("baz.pyi", "class Base: ...")
+      loader = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                pythonpath=[d.path], lazy_dependencies=True)
+      foo = loader.import_name("foo")
+      self.assertEqual(foo.Lookup("foo.f").signatures[0].params[0].type,
+                       pytd.LateType("bar.Y"))
+      self.assertEqual(foo.Lookup("foo.X").Lookup("y").type,
+                       pytd.LateType("bar.Y"))
+      self.assertIsInstance(foo.Lookup("foo.f").signatures[0].return_type,
+                            pytd.ClassType)
+      parent, = foo.Lookup("foo.X").parents
+      self.assertIs(parent.cls, loader.import_name("baz").Lookup("baz.Base"))
+      self.assertNotIn("bar", loader.get_reusable_modules(include_files=True))
+
+  def testLazyReexportedBase(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", """
+        from typing import List
+        from bar import Y
+        Z = bar.Y
+        class A(List[Z]): ...
+      """)
+      d.create_file("bar.pyi", "class Y: ...")
+      d.create_file("baz.pyi", """
+        import foo
+        class B(foo.Y): ...
+        def f(x: foo.Y) -> None: ...
+      """)
+      d.create_file("qux.pyi", "from foo import Y")
+      loader = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                pythonpath=[d.path], lazy_dependencies=True)
+      y = loader.import_name("bar").Lookup("bar.Y")
+      parent, = loader.import_name("foo").Lookup("foo.A").parents
+      self.assertIs(parent.parameters[0].cls, y)
+      baz = loader.import_name("baz")
+      parent, = baz.Lookup("baz.B").parents
+      self.assertIs(parent.cls, y)
+      # bar has to be loaded for B anyway.
+      self.assertIs(baz.Lookup("baz.f").signatures[0].params[0].type.cls, y)
+      self.assertEqual(loader.import_name("qux").Lookup("qux.Y").type,
+                       pytd.LateType("foo.Y"))
+
+  def testConcatAll(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", "class A(object): ...")
+      d.create_file("bar.pyi", "class B(object): ...")
+      loader = load_pytd.Loader("base", self.PYTHON_VERSION,
+                                pythonpath=[d.path])
+      foo = loader.import_name("foo")
+      concat = loader.concat_all()
+      self.assertIs(concat.Lookup("foo.A"), foo.Lookup("foo.A"))
+      self.assertRaises(KeyError, concat.Lookup, "bar.B")
+      bar = loader.import_name("bar")
+      # The same view, with the new module added.
+      self.assertIs(loader.concat_all(), concat)
+      self.assertIs(concat.Lookup("bar.B"), bar.Lookup("bar.B"))
+      self.assertIn("__builtin__.int", concat.GetSuperClassesByName())
+
   def testDiamondImport(self):
     """Should not fail on importing a module via two paths."""
     with file_utils.Tempdir() as d:
@@ -361,6 +584,23 @@ class PickledPyiLoaderTest(unittest.TestCase):
       loaded_ast = self._LoadPickledModule(d, bar)
       loaded_ast.Visit(visitors.VerifyLookup())
 
+  def testLoadFromPickle(self):
+    with file_utils.Tempdir() as d:
+      self._CreateFiles(tempdir=d)
+      module1 = _Module(module_name="module1", file_name="module1.pyi")
+      loader, _ = self._LoadAst(tempdir=d, module=module1)
+      filename = self._GetPath(d, "builtins.pickle")
+      loader.save_to_pickle(filename)
+      pickle_loader = load_pytd.PickledPyiLoader.load_from_pickle(
+          filename, base_module=None, python_version=self.PYTHON_VERSION)
+      # Only the modules that have been imported are unpickled.
+      modules = pickle_loader._modules
+      self.assertTrue(modules["module1"].needs_unpickling())
+      self.assertIn("module2", modules["module1"].dependencies)
+      ast = pickle_loader.import_name("module1")
+      self.assertFalse(modules["module2"].needs_unpickling())
+      ast.Visit(visitors.VerifyLookup())
+
 
 
 class Python3Test(unittest.TestCase):
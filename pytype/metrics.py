@@ -220,6 +220,51 @@ class MapCounter(Metric):
       self._total += count
 
 
+class ArrayCounter(Metric):
+  """A set of related counters for a fixed list of keys, indexed by position.
+
+  A faster alternative to MapCounter for hot code, since incrementing a counter
+  is a list update instead of a dict update.
+  """
+
+  def __init__(self, name, keys):
+    super(ArrayCounter, self).__init__(name)
+    self._keys = list(keys)
+    self._counts = [0] * len(self._keys)
+
+  def inc(self, index, count=1):
+    """Increment the metric by the specified amount.
+
+    Args:
+      index: The position of the key in the list of keys.
+      count: The amount to increment by (non-negative integer).
+
+    Raises:
+      ValueError: if the count is less than 0.
+    """
+    if not _enabled:
+      return
+    if count < 0:
+      raise ValueError("Counter must be monotonically increasing.")
+    self._counts[index] += count
+
+  def _summary(self):
+    details = ", ".join(["%s=%d" % (k, c)
+                         for k, c in sorted(zip(self._keys, self._counts))
+                         if c])
+    return "%d {%s}" % (sum(self._counts), details)
+
+  def _merge(self, other):
+    # pylint: disable=protected-access
+    indices = {key: i for i, key in enumerate(self._keys)}
+    for key, count in zip(other._keys, other._counts):
+      if key not in indices:
+        indices[key] = len(self._keys)
+        self._keys.append(key)
+        self._counts.append(0)
+      self._counts[indices[key]] += count
+
+
 class Distribution(Metric):
   """A metric to track simple statistics from a distribution of values."""
 
@@ -183,6 +183,38 @@ class MapCounterTest(unittest.TestCase):
     self.assertDictEqual(dict(x=2, y=2, z=1), c._counts)
 
 
+class ArrayCounterTest(unittest.TestCase):
+  """Tests for ArrayCounter."""
+
+  def setUp(self):
+    metrics._prepare_for_test()
+
+  def test_enabled(self):
+    c = metrics.ArrayCounter("foo", ["x", "y", "z"])
+    c.inc(0)
+    c.inc(1, 2)
+    c.inc(0, 5)
+    self.assertEqual([6, 2, 0], c._counts)
+    self.assertEqual("foo: 8 {x=6, y=2}", str(c))
+
+  def test_disabled(self):
+    metrics._prepare_for_test(enabled=False)
+    c = metrics.ArrayCounter("foo", ["x"])
+    c.inc(0)
+    self.assertEqual([0], c._counts)
+
+  def test_merge(self):
+    c = metrics.ArrayCounter("foo", ["x", "y"])
+    c.inc(0)
+    c.inc(1, 2)
+    # Cheat a little by merging a counter with a different name.
+    other = metrics.ArrayCounter("other", ["y", "z"])
+    other.inc(0)
+    other.inc(1, 3)
+    c._merge(other)
+    self.assertEqual("foo: 7 {x=1, y=3, z=3}", str(c))
+
+
 class DistributionTest(unittest.TestCase):
   """Tests for Distribution."""
 
@@ -0,0 +1,103 @@
+"""An on-disk cache of compiled and parsed bytecode."""
+
+import hashlib
+import logging
+import os
+import sys
+
+from pytype import __version__
+import six
+from six.moves import cPickle
+
+
+log = logging.getLogger(__name__)
+
+_PICKLE_PROTOCOL = cPickle.HIGHEST_PROTOCOL
+_SUFFIX = ".code"
+
+
+class BytecodeCache(object):
+  """A directory of pickled code objects, keyed by the inputs to compile_src.
+
+  Entries are evicted least recently used first once the directory grows
+  beyond its maximum size. Reading an entry updates its mtime, which is what
+  recency is measured by.
+  """
+
+  def __init__(self, directory, max_size):
+    """Initialize.
+
+    Args:
+      directory: The cache directory. Created when the first entry is stored.
+      max_size: The maximum total size of the entries, in bytes.
+    """
+    self.directory = directory
+    self.max_size = max_size
+
+  def get_key(self, src, python_version, filename, mode):
+    """Compute the key for a call to pyc.compile_src."""
+    if isinstance(src, six.text_type):
+      src = src.encode("utf-8")
+    h = hashlib.sha256(src)
+    # The entries are pickled with the highest protocol of the interpreter
+    # pytype runs under, so that interpreter is part of the key, too.
+    h.update(repr((__version__.__version__, tuple(sys.version_info[:2]),
+                   tuple(python_version), filename, mode)).encode("utf-8"))
+    return h.hexdigest()
+
+  def _path(self, key):
+    return os.path.join(self.directory, key + _SUFFIX)
+
+  def get(self, key):
+    """Get the code object stored under key, or None."""
+    path = self._path(key)
+    try:
+      with open(path, "rb") as fi:
+        code = cPickle.load(fi)
+      os.utime(path, None)
+    except (IOError, OSError, EOFError, ValueError,
+            cPickle.UnpicklingError) as e:
+      if os.path.exists(path):
+        log.warning("Ignoring unreadable bytecode cache entry %s: %s", path, e)
+      return None
+    return code
+
+  def put(self, key, code):
+    """Store a code object under key, evicting old entries if needed."""
+    path = self._path(key)
+    # Write to a temporary file first, so that concurrent readers never see a
+    # partially written entry.
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    try:
+      if not os.path.isdir(self.directory):
+        os.makedirs(self.directory)
+      with open(tmp_path, "wb") as fi:
+        cPickle.dump(code, fi, _PICKLE_PROTOCOL)
+      os.rename(tmp_path, path)
+    except (IOError, OSError) as e:
+      log.warning("Could not write bytecode cache entry %s: %s", path, e)
+      return
+    self._evict()
+
+  def _evict(self):
+    """Delete least recently used entries until we're within max_size."""
+    entries = []
+    total_size = 0
+    for name in os.listdir(self.directory):
+      if not name.endswith(_SUFFIX):
+        continue
+      path = os.path.join(self.directory, name)
+      try:
+        st = os.stat(path)
+      except OSError:
+        continue  # deleted by a concurrent eviction
+      entries.append((st.st_mtime, st.st_size, path))
+      total_size += st.st_size
+    entries.sort()
+    while total_size > self.max_size and entries:
+      _, size, path = entries.pop(0)
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+      total_size -= size
@@ -0,0 +1,68 @@
+"""Tests for bytecode_cache.py."""
+
+import os
+
+from pytype import file_utils
+from pytype.pyc import bytecode_cache
+from pytype.pyc import pyc
+import unittest
+
+
+class TestBytecodeCache(unittest.TestCase):
+  """Tests for BytecodeCache."""
+
+  python_version = (2, 7)
+
+  def test_key(self):
+    cache = bytecode_cache.BytecodeCache("", 0)
+    key = cache.get_key("x = 1", self.python_version, "foo.py", "exec")
+    self.assertEqual(
+        key, cache.get_key(u"x = 1", self.python_version, "foo.py", "exec"))
+    self.assertNotEqual(
+        key, cache.get_key("x = 2", self.python_version, "foo.py", "exec"))
+    self.assertNotEqual(
+        key, cache.get_key("x = 1", (3, 6), "foo.py", "exec"))
+    self.assertNotEqual(
+        key, cache.get_key("x = 1", self.python_version, "bar.py", "exec"))
+    self.assertNotEqual(
+        key, cache.get_key("x = 1", self.python_version, "foo.py", "eval"))
+
+  def test_miss(self):
+    with file_utils.Tempdir() as d:
+      cache = bytecode_cache.BytecodeCache(d.path, 1 << 20)
+      self.assertIsNone(cache.get("0"))
+
+  def test_unsupported_protocol(self):
+    with file_utils.Tempdir() as d:
+      cache = bytecode_cache.BytecodeCache(d.path, 1 << 20)
+      # What a newer interpreter's pickle protocol looks like to an older one.
+      d.create_file("0.code", b"\x80\xff.")
+      self.assertIsNone(cache.get("0"))
+
+  def test_compile_src(self):
+    with file_utils.Tempdir() as d:
+      cache = bytecode_cache.BytecodeCache(
+          os.path.join(d.path, "cache"), 1 << 20)
+      code = pyc.compile_src("foobar = 3", self.python_version, None,
+                             filename="foo.py", cache=cache)
+      key = cache.get_key("foobar = 3", self.python_version, "foo.py", "exec")
+      cached = cache.get(key)
+      self.assertEqual(cached.co_names, code.co_names)
+      self.assertEqual(cached.co_filename, "foo.py")
+
+  def test_evict(self):
+    with file_utils.Tempdir() as d:
+      cache = bytecode_cache.BytecodeCache(d.path, 1 << 20)
+      cache.put("a", "x" * 1000)
+      cache.put("b", "x" * 1000)
+      # Make "a" the least recently used entry.
+      os.utime(os.path.join(d.path, "a.code"), (0, 0))
+      cache.max_size = 1500
+      cache.put("c", "x" * 100)
+      self.assertIsNone(cache.get("a"))
+      self.assertEqual(cache.get("b"), "x" * 1000)
+      self.assertEqual(cache.get("c"), "x" * 100)
+
+
+if __name__ == "__main__":
+  unittest.main()
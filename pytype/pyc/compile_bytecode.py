@@ -1,7 +1,15 @@
-"""Compiles a single .py to a .pyc and writes it to stdout."""
+"""Compiles a single .py to a .pyc and writes it to stdout.
+
+With --server, compiles any number of sources instead. Each request is read
+from stdin as three messages (the filename, the mode and the source, encoded as
+utf-8), and answered on stdout with one message, the result that would have
+been written for a single .py. A message is its length as a 4-byte big-endian
+unsigned integer, followed by the data. The server exits when stdin is closed.
+"""
 
 # These are C modules built into Python. Don't add any modules that are
 # implemented in a .py:
+import _io
 import imp
 import marshal
 import re
@@ -33,6 +41,23 @@ def write_pyc(f, codeobject, source_size=0, timestamp=0):
   f.write(marshal.dumps(codeobject))
 
 
+def read_py2_source(fi):
+  """Read utf-8 source code from a file object, for Python 2's compile."""
+  # Python 2's compile function does not like the line specifying the
+  # encoding. So, we strip it off if it is present.
+  # As per PEP-263, the line specifying the encoding can occur only
+  # in the first or the second line.
+  l1 = fi.readline()
+  if re.match(ENCODING_PATTERN, l1.rstrip()):
+    return fi.read().decode("utf-8")
+  l2 = fi.readline()
+  if is_comment_only(l1) and re.match(ENCODING_PATTERN, l2.rstrip()):
+    return fi.read().decode("utf-8")
+  # If the encoding line was not present in the first or the second line, then
+  # use the entire source.
+  return "".join([l1, l2, fi.read()]).decode("utf-8")
+
+
 def compile_to_pyc(data_file, filename, output, mode="exec"):
   """Compile the source code to byte code."""
   if sys.version_info[0] >= 3:
@@ -40,21 +65,12 @@ def compile_to_pyc(data_file, filename, output, mode="exec"):
       src = fi.read()
   else:
     with open(data_file, "r") as fi:
-      # Python 2's compile function does not like the line specifying the
-      # encoding. So, we strip it off if it is present.
-      # As per PEP-263, the line specifying the encoding can occur only
-      # in the first or the second line.
-      l1 = fi.readline()
-      if re.match(ENCODING_PATTERN, l1.rstrip()):
-        src = fi.read().decode("utf-8")
-      else:
-        l2 = fi.readline()
-        if is_comment_only(l1) and re.match(ENCODING_PATTERN, l2.rstrip()):
-          src = fi.read().decode("utf-8")
-        else:
-          # If the encoding line was not present in the first or the second
-          # line, then use the entire source.
-          src = "".join([l1, l2, fi.read()]).decode("utf-8")
+      src = read_py2_source(fi)
+  compile_src_to_pyc(src, filename, output, mode)
+
+
+def compile_src_to_pyc(src, filename, output, mode="exec"):
+  """Compile source code, as a unicode string, to byte code."""
   try:
     codeobject = compile(src, filename, mode)
   except Exception as err:  # pylint: disable=broad-except
@@ -68,15 +84,64 @@ def compile_to_pyc(data_file, filename, output, mode="exec"):
     write_pyc(output, codeobject)
 
 
+def read_message(fi):
+  """Read a length-prefixed message, or return None at the end of the input."""
+  header = fi.read(4)
+  if not header:
+    return None
+  if len(header) != 4:
+    raise EOFError("Truncated message")
+  size = 0
+  for b in bytearray(header):
+    size = (size << 8) | b
+  data = fi.read(size)
+  if len(data) != size:
+    raise EOFError("Truncated message")
+  return data
+
+
+def write_message(fi, data):
+  size = len(data)
+  fi.write(bytearray([
+      (size >> 24) & 0xff,
+      (size >> 16) & 0xff,
+      (size >> 8) & 0xff,
+      (size >> 0) & 0xff]))
+  fi.write(data)
+
+
+def serve(input_, output):
+  """Compile the sources in the requests on input_ until it is closed."""
+  while True:
+    filename = read_message(input_)
+    if filename is None:
+      break
+    mode = read_message(input_).decode("utf-8")
+    src = read_message(input_)
+    if sys.version_info[0] >= 3:
+      filename = filename.decode("utf-8")
+      src = src.decode("utf-8")
+    else:
+      src = read_py2_source(_io.BytesIO(src))
+    result = _io.BytesIO()
+    compile_src_to_pyc(src, filename, result, mode)
+    write_message(output, result.getvalue())
+    output.flush()
+
+
 def main():
-  if len(sys.argv) != 4:
-    sys.exit(1)
   # TODO(b/31819797): Remove the pytype disable and enable.
   # pytype: disable=attribute-error
+  input_ = sys.stdin.buffer if hasattr(sys.stdin, "buffer") else sys.stdin
   output = sys.stdout.buffer if hasattr(sys.stdout, "buffer") else sys.stdout
   # pytype: enable=attribute-error
-  compile_to_pyc(data_file=sys.argv[1], filename=sys.argv[2],
-                 output=output, mode=sys.argv[3])
+  if sys.argv[1:] == ["--server"]:
+    serve(input_, output)
+  elif len(sys.argv) == 4:
+    compile_to_pyc(data_file=sys.argv[1], filename=sys.argv[2],
+                   output=output, mode=sys.argv[3])
+  else:
+    sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1012,5 +1012,19 @@ class Python36Test(_TestBase):
     self.assertEqual(ops[0].arg, 0x102)
     self.assertEqual(ops[1].name, 'JUMP_ABSOLUTE')
 
+
+class OpcodeIndexTest(unittest.TestCase):
+  """Tests for the INDEX of opcode classes."""
+
+  def test_index(self):
+    for i, cls in enumerate(opcodes.OPCODE_CLASSES):
+      self.assertEqual(cls.INDEX, i)
+
+  def test_all_opcodes(self):
+    for mapping in (opcodes.python2_mapping, opcodes.python_3_6_mapping):
+      for cls in mapping.values():
+        self.assertIs(opcodes.OPCODE_CLASSES[cls.INDEX], cls)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -1,10 +1,11 @@
 """Functions for generating, reading and parsing pyc."""
 
+import atexit
 import copy
 import os
 import re
+import struct
 import subprocess
-import tempfile
 
 from pytype import pytype_source_utils
 from pytype import utils
@@ -33,13 +34,91 @@ class CompileError(Exception):
       self.lineno = 1
 
 
+class _CompileServer(object):
+  """A long-lived interpreter that runs COMPILE_SCRIPT in --server mode."""
+
+  def __init__(self, exe):
+    compile_script_src = pytype_source_utils.load_pytype_file(COMPILE_SCRIPT)
+    if six.PY3:
+      compile_script_src = compile_script_src.decode("utf-8")
+    # The script can't be sent over stdin, since stdin carries the requests.
+    self._process = subprocess.Popen(
+        exe + ["-c", compile_script_src, "--server"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    self.pid = os.getpid()
+
+  def _write_message(self, data):
+    self._process.stdin.write(struct.pack(">I", len(data)))
+    self._process.stdin.write(data)
+
+  def _read_exactly(self, size):
+    data = self._process.stdout.read(size)
+    if len(data) != size:
+      raise IOError("Compile server exited unexpectedly")
+    return data
+
+  def compile(self, src, filename, mode):
+    """Send a source to the server, and return its response."""
+    for message in (filename, mode, src):
+      if isinstance(message, six.text_type):
+        message = message.encode("utf-8")
+      self._write_message(message)
+    self._process.stdin.flush()
+    size, = struct.unpack(">I", self._read_exactly(4))
+    return self._read_exactly(size)
+
+  def close(self):
+    try:
+      self._process.stdin.close()
+    except IOError:
+      pass
+    self._process.wait()
+
+
+# Maps an interpreter command line to its compile server.
+_compile_servers = {}
+
+
+def _close_compile_servers():
+  for server in _compile_servers.values():
+    if server.pid == os.getpid():
+      server.close()
+  _compile_servers.clear()
+
+
+atexit.register(_close_compile_servers)
+
+
+def _compile_with_server(exe, src, filename, mode):
+  """Compile src with the compile server for exe, starting it if needed."""
+  key = tuple(exe)
+  server = _compile_servers.get(key)
+  # A server inherited from the parent of a forked process belongs to the
+  # parent, so the child starts its own.
+  if server and server.pid == os.getpid():
+    try:
+      return server.compile(src, filename, mode)
+    except (IOError, OSError, ValueError):
+      # The server died or was closed. Retry with a new one.
+      del _compile_servers[key]
+      server.close()
+  server = _compile_servers[key] = _CompileServer(exe)
+  try:
+    return server.compile(src, filename, mode)
+  except (IOError, OSError):
+    del _compile_servers[key]
+    server.close()
+    raise
+
+
 def compile_src_string_to_pyc_string(src, filename, python_version, python_exe,
                                      mode="exec"):
   """Compile Python source code to pyc data.
 
-  This may use py_compile if the src is for the same version as we're running,
-  or else it spawns an external process to produce a .pyc file. The generated
-  bytecode (.pyc file) is read and both it and any temporary files are deleted.
+  In order to be able to compile pyc files for both Python 2 and Python 3, the
+  source is sent to a compile server, an external interpreter process for the
+  target version that is started on first use and then reused for all sources
+  compiled with the same interpreter.
 
   Args:
     src: Python sourcecode
@@ -58,30 +137,12 @@ def compile_src_string_to_pyc_string(src, filename, python_version, python_exe,
     CompileError: If we find a syntax error in the file.
     IOError: If our compile script failed.
   """
-  tempfile_options = {"mode": "w", "suffix": ".py", "delete": False}
-  if six.PY3:
-    tempfile_options.update({"encoding": "utf-8"})
-  fi = tempfile.NamedTemporaryFile(**tempfile_options)
-
-  try:
-    fi.write(src)
-    fi.close()
-    # In order to be able to compile pyc files for both Python 2 and Python 3,
-    # we spawn an external process.
-    if python_exe:
-      # Allow python_exe to contain parameters (E.g. "-T")
-      exe = python_exe.split()
-    else:
-      exe = ["python" + ".".join(map(str, python_version))]
-    cmd = exe + ["-", fi.name, filename or fi.name, mode]
-
-    compile_script_src = pytype_source_utils.load_pytype_file(COMPILE_SCRIPT)
-
-    p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
-    bytecode, _ = p.communicate(compile_script_src)
-    assert p.poll() == 0, "Child process failed"
-  finally:
-    os.unlink(fi.name)
+  if python_exe:
+    # Allow python_exe to contain parameters (E.g. "-T")
+    exe = python_exe.split()
+  else:
+    exe = ["python" + ".".join(map(str, python_version))]
+  bytecode = _compile_with_server(exe, src, filename or "<string>", mode)
   first_byte = six.indexbytes(bytecode, 0)
   if first_byte == 0:  # compile OK
     return bytecode[1:]
@@ -138,7 +199,8 @@ class AdjustFilename(object):
     return code
 
 
-def compile_src(src, python_version, python_exe, filename=None, mode="exec"):
+def compile_src(src, python_version, python_exe, filename=None, mode="exec",
+                cache=None):
   """Compile a string to pyc, and then load and parse the pyc.
 
   Args:
@@ -147,6 +209,8 @@ def compile_src(src, python_version, python_exe, filename=None, mode="exec"):
     python_exe: Path to Python interpreter, or None.
     filename: The filename the sourcecode is from.
     mode: "exec", "eval" or "single".
+    cache: Optionally, a bytecode_cache.BytecodeCache to look up the result in
+      and store it to.
 
   Returns:
     An instance of loadmarshal.CodeType.
@@ -154,6 +218,11 @@ def compile_src(src, python_version, python_exe, filename=None, mode="exec"):
   Raises:
     UsageError: If python_exe and python_version are mismatched.
   """
+  if cache:
+    key = cache.get_key(src, python_version, filename, mode)
+    code = cache.get(key)
+    if code:
+      return code
   pyc_data = compile_src_string_to_pyc_string(
       src, filename, python_version, python_exe, mode)
   code = parse_pyc_string(pyc_data)
@@ -163,6 +232,8 @@ def compile_src(src, python_version, python_exe, filename=None, mode="exec"):
         (utils.format_version(code.python_version),
          utils.format_version(python_version)))
   visit(code, AdjustFilename(filename))
+  if cache:
+    cache.put(key, code)
   return code
 
 
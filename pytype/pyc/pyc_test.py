@@ -36,6 +36,19 @@ class TestPyc(unittest.TestCase):
     self.assertIn("foobar", code.co_names)
     self.assertEqual(self.python_version, code.python_version)
 
+  def test_compile_server_is_reused(self):
+    self._compile("x = 1")
+    servers = dict(pyc._compile_servers)
+    self._compile("y = 2")
+    self.assertEqual(servers, pyc._compile_servers)
+
+  def test_compile_server_restart(self):
+    self._compile("x = 1")
+    for server in pyc._compile_servers.values():
+      server.close()
+    code = self._compile("y = 2")
+    self.assertIn("y", code.co_names)
+
   def test_erroneous_file(self):
     try:
       self._compile("\nfoo ==== bar--")
@@ -1136,7 +1136,8 @@ def Optimize(node,
   Arguments:
     node: A pytd node to be optimized. It won't be modified - this function
         will return a new node.
-    builtins: Definitions of all of the external types in node.
+    builtins: Definitions of all of the external types in node, as a
+        pytd.TypeDeclUnit or a pytd_utils.LazyConcat.
     lossy: Allow optimizations that change the meaning of the pytd.
     use_abcs: Use abstract base classes to represent unions like
         e.g. "float or int" as "Real".
@@ -1159,7 +1160,10 @@ def Optimize(node,
   node = node.Visit(CombineContainers())
   node = node.Visit(SimplifyContainers())
   if builtins:
-    superclasses = builtins.Visit(visitors.ExtractSuperClassesByName())
+    if isinstance(builtins, pytd_utils.LazyConcat):
+      superclasses = builtins.GetSuperClassesByName()
+    else:
+      superclasses = builtins.Visit(visitors.ExtractSuperClassesByName())
     superclasses.update(node.Visit(visitors.ExtractSuperClassesByName()))
     if use_abcs:
       superclasses.update(abc_hierarchy.GetSuperClasses())
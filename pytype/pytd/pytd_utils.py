@@ -82,6 +82,73 @@ def Concat(*args, **kwargs):
       aliases=sum((arg.aliases for arg in args), ()))
 
 
+class LazyConcat(object):
+  """A view of the concatenation of modules, which is only built on demand.
+
+  Concatenating all the modules that an analysis loaded copies every one of
+  their members, and has to be redone whenever another module is loaded. This
+  view instead looks a name up in the module that it belongs to, i.e., the one
+  whose name is the longest prefix of it, and keeps the superclasses of each
+  module, so that adding a module is cheap.
+
+  Attributes:
+    name: The name of the concatenated module.
+  """
+
+  def __init__(self, name=None):
+    self.name = name
+    self._modules = collections.OrderedDict()
+    # Map from module name to the result of ExtractSuperClassesByName.
+    self._superclasses = {}
+    self._concatenated = None
+
+  def Add(self, ast):
+    """Add a module, or replace the one with the same name."""
+    if self._modules.get(ast.name) is not ast:
+      self._modules[ast.name] = ast
+      self._superclasses.pop(ast.name, None)
+      self._concatenated = None
+
+  def Lookup(self, name):
+    """Look up a name like Concat(*modules).Lookup(name) would.
+
+    Args:
+      name: Name to look up.
+
+    Returns:
+      A Constant, Function, Class, Alias or TypeParameter.
+
+    Raises:
+      KeyError: if this identifier doesn't exist.
+    """
+    prefix = name
+    while "." in prefix:
+      prefix, _, _ = prefix.rpartition(".")
+      if prefix in self._modules:
+        return self._modules[prefix].Lookup(name)
+    raise KeyError(name)
+
+  def GetSuperClassesByName(self):
+    """Get a new map from all class names to the names of their superclasses.
+
+    Returns:
+      What visitors.ExtractSuperClassesByName returns for Concat(*modules).
+    """
+    superclasses = {}
+    for name, ast in self._modules.items():
+      if name not in self._superclasses:
+        self._superclasses[name] = ast.Visit(
+            visitors.ExtractSuperClassesByName())
+      superclasses.update(self._superclasses[name])
+    return superclasses
+
+  def Concat(self):
+    """Get the concatenated module, for code that needs all of its members."""
+    if self._concatenated is None:
+      self._concatenated = Concat(*self._modules.values(), name=self.name)
+    return self._concatenated
+
+
 JoinTypes = parser.join_types  # pylint: disable=invalid-name
 
 
@@ -22,6 +22,7 @@ from pytype import file_utils
 from pytype.pyi import parser
 from pytype.pytd import pytd
 from pytype.pytd import pytd_utils
+from pytype.pytd import visitors
 from pytype.pytd.parse import parser_test_base
 
 import six
@@ -99,6 +100,36 @@ class TestUtils(parser_test_base.ParserTest):
                      pytd.TypeParameter("T", scope="__builtin__"))
     self.assertEqual(combined.Lookup("T"), pytd.TypeParameter("T", scope=None))
 
+  def testLazyConcat(self):
+    ast1 = self.Parse("""
+      class A(object): ...
+      def f() -> int
+    """, name="foo")
+    ast2 = self.Parse("""
+      import foo
+      class B(foo.A): ...
+      x = ...  # type: int
+    """, name="foo.bar")
+    concat = pytd_utils.LazyConcat(name="<all>")
+    concat.Add(ast1)
+    concat.Add(ast2)
+    combined = pytd_utils.Concat(ast1, ast2, name="<all>")
+    for name in ["foo.A", "foo.f", "foo.bar.B", "foo.bar.x"]:
+      self.assertIs(concat.Lookup(name), combined.Lookup(name))
+    for name in ["A", "foo.B", "foo.bar.A", "bar.B"]:
+      self.assertRaises(KeyError, concat.Lookup, name)
+    self.assertEqual(
+        concat.GetSuperClassesByName(),
+        combined.Visit(visitors.ExtractSuperClassesByName()))
+    self.assertMultiLineEqual(pytd.Print(concat.Concat()),
+                              pytd.Print(combined))
+    ast3 = self.Parse("class C(object): ...", name="foo")
+    concat.Add(ast3)
+    self.assertIs(concat.Lookup("foo.C"), ast3.Lookup("foo.C"))
+    self.assertRaises(KeyError, concat.Lookup, "foo.A")
+    self.assertIn("foo.C", concat.GetSuperClassesByName())
+    self.assertNotIn("foo.A", concat.GetSuperClassesByName())
+
   def testJoinTypes(self):
     """Test that JoinTypes() does recursive flattening."""
     n1, n2, n3, n4, n5, n6 = [pytd.NamedType("n%d" % i) for i in range(6)]
@@ -5,13 +5,25 @@ serializing it to disk. Further users only need to read the serialized data from
 disk, which is faster to digest than a pyi file.
 """
 
+import array
 import collections
+import gc
+import mmap
+import struct
+import sys
+import zlib
 
 from pytype import utils
 from pytype.pyi import parser
 from pytype.pytd import pytd
 from pytype.pytd import pytd_utils
 from pytype.pytd import visitors
+import six
+from six.moves import cPickle
+
+
+_ARCHIVE_MAGIC = b"pytd-archive-1\n"
+_ARCHIVE_HEADER_SIZE = struct.Struct(">Q")
 
 
 class UnrestorableDependencyError(Exception):
@@ -145,6 +157,11 @@ def StoreAst(ast, filename=None):
   Returns:
     The pickled string, if no filename was given. (None otherwise.)
   """
+  return pytd_utils.SavePickle(_PrepareForStore(ast), filename)
+
+
+def _PrepareForStore(ast):
+  """Create the SerializableAst that StoreAst and EncodeAst save."""
   if ast.name.endswith(".__init__"):
     ast = ast.Visit(RenameModuleVisitor(
         ast.name, ast.name.rsplit(".__init__", 1)[0]))
@@ -154,13 +171,276 @@ def StoreAst(ast, filename=None):
   dependencies = deps.modules
 
   # Clean external references
-  ast.Visit(visitors.ClearClassPointers())
+  ast = ast.Visit(visitors.ClearClassPointers())
   indexer = FindClassAndFunctionTypesVisitor()
   ast.Visit(indexer)
-  return pytd_utils.SavePickle(SerializableAst(
+  return SerializableAst(
       ast, list(sorted(dependencies)),
       list(sorted(indexer.class_type_nodes)),
-      list(sorted(indexer.function_type_nodes))), filename)
+      list(sorted(indexer.function_type_nodes)))
+
+
+_ENCODING_MAGIC = b"pytd-ast-1\n"
+_ENCODING_HEADER = struct.Struct("<5I")
+
+# The objects that the object table of an encoded AST starts with.
+_CONSTANTS = (None, False, True)
+
+# Nodes with a pointer that isn't one of their fields.
+_POINTER_ATTRIBUTES = {pytd.ClassType: "cls", pytd.FunctionType: "function"}
+
+
+def _GetNodeClasses():
+  return {name: cls for name, cls in vars(pytd).items()
+          if isinstance(cls, type) and issubclass(cls, tuple) and
+          hasattr(cls, "_fields")}
+
+
+_NODE_CLASSES = _GetNodeClasses()
+
+
+def _IsConstant(value):
+  # Not "value in _CONSTANTS", since 0 == False and 1 == True.
+  return value is None or value is False or value is True
+
+
+def _CollectObjects(value, seen, composites, strings, ints):
+  """Collect the tuples, nodes, strings and ints reachable from value.
+
+  Args:
+    value: A tuple or node.
+    seen: The ids of the tuples and nodes collected so far.
+    composites: The tuples and nodes collected so far, children before
+      parents. Extended in place.
+    strings: The set of strings collected so far. Updated in place.
+    ints: The set of ints collected so far. Updated in place.
+  """
+  stack = [(value, False)]
+  while stack:
+    value, children_done = stack.pop()
+    if children_done:
+      composites.append(value)
+    elif id(value) not in seen:
+      seen.add(id(value))
+      stack.append((value, True))
+      for child in reversed(value):
+        if isinstance(child, tuple):
+          if id(child) not in seen:
+            stack.append((child, False))
+        elif isinstance(child, six.string_types):
+          strings.add(child)
+        elif isinstance(child, six.integer_types) and not _IsConstant(child):
+          ints.add(child)
+        elif child is not None and not _IsConstant(child):
+          raise TypeError("Can't encode %r" % type(child))
+
+
+def EncodeAst(ast):
+  """Store an ast in a compact binary format.
+
+  This is an alternative to StoreAst that is about half the size of a pickle
+  and faster to decode. The encoding consists of
+  - a string table, which holds the names of the node classes and all strings
+    in the ast, once each,
+  - an array of numbers with a record for each int, tuple and node, children
+    before parents, that refers to its children by index,
+  - the targets of the pointers of ClassType and FunctionType nodes.
+  The numbers are stored as an array of fixed-width integers, which, unlike
+  varints, doesn't require a Python loop to decode. Equal tuples and nodes are
+  stored once and shared after decoding, so asts that are equal have the same
+  encoding. Caches that nodes carry are dropped.
+
+  Args:
+    ast: The pytd.TypeDeclUnit to store.
+
+  Returns:
+    The encoded ast, as bytes. DecodeAst turns it into a SerializableAst.
+  """
+  serializable_ast = _PrepareForStore(ast)
+  root = (serializable_ast.ast, tuple(serializable_ast.dependencies),
+          tuple(serializable_ast.class_type_nodes),
+          tuple(serializable_ast.function_type_nodes))
+  seen = set()
+  composites = []
+  strings = set()
+  ints = set()
+  _CollectObjects(root, seen, composites, strings, ints)
+  # Pointers can lead to nodes that are not otherwise in the ast, which can
+  # have pointers of their own.
+  pointers = []
+  i = 0
+  while i < len(composites):
+    node = composites[i]
+    i += 1
+    attr = _POINTER_ATTRIBUTES.get(type(node))
+    target = attr and getattr(node, attr)
+    if target is not None:
+      pointers.append((node, target))
+      _CollectObjects(target, seen, composites, strings, ints)
+  strings = sorted(strings)
+  texts = [s for s in strings if not isinstance(s, str)]  # Python 2
+  strings = [s for s in strings if isinstance(s, str)]
+  ints = sorted(ints)
+  indices = {}
+  for i, value in enumerate(strings + texts + ints, len(_CONSTANTS)):
+    indices[value] = i
+  def GetIndex(value):
+    if _IsConstant(value):
+      return _CONSTANTS.index(value)
+    elif isinstance(value, tuple):
+      return indices[id(value)]
+    else:
+      return indices[value]
+  classes = []
+  tags = {}
+  # Equal tuples and nodes get a single record, so that the encoding doesn't
+  # depend on which of them are the same object, which varies with the other
+  # modules that the loader of the ast has interned.
+  records = []
+  record_indices = {}
+  composite_indices = {}
+  base = len(_CONSTANTS) + len(strings) + len(texts) + len(ints)
+  for value in composites:
+    children = tuple(
+        composite_indices[id(child)] if isinstance(child, tuple) else
+        GetIndex(child) for child in value)
+    cls = type(value)
+    key = (cls, children)
+    if key not in record_indices:
+      record_indices[key] = base + len(record_indices)
+      if cls is tuple:
+        records.append(0)
+        records.append(len(value))
+      else:
+        if _NODE_CLASSES.get(cls.__name__) is not cls:
+          raise TypeError("Can't encode %r" % cls)
+        if cls not in tags:
+          classes.append(cls.__name__)
+          tags[cls] = len(classes)
+        records.append(tags[cls])
+      records.extend(children)
+    composite_indices[id(value)] = record_indices[key]
+  indices.update(composite_indices)
+  pointer_indices = collections.OrderedDict()
+  for node, target in pointers:
+    pointer_indices.setdefault(indices[id(node)], indices[id(target)])
+  numbers = [len(ints)]
+  numbers.extend(i * 2 if i >= 0 else -i * 2 - 1 for i in ints)
+  numbers.append(len(record_indices))
+  numbers.extend(records)
+  numbers.append(len(pointer_indices))
+  for node_index, target_index in pointer_indices.items():
+    numbers.append(node_index)
+    numbers.append(target_index)
+  numbers.append(indices[id(root)])
+  typecode = "H" if max(numbers) < 1 << 16 else "I"
+  numbers = array.array(typecode, numbers)
+  if sys.byteorder != "little":
+    numbers.byteswap()
+  text = [six.text_type(s) if isinstance(s, six.text_type) else
+          s.decode("utf-8") for s in classes + strings + texts]
+  if any(u"\0" in s for s in text):
+    raise ValueError("Can't encode strings that contain NUL characters")
+  text = u"\0".join(text).encode("utf-8")
+  header = _ENCODING_HEADER.pack(len(classes), len(strings), len(texts),
+                                len(text), numbers.itemsize)
+  return b"".join([_ENCODING_MAGIC, header, text, _ToBytes(numbers)])
+
+
+def _ToBytes(a):
+  return a.tobytes() if six.PY3 else a.tostring()
+
+
+def _FromBytes(typecode, data):
+  a = array.array(typecode)
+  if six.PY3:
+    a.frombytes(data)
+  else:
+    a.fromstring(data)
+  if sys.byteorder != "little":
+    a.byteswap()
+  return a
+
+
+def DecodeAst(data):
+  """Decode an ast stored by EncodeAst.
+
+  Args:
+    data: The encoded ast.
+
+  Returns:
+    A SerializableAst, which is restored in the same way as the ones that
+    StoreAst pickles.
+
+  Raises:
+    ValueError: If data isn't an encoded ast.
+  """
+  if not data.startswith(_ENCODING_MAGIC):
+    raise ValueError("Not an encoded ast")
+  # Decoding creates lots of objects and no garbage, so the collections that
+  # the allocations would trigger are wasted time.
+  gc_enabled = gc.isenabled()
+  gc.disable()
+  try:
+    return _DecodeAst(data)
+  finally:
+    if gc_enabled:
+      gc.enable()
+
+
+def _DecodeAst(data):
+  """Decode an ast stored by EncodeAst, which starts with _ENCODING_MAGIC."""
+  pos = len(_ENCODING_MAGIC)
+  num_classes, num_strings, num_texts, text_size, itemsize = (
+      _ENCODING_HEADER.unpack_from(data, pos))
+  pos += _ENCODING_HEADER.size
+  text = data[pos:pos + text_size].decode("utf-8").split(u"\0")
+  pos += text_size
+  numbers = _FromBytes("H" if itemsize == 2 else "I", data[pos:]).tolist()
+  classes = [_NODE_CLASSES[str(name)] for name in text[:num_classes]]
+  strings = text[num_classes:num_classes + num_strings]
+  if not six.PY3:
+    strings = [s.encode("utf-8") for s in strings]
+  texts = text[num_classes + num_strings:]
+  assert len(texts) == num_texts
+  num_ints = numbers[0]
+  ints = [i >> 1 if not i & 1 else -((i + 1) >> 1)
+          for i in numbers[1:1 + num_ints]]
+  pos = 1 + num_ints
+  objects = list(_CONSTANTS) + strings + texts + ints
+  append = objects.append
+  get = objects.__getitem__
+  new = tuple.__new__
+  arities = [None] + [len(cls._fields) for cls in classes]
+  pointers = [None] + [_POINTER_ATTRIBUTES.get(cls) for cls in classes]
+  classes = [None] + classes
+  num_composites = numbers[pos]
+  pos += 1
+  for _ in range(num_composites):
+    tag = numbers[pos]
+    if tag:
+      start = pos + 1
+      pos = start + arities[tag]
+      # Skip the __new__ of the node class, which is for validating and
+      # normalizing new nodes.
+      node = new(classes[tag], map(get, numbers[start:pos]))
+      if pointers[tag]:
+        setattr(node, pointers[tag], None)
+      append(node)
+    else:
+      start = pos + 2
+      pos = start + numbers[pos + 1]
+      append(tuple(map(get, numbers[start:pos])))
+  num_pointers = numbers[pos]
+  pos += 1
+  for _ in range(num_pointers):
+    node = objects[numbers[pos]]
+    setattr(node, _POINTER_ATTRIBUTES[type(node)], objects[numbers[pos + 1]])
+    pos += 2
+  ast, dependencies, class_type_nodes, function_type_nodes = objects[
+      numbers[pos]]
+  return SerializableAst(ast, list(dependencies), list(class_type_nodes),
+                         list(function_type_nodes))
 
 
 def EnsureAstName(ast, module_name, fix=False):
@@ -296,6 +576,84 @@ def FillLocalReferences(serializable_ast, module_map):
     return serializable_ast
 
 
+class ArchiveEntry(object):
+  """A module in an archive written by StoreArchive.
+
+  Attributes:
+    name: The module name.
+    dependencies: The names of the modules this one references.
+  """
+
+  def __init__(self, data, offset, length, name, dependencies):
+    self._data = data
+    self._offset = offset
+    self._length = length
+    self.name = name
+    self.dependencies = dependencies
+
+  def Load(self):
+    """Decompress the module, as encoded by EncodeAst."""
+    return zlib.decompress(self._data[self._offset:self._offset + self._length])
+
+
+def StoreArchive(items, filename):
+  """Store modules in an archive that LoadArchive can read lazily.
+
+  The archive starts with a header that maps each module name to the position
+  of its (compressed) data and to its dependencies, so that reading a module
+  doesn't require reading any of the others.
+
+  Args:
+    items: A sequence of (module name, data, dependencies) tuples, where data
+      is as returned by EncodeAst(ast) and dependencies are the names of the
+      modules that ast references.
+    filename: The filename to write to.
+  """
+  header = []
+  blobs = []
+  offset = 0
+  for name, data, dependencies in items:
+    blob = zlib.compress(data)
+    header.append((name, offset, len(blob), sorted(dependencies)))
+    blobs.append(blob)
+    offset += len(blob)
+  header = cPickle.dumps(header, cPickle.HIGHEST_PROTOCOL)
+  with open(filename, "wb") as fi:
+    fi.write(_ARCHIVE_MAGIC)
+    fi.write(_ARCHIVE_HEADER_SIZE.pack(len(header)))
+    fi.write(header)
+    for blob in blobs:
+      fi.write(blob)
+
+
+def LoadArchive(filename):
+  """Open an archive written by StoreArchive.
+
+  Only the header is read. The modules are read, through mmap, when
+  ArchiveEntry.Load is called.
+
+  Args:
+    filename: The filename of the archive.
+
+  Returns:
+    A dict, module name to ArchiveEntry.
+
+  Raises:
+    ValueError: If filename isn't an archive.
+  """
+  with open(filename, "rb") as fi:
+    if fi.read(len(_ARCHIVE_MAGIC)) != _ARCHIVE_MAGIC:
+      raise ValueError("%s is not a pytd archive" % filename)
+    header_size, = _ARCHIVE_HEADER_SIZE.unpack(
+        fi.read(_ARCHIVE_HEADER_SIZE.size))
+    header = cPickle.loads(fi.read(header_size))
+    # The mapping stays valid after the file is closed.
+    data = mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ)
+  start = len(_ARCHIVE_MAGIC) + _ARCHIVE_HEADER_SIZE.size + header_size
+  return {name: ArchiveEntry(data, start + offset, length, name, dependencies)
+          for name, offset, length, dependencies in header}
+
+
 def PrepareForExport(module_name, python_version, ast, loader):
   """Prepare an ast as if it was parsed and loaded.
 
@@ -0,0 +1,51 @@
+"""Benchmark for storing and loading the typeshed ASTs.
+
+Compares the size and decoding time of serialize_ast.EncodeAst with those of
+the pickles that serialize_ast.StoreAst writes.
+
+Usage:
+  python -m pytype.pytd.serialize_ast_benchmark
+"""
+
+from __future__ import print_function
+
+import sys
+import timeit
+
+from pytype import config
+from pytype import load_pytd
+from pytype.pytd import serialize_ast
+from pytype.pytd import typeshed
+from six.moves import cPickle
+
+
+def _load_asts(loader):
+  asts = []
+  for name in sorted(typeshed.Typeshed().get_all_module_names(
+      loader.python_version)):
+    try:
+      asts.append(loader.import_name(name))
+    except Exception:  # pylint: disable=broad-except
+      continue  # this benchmark doesn't care about broken stubs
+  return [ast for ast in asts if ast]
+
+
+def main():
+  options = config.Options.create(python_version=sys.version_info[:2])
+  loader = load_pytd.create_loader(options)
+  asts = _load_asts(loader)
+  # Both encoders clear the class pointers of the asts they store, so pickle
+  # first and encode second.
+  pickles = [serialize_ast.StoreAst(ast) for ast in asts]
+  encoded = [serialize_ast.EncodeAst(ast) for ast in asts]
+  print("%d modules" % len(asts))
+  for name, data, load in (("pickle", pickles, cPickle.loads),
+                           ("encoded", encoded, serialize_ast.DecodeAst)):
+    seconds = min(timeit.repeat(lambda: [load(d) for d in data],  # pylint: disable=cell-var-from-loop
+                                number=1, repeat=5))
+    print("  %-8s  %6.2f MB  %6.3f s" % (
+        name, sum(len(d) for d in data) / 1e6, seconds))
+
+
+if __name__ == "__main__":
+  main()
@@ -3,6 +3,7 @@ import pickle
 
 from pytype import file_utils
 from pytype import load_pytd
+from pytype.pytd import pytd
 from pytype.pytd import pytd_utils
 from pytype.pytd import serialize_ast
 from pytype.pytd import visitors
@@ -340,6 +341,62 @@ class SerializeAstTest(unittest.TestCase):
       signature, = f.type.function.signatures
       self.assertIsNotNone(signature.return_type.cls)
 
+  def testEncodeAst(self):
+    with file_utils.Tempdir() as d:
+      module_name = "module1"
+      ast, loader = self._GetAst(temp_dir=d, module_name=module_name)
+      module_map = {name: module.ast
+                    for name, module in loader._modules.items()}
+      original_ast = module_map.pop(module_name)
+      data = serialize_ast.EncodeAst(ast)
+      serializable_ast = serialize_ast.DecodeAst(data)
+      self.assertEqual(serializable_ast.dependencies,
+                       ["__builtin__", "module1", "module2"])
+      loaded_ast = serialize_ast.ProcessAst(serializable_ast, module_map)
+      self.assertIsNot(loaded_ast, original_ast)
+      self.assertTrue(original_ast.ASTeq(loaded_ast))
+      loaded_ast.Visit(visitors.VerifyLookup())
+
+  def testEncodingIgnoresSharing(self):
+    def CreateModule(x_type, y_type):
+      return pytd_utils.CreateModule("foo", constants=(
+          pytd.Constant("foo.x", x_type), pytd.Constant("foo.y", y_type)))
+    int_type = pytd.NamedType("int")
+    shared = CreateModule(int_type, int_type)
+    copied = CreateModule(int_type, pytd.NamedType("int"))
+    self.assertEqual(serialize_ast.EncodeAst(shared),
+                     serialize_ast.EncodeAst(copied))
+    ast = serialize_ast.DecodeAst(serialize_ast.EncodeAst(copied)).ast
+    x, y = ast.constants
+    self.assertIs(x.type, y.type)
+
+  def testEncodeIsSmallerThanPickle(self):
+    with file_utils.Tempdir() as d:
+      ast, _ = self._GetAst(temp_dir=d, module_name="module1")
+      pickled = serialize_ast.StoreAst(ast)
+      self.assertLess(len(serialize_ast.EncodeAst(ast)), len(pickled))
+
+  def testDecodeInvalidData(self):
+    self.assertRaises(ValueError, serialize_ast.DecodeAst, b"not an ast")
+
+  def testArchive(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("archive")
+      serialize_ast.StoreArchive(
+          [("foo", b"foo pickle", {"bar"}), ("bar", b"bar pickle", set())],
+          filename)
+      entries = serialize_ast.LoadArchive(filename)
+      self.assertEqual(sorted(entries), ["bar", "foo"])
+      self.assertEqual(entries["foo"].Load(), b"foo pickle")
+      self.assertEqual(entries["foo"].dependencies, ["bar"])
+      self.assertEqual(entries["bar"].Load(), b"bar pickle")
+      self.assertEqual(entries["bar"].dependencies, [])
+
+  def testNotAnArchive(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("archive", "not an archive")
+      self.assertRaises(ValueError, serialize_ast.LoadArchive, filename)
+
 
 if __name__ == "__main__":
   unittest.main()
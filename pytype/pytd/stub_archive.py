@@ -0,0 +1,121 @@
+"""An indexed archive of the stubs that pytype ships with.
+
+Reading hundreds of small stub files can take a noticeable part of pytype's
+startup when the file system cache is cold. A stub archive packs the typeshed
+tree and pytype's own pytd files into a single file, with an index that maps
+each path to the position of its contents. The file is mapped into memory, so
+reading a stub from it is a single slice.
+"""
+
+import json
+import mmap
+import struct
+
+from pytype import __version__
+
+
+MAGIC = b"pytype stub archive\n"
+
+# The length of the index, which follows the magic string.
+_HEADER = struct.Struct("<Q")
+
+
+class Error(Exception):
+  """Raised when a file isn't a stub archive of this version of pytype."""
+
+
+class StubArchive(object):
+  """A stub archive, opened for reading.
+
+  Attributes:
+    filename: The name of the archive file.
+    modules: The precomputed results of typeshed's module lookups, as a map
+      from a Python version like "3.6", to a typeshed directory like "stdlib",
+      to a module name, to a (path, missing) pair. See Typeshed.get_module_file.
+  """
+
+  def __init__(self, filename):
+    self.filename = filename
+    with open(filename, "rb") as f:
+      self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if self._data[:len(MAGIC)] != MAGIC:
+      self._data.close()
+      raise Error("%s is not a stub archive" % filename)
+    index_start = len(MAGIC) + _HEADER.size
+    index_length, = _HEADER.unpack_from(self._data, len(MAGIC))
+    self._data_start = index_start + index_length
+    index = json.loads(
+        self._data[index_start:self._data_start].decode("utf-8"))
+    version = index.get("version")
+    if version != __version__.__version__:
+      self._data.close()
+      # The stubs and the version table go with the pytype that made them.
+      raise Error("%s was made by pytype %s, not %s; regenerate it with "
+                  "--generate-stub-archive" % (
+                      filename, version, __version__.__version__))
+    # Map from paths to the (offset, length) of their contents.
+    self._files = index["files"]
+    self.modules = index["modules"]
+
+  def has_file(self, path):
+    return path in self._files
+
+  def load_file(self, path):
+    """Get the contents of a file in the archive.
+
+    Args:
+      path: The path of the file, relative to pytype/.
+    Returns:
+      The contents of the file as a bytestring.
+    Raises:
+      IOError: if the file isn't in the archive.
+    """
+    try:
+      offset, length = self._files[path]
+    except KeyError:
+      raise IOError("%s isn't in %s" % (path, self.filename))
+    start = self._data_start + offset
+    return self._data[start:start + length]
+
+  def list_files(self, directory):
+    """Yield the paths of the files in a directory, relative to it."""
+    prefix = directory + "/"
+    for path in self._files:
+      if path.startswith(prefix):
+        yield path[len(prefix):]
+
+  def close(self):
+    self._data.close()
+
+
+def write(filename, files, modules):
+  """Write a stub archive.
+
+  Files with the same contents, like ones that are symlinked to each other,
+  are stored only once. The archive records the version of pytype, and only
+  that version reads it.
+
+  Args:
+    filename: The file to write the archive to.
+    files: A map from paths, relative to pytype/, to the contents of the files.
+    modules: The precomputed module lookups. See StubArchive.modules.
+  """
+  index = {"files": {}, "modules": modules,
+           "version": __version__.__version__}
+  blobs = []
+  offsets = {}
+  size = 0
+  for path in sorted(files):
+    contents = files[path]
+    if contents not in offsets:
+      offsets[contents] = size
+      blobs.append(contents)
+      size += len(contents)
+    index["files"][path] = (offsets[contents], len(contents))
+  index_data = json.dumps(index, sort_keys=True).encode("utf-8")
+  with open(filename, "wb") as f:
+    f.write(MAGIC)
+    f.write(_HEADER.pack(len(index_data)))
+    f.write(index_data)
+    for blob in blobs:
+      f.write(blob)
@@ -0,0 +1,60 @@
+"""Tests for stub_archive.py."""
+
+import os
+
+from pytype import __version__
+from pytype import file_utils
+from pytype.pytd import stub_archive
+import six
+
+import unittest
+
+
+class StubArchiveTest(unittest.TestCase):
+  """Tests for writing and reading stub archives."""
+
+  def test_roundtrip(self):
+    foo = b"x = ...  # type: int\n" * 100
+    files = {"typeshed/stdlib/2/foo.pyi": foo,
+             "typeshed/stdlib/3/foo.pyi": foo,
+             "pytd/builtins/3/bar.pytd": b""}
+    modules = {"3.6": {"stdlib": {"foo": ("stdlib/3/foo.pyi", False)}}}
+    with file_utils.Tempdir() as d:
+      filename = os.path.join(d.path, "stubs")
+      stub_archive.write(filename, files, modules)
+      archive = stub_archive.StubArchive(filename)
+      try:
+        for path, contents in files.items():
+          self.assertTrue(archive.has_file(path))
+          self.assertEqual(archive.load_file(path), contents)
+        self.assertFalse(archive.has_file("typeshed/stdlib/2/bar.pyi"))
+        self.assertRaises(IOError, archive.load_file, "typeshed/stdlib/2")
+        six.assertCountEqual(self, archive.list_files("typeshed/stdlib"),
+                             ["2/foo.pyi", "3/foo.pyi"])
+        path, missing = archive.modules["3.6"]["stdlib"]["foo"]
+        self.assertEqual(path, "stdlib/3/foo.pyi")
+        self.assertFalse(missing)
+      finally:
+        archive.close()
+      # The contents of the two foo.pyi files are only stored once.
+      self.assertLess(os.path.getsize(filename), 2 * len(foo))
+
+  def test_not_an_archive(self):
+    with file_utils.Tempdir() as d:
+      filename = d.create_file("stubs", "x = ...  # type: int")
+      self.assertRaises(stub_archive.Error, stub_archive.StubArchive, filename)
+
+  def test_other_version(self):
+    with file_utils.Tempdir() as d:
+      filename = os.path.join(d.path, "stubs")
+      version = __version__.__version__
+      __version__.__version__ = "0.0"
+      try:
+        stub_archive.write(filename, {}, {})
+      finally:
+        __version__.__version__ = version
+      self.assertRaises(stub_archive.Error, stub_archive.StubArchive, filename)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,5 +1,6 @@
 """Utilities for parsing typeshed files."""
 
+import collections
 import os
 
 from pytype import file_utils
@@ -15,7 +16,9 @@ class Typeshed(object):
 
   The location is either retrieved from the environment variable
   "TYPESHED_HOME" (if set) or otherwise assumed to be directly under
-  pytype (i.e., /{some_path}/pytype/typeshed).
+  pytype (i.e., /{some_path}/pytype/typeshed). In the latter case, the files
+  are read from the stub archive that pytype uses, if any (see
+  pytype_source_utils.use_stub_archive).
   """
 
   def __init__(self):
@@ -27,7 +30,9 @@ class Typeshed(object):
       self._root = home
     else:
       self._root = pytype_source_utils.get_full_path("typeshed")
+    self._archive = None if home else pytype_source_utils.get_stub_archive()
     self._missing = frozenset(self._load_missing())
+    self._file_index = None
 
   def _load_file(self, path):
     if self._env_home:
@@ -36,9 +41,33 @@ class Typeshed(object):
         return filename, f.read()
     else:
       filepath = os.path.join(self._root, path)
-      data = pytype_source_utils.load_pytype_file(filepath)
+      data = pytype_source_utils.load_pytype_file(
+          os.path.join("typeshed", path))
       return filepath, data
 
+  def _list_files(self):
+    """Yield the paths of all files in typeshed, relative to its root."""
+    if os.path.isdir(self._root):
+      for directory, _, filenames in os.walk(self._root, followlinks=True):
+        relative_directory = os.path.relpath(directory, self._root)
+        for filename in filenames:
+          yield os.path.normpath(os.path.join(relative_directory, filename))
+    else:
+      # typeshed is bundled with pytype, in an archive.
+      try:
+        for filename in pytype_source_utils.list_pytype_files("typeshed"):
+          yield filename
+      except pytype_source_utils.NoSuchDirectory:
+        pass
+
+  def _has_file(self, path):
+    """Whether typeshed has a file, according to a listing made on first use."""
+    if self._archive:
+      return self._archive.has_file(os.path.join("typeshed", path))
+    if self._file_index is None:
+      self._file_index = frozenset(self._list_files())
+    return path in self._file_index
+
   def _load_missing(self):
     return set()
 
@@ -65,8 +94,8 @@ class Typeshed(object):
       return True
     return False
 
-  def get_module_file(self, toplevel, module, version):
-    """Get the contents of a typeshed file, typically with a file name *.pyi.
+  def _find_module_file(self, toplevel, module, version):
+    """Find the file of a typeshed module.
 
     Arguments:
       toplevel: the top-level directory within typeshed/, typically "builtins",
@@ -76,12 +105,12 @@ class Typeshed(object):
       version: The Python version. (major, minor)
 
     Returns:
-      A tuple with the filename and contents of the file
+      A tuple with the path of the file, relative to typeshed's root, and
+      whether the module is known to be missing, in which case the file doesn't
+      exist.
     Raises:
       IOError: if file not found
     """
-    if self._ignore(module, version):
-      raise IOError("Couldn't find %s" % module)
     module_path = os.path.join(*module.split("."))
     versions = ["%d.%d" % (version[0], minor)
                 for minor in range(version[1], -1, -1)]
@@ -94,18 +123,74 @@ class Typeshed(object):
 
       # Give precedence to missing.txt
       if path_rel in self._missing:
-        return (os.path.join(self._root, "nonexistent", path_rel + ".pyi"),
-                builtins.DEFAULT_SRC)
+        return os.path.join("nonexistent", path_rel + ".pyi"), True
 
       # TODO(mdemello): handle this in the calling code.
       for path in [os.path.join(path_rel, "__init__.pyi"), path_rel + ".pyi"]:
+        # Most of the paths we try don't exist, so check the index first rather
+        # than making the file system tell us.
+        if self._has_file(path):
+          return path, False
+
+    raise IOError("Couldn't find %s" % module)
+
+  def get_module_file(self, toplevel, module, version):
+    """Get the contents of a typeshed file, typically with a file name *.pyi.
+
+    Arguments:
+      toplevel: the top-level directory within typeshed/, typically "builtins",
+        "stdlib" or "third_party".
+      module: module name (e.g., "sys" or "__builtins__"). Can contain dots, if
+        it's a submodule.
+      version: The Python version. (major, minor)
+
+    Returns:
+      A tuple with the filename and contents of the file
+    Raises:
+      IOError: if file not found
+    """
+    if self._ignore(module, version):
+      raise IOError("Couldn't find %s" % module)
+    # A stub archive knows where the modules for the common versions are.
+    modules = self._archive and self._archive.modules.get(
+        "%d.%d" % tuple(version), {}).get(toplevel)
+    if modules is None:
+      path, missing = self._find_module_file(toplevel, module, version)
+    elif module in modules:
+      path, missing = modules[module]
+    else:
+      raise IOError("Couldn't find %s" % module)
+    if missing:
+      return os.path.join(self._root, path), builtins.DEFAULT_SRC
+    return self._load_file(path)
+
+  def find_module_files(self, python_version):
+    """Find the files of all typeshed modules for a Python version.
+
+    Args:
+      python_version: The Python version. (major, minor)
+
+    Returns:
+      A map from a top-level directory within typeshed/, like "stdlib", to the
+      names of the modules in it, to what _find_module_file returns for them.
+      Modules that don't exist in this version are left out.
+    """
+    module_names = collections.defaultdict(set)
+    for path in list(self._list_files()) + list(self._missing):
+      parts = path.split(os.sep)
+      if len(parts) > 2 and parts[0] in ("stdlib", "third_party"):
+        module_names[parts[0]].add(
+            module_utils.path_to_module_name(os.path.join(*parts[2:])))
+    files = {}
+    for toplevel, names in module_names.items():
+      files[toplevel] = {}
+      for name in names:
         try:
-          name, src = self._load_file(path)
-          return name, src
+          files[toplevel][name] = self._find_module_file(
+              toplevel, name, python_version)
         except IOError:
           pass
-
-    raise IOError("Couldn't find %s" % module)
+    return files
 
   def get_typeshed_paths(self, python_version):
     """Gets the paths to typeshed's version-specific pyi files."""
@@ -2,6 +2,7 @@
 
 import os
 
+from pytype import file_utils
 from pytype.pytd import typeshed
 from pytype.pytd.parse import builtins
 from pytype.pytd.parse import parser_test_base
@@ -63,6 +64,24 @@ class TestTypeshedLoading(parser_test_base.ParserTest):
     finally:
       os.environ = old_env
 
+  def test_get_module_file_typeshed_home(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("stdlib/3.5/foo.pyi", "x = ...  # type: int")
+      d.create_file("stdlib/2and3/foo/bar/__init__.pyi")
+      old_env = os.environ.copy()
+      os.environ["TYPESHED_HOME"] = d.path
+      try:
+        t = typeshed.Typeshed()
+        filename, _ = t.get_module_file("stdlib", "foo", (3, 6))
+        self.assertEqual(filename, os.path.join(d.path, "stdlib/3.5/foo.pyi"))
+        filename, _ = t.get_module_file("stdlib", "foo.bar", (3, 6))
+        self.assertEqual(filename, os.path.join(
+            d.path, "stdlib/2and3/foo/bar/__init__.pyi"))
+        self.assertRaises(IOError, t.get_module_file, "stdlib", "foo", (3, 4))
+        self.assertRaises(IOError, t.get_module_file, "stdlib", "baz", (3, 6))
+      finally:
+        os.environ = old_env
+
   def test_read_blacklist(self):
     t = typeshed.Typeshed()
     for filename in t.read_blacklist():
@@ -20,6 +20,7 @@ import collections
 import itertools
 import logging
 import re
+import sys
 
 from pytype import datatypes
 from pytype import module_utils
@@ -2292,10 +2293,83 @@ class ExpandCompatibleBuiltins(Visitor):
 
 
 class ClearClassPointers(Visitor):
-  """Set .cls pointers to 'None'."""
+  """Set .cls pointers to 'None'.
 
-  def EnterClassType(self, node):
-    node.cls = None
+  This replaces ClassType nodes with new ones rather than modifying them, since
+  they may be shared with other ASTs (see InternNodes).
+  """
+
+  def VisitClassType(self, node):
+    if node.cls is None:
+      return node
+    return pytd.ClassType(node.name)
+
+
+class InternNodes(Visitor):
+  """Replace nodes with equal ones from the ASTs this visitor has seen before.
+
+  Every loaded module has its own copies of common nodes like
+  ClassType("__builtin__.str"), AnythingType() or the Parameter for "self".
+  This visitor remembers the nodes (and tuples of nodes) it visits and replaces
+  each one with the first equal one it saw, so that the copies can be freed.
+  Use one instance for all the ASTs whose nodes should be shared.
+
+  ClassType and FunctionType nodes are compared by name, so a node that
+  contains one with an unqualified name, which might be resolved differently in
+  different modules, isn't shared. Class and TypeDeclUnit nodes aren't shared
+  either. Since the visitor creates new Class nodes, it should only visit ASTs
+  whose local .cls pointers haven't been filled in yet. Unions and
+  intersections are equal regardless of the order of their members, so one
+  that only equals a shared node up to that order isn't shared either, to keep
+  the order in which it's printed.
+
+  Attributes:
+    saved_bytes: The total size of the nodes and tuples that were replaced,
+      not counting the objects they reference.
+  """
+  visits_all_node_types = True
+
+  def __init__(self):
+    super(InternNodes, self).__init__()
+    self._nodes = {}
+    # The ids of the nodes in the current AST that can't be shared.
+    self._local_nodes = set()
+    self.saved_bytes = 0
+
+  def _Intern(self, value):
+    canonical = self._nodes.setdefault(value, value)
+    if canonical is value:
+      return value
+    # The children have already been interned, so they only differ if == ignored
+    # the order of the members of a union or intersection.
+    if any(new is not old if isinstance(new, tuple) else new != old
+           for new, old in zip(value, canonical)):
+      self._local_nodes.add(id(value))
+      return value
+    self.saved_bytes += sys.getsizeof(value)
+    return canonical
+
+  def _IsLocal(self, value):
+    if value.__class__ is tuple:
+      return any(id(v) in self._local_nodes for v in value)
+    return id(value) in self._local_nodes
+
+  def Visit(self, node):
+    if isinstance(node, pytd.TypeDeclUnit):
+      self._local_nodes.clear()
+      return node
+    if (isinstance(node, (pytd.ClassType, pytd.FunctionType)) and
+        "." not in node.name or
+        any(self._IsLocal(child) for child in node)):
+      self._local_nodes.add(id(node))
+      return node
+    children = [self._Intern(child) if child.__class__ is tuple else child
+                for child in node]
+    if any(new is not old for new, old in zip(children, node)):
+      node = node.Replace(**dict(zip(node._fields, children)))
+    if isinstance(node, pytd.Class):
+      return node
+    return self._Intern(node)
 
 
 class ReplaceModulesWithAny(RemoveTypeParametersFromGenericAny):
@@ -2346,6 +2420,103 @@ class ClassTypeToLateType(Visitor):
     return pytd.LateType(n.name)
 
 
+class DeferExternalTypes(Visitor):
+  """Replace references to other modules in value types with LateTypes.
+
+  convert.Converter resolves a LateType when it converts it, so the modules
+  that a pyi only references in the signatures of its functions, the types of
+  its constants and its from-imports don't have to be loaded along with it.
+  References anywhere else, like in the bases of classes, in star imports or
+  in the bounds and constraints of type parameters, are left alone, since
+  resolving them can change the ast. So are names that occur more than once in
+  a signature: they might be type parameters, which need to be known when the
+  template of the signature is built.
+
+  Another module can resolve its own reference to a name that this one imports
+  to one of these LateTypes, possibly in a place where it can't be deferred.
+  Visiting that module again turns such LateTypes back into NamedTypes, which
+  need to be resolved as usual.
+
+  Attributes:
+    undeferred: The names of the LateTypes that were turned back into
+      NamedTypes.
+  """
+
+  def __init__(self, ignore):
+    """Initialize the visitor.
+
+    Args:
+      ignore: A list of module names whose types aren't replaced, typically
+        the module being visited and the ones pytype always loads, like
+        "__builtin__" and "typing". Their submodules aren't replaced either.
+    """
+    super(DeferExternalTypes, self).__init__()
+    self._ignore = ignore
+    self._value_type_depth = 0
+    self._repeated_names = ()
+    self._alias_depth = 0
+    self.undeferred = set()
+
+  def _CountNames(self, node, counts):
+    if isinstance(node, (pytd.NamedType, pytd.LateType)):
+      counts[node.name] += 1
+    elif isinstance(node, tuple):
+      for child in node:
+        self._CountNames(child, counts)
+
+  def EnterSignature(self, node):
+    self._value_type_depth += 1
+    counts = collections.Counter()
+    self._CountNames(node, counts)
+    self._repeated_names = {name for name, n in counts.items() if n > 1}
+
+  def LeaveSignature(self, _):
+    self._value_type_depth -= 1
+    self._repeated_names = ()
+
+  def EnterConstant(self, _):
+    self._value_type_depth += 1
+
+  def LeaveConstant(self, _):
+    self._value_type_depth -= 1
+
+  def EnterTypeParameter(self, _):
+    return False
+
+  def _CanDefer(self, name):
+    return self._value_type_depth and name not in self._repeated_names
+
+  def _IsExternal(self, name):
+    module_name, dot, _ = name.rpartition(".")
+    return bool(dot) and not any(
+        module_name == m or module_name.startswith(m + ".")
+        for m in self._ignore)
+
+  def EnterAlias(self, _):
+    self._alias_depth += 1
+
+  def LeaveAlias(self, _):
+    self._alias_depth -= 1
+
+  def VisitAlias(self, node):
+    # Aliases are top-level, so their types weren't replaced yet.
+    if (isinstance(node.type, pytd.NamedType) and
+        not node.type.name.endswith(".*") and self._IsExternal(node.type.name)):
+      return node.Replace(type=pytd.LateType(node.type.name))
+    return node
+
+  def VisitNamedType(self, node):
+    if self._CanDefer(node.name) and self._IsExternal(node.name):
+      return pytd.LateType(node.name)
+    return node
+
+  def VisitLateType(self, node):
+    if self._alias_depth or self._CanDefer(node.name):
+      return node
+    self.undeferred.add(node.name)
+    return pytd.NamedType(node.name)
+
+
 class LateTypeToClassType(Visitor):
   """Convert LateType to (unresolved) ClassType."""
 
@@ -657,8 +657,90 @@ class TestVisitors(parser_test_base.ParserTest):
   def testClearClassPointers(self):
     cls = pytd.Class("foo", None, (), (), (), None, ())
     t = pytd.ClassType("foo", cls)
-    t = t.Visit(visitors.ClearClassPointers())
-    self.assertIsNone(t.cls)
+    cleared = t.Visit(visitors.ClearClassPointers())
+    self.assertIsNone(cleared.cls)
+    self.assertIs(t.cls, cls)
+
+  def testInternNodes(self):
+    ast1 = self.Parse("""
+      import foo
+      def f(x: foo.Bar) -> List[int]: ...
+      def g(x) -> int: ...
+    """)
+    ast2 = self.Parse("""
+      import foo
+      def h(y: foo.Bar) -> List[int]: ...
+    """)
+    interner = visitors.InternNodes()
+    ast1 = ast1.Visit(interner)
+    saved_bytes = interner.saved_bytes
+    ast2 = ast2.Visit(interner)
+    self.assertGreater(interner.saved_bytes, saved_bytes)
+    f, g = ast1.functions
+    h, = ast2.functions
+    self.assertIs(f.signatures[0].return_type, h.signatures[0].return_type)
+    self.assertIs(f.signatures[0].return_type.parameters[0],
+                  g.signatures[0].return_type)
+    self.assertIs(f.signatures[0].params[0].type,
+                  h.signatures[0].params[0].type)
+    self.assertIsNot(f.signatures[0].params[0], h.signatures[0].params[0])
+    self.assertMultiLineEqual(pytd_utils.Print(ast2), textwrap.dedent("""\
+      import foo
+
+      def h(y: foo.Bar) -> List[int]: ..."""))
+
+  def testInternNodesUnqualifiedClassType(self):
+    t1 = pytd.GenericType(pytd.ClassType("list"), (pytd.ClassType("Foo"),))
+    t2 = pytd.GenericType(pytd.ClassType("list"), (pytd.ClassType("Foo"),))
+    interner = visitors.InternNodes()
+    t1 = t1.Visit(interner)
+    t2 = t2.Visit(interner)
+    self.assertIsNot(t1, t2)
+    t3 = pytd.GenericType(pytd.ClassType("foo.List"), (pytd.AnythingType(),))
+    t4 = pytd.GenericType(pytd.ClassType("foo.List"), (pytd.AnythingType(),))
+    self.assertIs(t3.Visit(interner), t4.Visit(interner))
+
+  def testInternNodesUnionOrder(self):
+    a = pytd.ClassType("foo.A")
+    b = pytd.ClassType("foo.B")
+    t1 = pytd.GenericType(pytd.ClassType("foo.List"), (pytd.UnionType((a, b)),))
+    t2 = pytd.GenericType(pytd.ClassType("foo.List"), (pytd.UnionType((b, a)),))
+    interner = visitors.InternNodes()
+    t1 = t1.Visit(interner)
+    t2 = t2.Visit(interner)
+    self.assertIsNot(t1, t2)
+    self.assertEqual(t2.parameters[0].type_list, (b, a))
+
+  def testDeferExternalTypes(self):
+    src = textwrap.dedent("""
+      import bar
+      import foo
+      from typing import TypeVar
+      T = TypeVar("T", bound=foo.Bound)
+      x = ...  # type: foo.X
+      class A(foo.Base):
+        y = ...  # type: List[foo.Y]
+        def f(self, x: foo.X, y: A) -> bar.Z: ...
+      def g(x: foo.T) -> List[foo.T]: ...
+      Alias = foo.Alias
+      from foo import *
+    """)
+    ast = self.Parse(src).Visit(visitors.DeferExternalTypes(ignore=["bar"]))
+    cls = ast.Lookup("A")
+    self.assertEqual(ast.Lookup("x").type, pytd.LateType("foo.X"))
+    self.assertEqual(cls.parents, (pytd.NamedType("foo.Base"),))
+    self.assertEqual(cls.Lookup("y").type.parameters,
+                     (pytd.LateType("foo.Y"),))
+    sig, = cls.Lookup("f").signatures
+    self.assertEqual([p.type for p in sig.params],
+                     [pytd.NamedType("A"), pytd.LateType("foo.X"),
+                      pytd.NamedType("A")])
+    self.assertEqual(sig.return_type, pytd.NamedType("bar.Z"))
+    sig, = ast.Lookup("g").signatures
+    self.assertEqual(sig.params[0].type, pytd.NamedType("foo.T"))
+    self.assertEqual(ast.Lookup("Alias").type, pytd.LateType("foo.Alias"))
+    self.assertEqual(ast.type_params[0].bound, pytd.NamedType("foo.Bound"))
+    self.assertIn(pytd.Alias("foo.*", pytd.NamedType("foo.*")), ast.aliases)
 
   def testExpandCompatibleBuiltins(self):
     src = textwrap.dedent("""
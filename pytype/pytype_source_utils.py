@@ -13,6 +13,25 @@ class NoSuchDirectory(Exception):
   pass
 
 
+# A stub_archive.StubArchive to read pytype's data files from, if any.
+_stub_archive = None
+
+
+def use_stub_archive(archive):
+  """Read the stubs that pytype ships with from an archive.
+
+  Arguments:
+    archive: A stub_archive.StubArchive, or None to read the stubs from the
+      pytype installation again.
+  """
+  global _stub_archive
+  _stub_archive = archive
+
+
+def get_stub_archive():
+  return _stub_archive
+
+
 def pytype_source_dir():
   """The base directory of the pytype source tree."""
   return os.path.dirname(__file__)
@@ -42,6 +61,8 @@ def load_pytype_file(filename):
   Raises:
     IOError: if file not found
   """
+  if _stub_archive and _stub_archive.has_file(filename):
+    return _stub_archive.load_file(filename)
   return load_data_file(get_full_path(filename))
 
 
@@ -64,6 +85,12 @@ def list_pytype_files(suffix):
     NoSuchDirectory: if the directory doesn't exist.
   """
   assert not suffix.endswith("/")
+  if _stub_archive:
+    filenames = list(_stub_archive.list_files(suffix))
+    if filenames:
+      for filename in filenames:
+        yield filename
+      return
   loader = globals().get("__loader__", None)
   try:
     # List directory using __loader__.
@@ -0,0 +1,89 @@
+"""An on-disk store of function summaries.
+
+A summary records what a call of an InterpreterFunction returned and which
+errors it logged, keyed by everything the call depended on: the function's
+code, the types of its arguments and of the globals it reads, and how deep the
+VM could still follow calls. Calls with the same key can reuse the summary
+instead of running the function again, in this or in a later run.
+"""
+
+import collections
+import hashlib
+import logging
+import os
+import sys
+
+from pytype import __version__
+from six.moves import cPickle
+
+
+log = logging.getLogger(__name__)
+
+_PICKLE_PROTOCOL = cPickle.HIGHEST_PROTOCOL
+_SUFFIX = ".summary"
+
+
+# The return type is a pytd type without class pointers, and the errors are
+# errors.Error objects.
+Summary = collections.namedtuple("Summary", ["return_type", "errors"])
+
+
+class SummaryCache(object):
+  """A directory of pickled summaries, one file per key."""
+
+  def __init__(self, directory):
+    """Initialize.
+
+    Args:
+      directory: The cache directory. Created when the first entry is stored.
+    """
+    self.directory = directory
+
+  def get_key(self, python_version, parts):
+    """Compute the key for a call.
+
+    Args:
+      python_version: The Python version the call was analyzed for.
+      parts: A sequence of strings describing what the call depends on.
+    Returns:
+      The key, a string.
+    """
+    # Entries are pickled with the highest protocol of the interpreter pytype
+    # runs under, so that interpreter is part of the key, too.
+    h = hashlib.sha256(repr((__version__.__version__,
+                             tuple(sys.version_info[:2]),
+                             tuple(python_version))).encode("utf-8"))
+    for part in parts:
+      h.update(b"\0")
+      h.update(part.encode("utf-8"))
+    return h.hexdigest()
+
+  def _path(self, key):
+    return os.path.join(self.directory, key + _SUFFIX)
+
+  def get(self, key):
+    """Get the Summary stored under key, or None."""
+    path = self._path(key)
+    try:
+      with open(path, "rb") as fi:
+        return cPickle.load(fi)
+    except (IOError, OSError, EOFError, ValueError,
+            cPickle.UnpicklingError) as e:
+      if os.path.exists(path):
+        log.warning("Ignoring unreadable summary cache entry %s: %s", path, e)
+      return None
+
+  def put(self, key, summary):
+    """Store a Summary under key."""
+    path = self._path(key)
+    # Write to a temporary file first, so that concurrent readers never see a
+    # partially written entry.
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    try:
+      if not os.path.isdir(self.directory):
+        os.makedirs(self.directory)
+      with open(tmp_path, "wb") as fi:
+        cPickle.dump(summary, fi, _PICKLE_PROTOCOL)
+      os.rename(tmp_path, path)
+    except (IOError, OSError) as e:
+      log.warning("Could not write summary cache entry %s: %s", path, e)
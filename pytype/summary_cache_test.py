@@ -0,0 +1,57 @@
+"""Tests for summary_cache.py."""
+
+import os
+
+from pytype import errors
+from pytype import file_utils
+from pytype import summary_cache
+from pytype.pytd import pytd
+
+import unittest
+
+
+class SummaryCacheTest(unittest.TestCase):
+  """Tests for SummaryCache."""
+
+  def test_key(self):
+    cache = summary_cache.SummaryCache("")
+    key = cache.get_key((2, 7), ["f", "arg x: int"])
+    self.assertEqual(key, cache.get_key((2, 7), ["f", u"arg x: int"]))
+    self.assertNotEqual(key, cache.get_key((3, 6), ["f", "arg x: int"]))
+    self.assertNotEqual(key, cache.get_key((2, 7), ["f", "arg x: str"]))
+    self.assertNotEqual(key, cache.get_key((2, 7), ["farg x: int"]))
+
+  def test_miss(self):
+    with file_utils.Tempdir() as d:
+      cache = summary_cache.SummaryCache(d.path)
+      self.assertIsNone(cache.get("0"))
+
+  @errors._error_name("test-error")
+  def test_put(self):
+    with file_utils.Tempdir() as d:
+      cache = summary_cache.SummaryCache(os.path.join(d.path, "cache"))
+      error = errors.Error(errors.SEVERITY_ERROR, "message", filename="foo.py",
+                           lineno=3)
+      cache.put("0", summary_cache.Summary(
+          pytd.NamedType("__builtin__.int"), [error]))
+      summary = cache.get("0")
+      self.assertEqual(summary.return_type, pytd.NamedType("__builtin__.int"))
+      cached_error, = summary.errors
+      self.assertEqual(str(cached_error), str(error))
+
+  def test_unreadable(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("0.summary", "not a pickle")
+      cache = summary_cache.SummaryCache(d.path)
+      self.assertIsNone(cache.get("0"))
+
+  def test_unsupported_protocol(self):
+    with file_utils.Tempdir() as d:
+      # What a newer interpreter's pickle protocol looks like to an older one.
+      d.create_file("0.summary", b"\x80\xff.")
+      cache = summary_cache.SummaryCache(d.path)
+      self.assertIsNone(cache.get("0"))
+
+
+if __name__ == "__main__":
+  unittest.main()
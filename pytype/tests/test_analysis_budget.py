@@ -0,0 +1,57 @@
+"""Tests for --analysis-budget and --function-analysis-budget."""
+
+from pytype.tests import test_base
+
+
+# Budgets that run out right away.
+_NO_TIME = 1e-9
+
+
+class AnalysisBudgetTest(test_base.TargetIndependentTest):
+  """Tests for running out of analysis budget."""
+
+  def testModuleBudget(self):
+    self.options.tweak(analysis_budget=_NO_TIME)
+    ty, errors = self.InferWithErrors("""\
+      def f():
+        return [42]
+      def g():
+        return f()
+      x = g()
+    """)
+    self.assertTypesMatchPytd(ty, """
+      from typing import Any
+      x = ...  # type: Any
+      def f() -> Any: ...
+      def g() -> Any: ...
+    """)
+    self.assertErrorLogIs(errors, [
+        (1, "analysis-truncated", r"calls in module-level code"),
+        (1, "analysis-truncated", r"not analyzing f"),
+        (3, "analysis-truncated", r"not analyzing g")])
+
+  def testFunctionBudget(self):
+    self.options.tweak(function_analysis_budget=_NO_TIME)
+    ty, errors = self.InferWithErrors("""\
+      def f():
+        return [42]
+      def g():
+        return f()
+    """)
+    self.assertTypesMatchPytd(ty, """
+      from typing import Any, List
+      def f() -> List[int]: ...
+      def g() -> Any: ...
+    """)
+    self.assertErrorLogIs(errors, [(3, "analysis-truncated", r"calls in g")])
+
+  def testErrorsBeforeBudgetRunsOut(self):
+    self.options.tweak(function_analysis_budget=_NO_TIME)
+    _, errors = self.InferWithErrors("""\
+      def f():
+        return "" + 42
+    """)
+    self.assertErrorLogIs(errors, [(2, "wrong-arg-types")])
+
+
+test_base.main(globals(), __name__ == "__main__")
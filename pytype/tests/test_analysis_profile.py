@@ -0,0 +1,39 @@
+"""Tests for --analysis-profile and --analysis-profile-folded."""
+
+import os
+
+from pytype import file_utils
+from pytype.tests import test_base
+
+
+class AnalysisProfileTest(test_base.TargetIndependentTest):
+  """Tests for profiling the analysis of the input's functions."""
+
+  def testProfile(self):
+    with file_utils.Tempdir() as d:
+      report = os.path.join(d.path, "profile.tsv")
+      folded = os.path.join(d.path, "profile.folded")
+      self.options.tweak(analysis_profile=report,
+                         analysis_profile_folded=folded)
+      self.Infer("""\
+        def f():
+          return [42]
+        def g():
+          return f()
+      """)
+      with open(report) as fi:
+        lines = fi.read().splitlines()
+      with open(folded) as fi:
+        stacks = fi.read()
+    self.assertTrue(lines[0].startswith("frames\t"))
+    functions = [line.split("\t")[-1] for line in lines[1:]]
+    self.assertTrue(any(name.startswith("<module> (") for name in functions))
+    self.assertTrue(any(name.startswith("f (") for name in functions))
+    self.assertTrue(any(name.startswith("g (") for name in functions))
+    for line in stacks.splitlines():
+      path, microseconds = line.rsplit(" ", 1)
+      self.assertTrue(path)
+      self.assertGreater(int(microseconds), 0)
+
+
+test_base.main(globals(), __name__ == "__main__")
@@ -0,0 +1,93 @@
+"""Tests for --analyze-jobs."""
+
+from pytype.pytd import pytd_utils
+from pytype.tests import test_base
+
+
+class AnalyzeJobsTest(test_base.TargetIndependentTest):
+  """Tests for analyzing top-level definitions in several processes."""
+
+  def _InferSerialAndParallel(self, code, **kwargs):
+    self.options.tweak(analyze_jobs=1)
+    serial = self.Infer(code, **kwargs)
+    self.options.tweak(analyze_jobs=3)
+    parallel = self.Infer(code, **kwargs)
+    return pytd_utils.Print(serial), pytd_utils.Print(parallel)
+
+  def testInfer(self):
+    serial, parallel = self._InferSerialAndParallel("""
+      import collections
+      Point = collections.namedtuple("Point", ["x", "y"])
+      def f(x):
+        return Point(x, 2)
+      def g():
+        return f(1).y
+      class Foo(object):
+        def __init__(self):
+          self.x = g()
+        def get(self):
+          return self.x
+      def h():
+        return Foo().get()
+      def decorate(f):
+        return f
+      @decorate
+      def k(x):
+        return [x]
+      X = h()
+    """)
+    self.assertMultiLineEqual(serial, parallel)
+
+  def testErrors(self):
+    self.options.tweak(analyze_jobs=2)
+    _, errors = self.InferWithErrors("""\
+      def f():
+        return "" + 42
+      class Foo(object):
+        def f(self):
+          return self.foo
+      def h():
+        def nested():
+          return 1 + ""
+        return nested
+    """)
+    self.assertErrorLogIs(errors, [(2, "wrong-arg-types", r"str.*int"),
+                                   (5, "attribute-error", r"foo"),
+                                   (8, "wrong-arg-types", r"int.*str")])
+
+  def testUnknowns(self):
+    self.options.tweak(analyze_jobs=2)
+    ty = self.Infer("""
+      def f(x):
+        return x.foo
+      def g(x):
+        return x.bar
+    """, show_library_calls=True)
+    f, = ty.Lookup("f").signatures
+    g, = ty.Lookup("g").signatures
+    # The workers number their unknowns the same way, but the names stay
+    # unique.
+    self.assertNotEqual(f.params[0].type.name, g.params[0].type.name)
+    ty.Lookup(f.params[0].type.name)
+    ty.Lookup(g.params[0].type.name)
+
+  def testLibraryCalls(self):
+    # The workers trace different methods of list.
+    code = """
+      def f(x):
+        return [1] + x
+      def g(x):
+        return [1] * x
+    """
+    self.options.tweak(analyze_jobs=1)
+    serial = self.Infer(code, show_library_calls=True)
+    self.options.tweak(analyze_jobs=2)
+    parallel = self.Infer(code, show_library_calls=True)
+    list_calls = "~__builtin__~list"
+    self.assertEqual([m.name for m in serial.Lookup(list_calls).methods],
+                     ["__add__", "__mul__"])
+    self.assertEqual([m.name for m in parallel.Lookup(list_calls).methods],
+                     ["__add__", "__mul__"])
+
+
+test_base.main(globals(), __name__ == "__main__")
@@ -0,0 +1,96 @@
+"""Tests for --function-summary-dir."""
+
+import os
+
+from pytype import file_utils
+from pytype.pytd import pytd_utils
+from pytype.tests import test_base
+
+
+class FunctionSummariesTest(test_base.TargetIndependentTest):
+  """Tests for reusing summaries of function calls."""
+
+  def _InferWithSummaries(self, code, summary_dir, **kwargs):
+    self.options.tweak(function_summary_dir=summary_dir)
+    try:
+      ty, errors = self.InferWithErrors(code, **kwargs)
+    finally:
+      self.options.tweak(function_summary_dir=None)
+    return pytd_utils.Print(ty), errors
+
+  def testReuse(self):
+    code = """\
+      import os
+      def join(parts):
+        out = ""
+        for p in parts:
+          out = os.path.join(out, p)
+        return out.upper()
+      def bad(x):
+        return x + ""
+      def f():
+        return join(["a", "b"]), bad(3)
+      def g():
+        return join(["c"])
+    """
+    ty, errors = self.InferWithErrors(code)
+    without = pytd_utils.Print(ty)
+    self.assertErrorLogIs(errors, [(8, "wrong-arg-types")])
+    with file_utils.Tempdir() as d:
+      first, errors = self._InferWithSummaries(code, d.path)
+      self.assertErrorLogIs(errors, [(8, "wrong-arg-types")])
+      self.assertTrue(os.listdir(d.path))
+      second, errors = self._InferWithSummaries(code, d.path)
+      self.assertErrorLogIs(errors, [(8, "wrong-arg-types")])
+    self.assertMultiLineEqual(without, first)
+    self.assertMultiLineEqual(without, second)
+
+  def testSideEffects(self):
+    code = """\
+      def add(x):
+        x.append(42)
+      def f():
+        x = [""]
+        add(x)
+        return x
+    """
+    without = pytd_utils.Print(self.InferWithErrors(code)[0])
+    with file_utils.Tempdir() as d:
+      for _ in range(2):
+        ty, _ = self._InferWithSummaries(code, d.path)
+        self.assertMultiLineEqual(without, ty)
+
+  def testLocalClass(self):
+    code = """\
+      class Foo(object):
+        pass
+      def make(x):
+        return Foo()
+      def f():
+        return make(1)
+    """
+    with file_utils.Tempdir() as d:
+      self._InferWithSummaries(code, d.path)
+      # A summary can't refer to Foo, which only this module defines.
+      self.assertFalse(os.listdir(d.path))
+
+  def testModuleChange(self):
+    code = """\
+      import foo
+      def f():
+        return foo.x
+      y = f()
+    """
+    with file_utils.Tempdir() as d:
+      with file_utils.Tempdir() as d1:
+        with file_utils.Tempdir() as d2:
+          d1.create_file("foo.pyi", "x = ...  # type: int")
+          d2.create_file("foo.pyi", "x = ...  # type: str")
+          ty, _ = self._InferWithSummaries(code, d.path, pythonpath=[d1.path])
+          self.assertIn("y = ...  # type: int", ty)
+          # Another foo.pyi doesn't reuse the summary of f.
+          ty, _ = self._InferWithSummaries(code, d.path, pythonpath=[d2.path])
+          self.assertIn("y = ...  # type: str", ty)
+
+
+test_base.main(globals(), __name__ == "__main__")
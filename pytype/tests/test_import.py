@@ -1011,5 +1011,37 @@ class ImportTest(test_base.TargetIndependentTest):
         baz = foo
       """)
 
+  def testLazyDependencies(self):
+    with file_utils.Tempdir() as d:
+      d.create_file("foo.pyi", """
+        import bar
+        from bar import B
+        class A(object):
+          x = ...  # type: bar.B
+          def f(self) -> bar.B: ...
+      """)
+      d.create_file("bar.pyi", """
+        class B(object):
+          y = ...  # type: int
+      """)
+      d.create_file("baz.pyi", """
+        from foo import B
+      """)
+      self.ConfigureOptions(lazy_pyi_dependencies=True)
+      ty = self.Infer("""
+        import baz
+        import foo
+        x = foo.A().x.y
+        y = foo.A().f().y
+        z = baz.B().y
+      """, pythonpath=[d.path])
+      self.assertTypesMatchPytd(ty, """
+        baz = ...  # type: module
+        foo = ...  # type: module
+        x = ...  # type: int
+        y = ...  # type: int
+        z = ...  # type: int
+      """)
+
 
 test_base.main(globals(), __name__ == "__main__")
@@ -0,0 +1,120 @@
+"""Tests for --type-keyed-calls."""
+
+from pytype.pytd import pytd_utils
+from pytype.tests import test_base
+
+
+class TypeKeyedCallsTest(test_base.TargetIndependentTest):
+  """Tests for reusing calls with arguments of the same types."""
+
+  def _InferWithAndWithoutTypeKeys(self, code):
+    self.options.tweak(type_keyed_calls=False)
+    ty, errors = self.InferWithErrors(code)
+    self.options.tweak(type_keyed_calls=True)
+    keyed_ty, keyed_errors = self.InferWithErrors(code)
+    self.assertEqual([str(e) for e in errors], [str(e) for e in keyed_errors])
+    return pytd_utils.Print(ty), pytd_utils.Print(keyed_ty)
+
+  def testReuse(self):
+    ty, keyed_ty = self._InferWithAndWithoutTypeKeys("""
+      class Foo(object):
+        def __init__(self):
+          self.x = 3
+        def get(self):
+          return self.x
+        def size(self):
+          return len(str(self.x))
+      def f(a, b):
+        return a.size() + b.get()
+      def g():
+        return [f(Foo(), Foo()) for _ in range(3)]
+    """)
+    self.assertMultiLineEqual(ty, keyed_ty)
+
+  def testMutation(self):
+    ty, keyed_ty = self._InferWithAndWithoutTypeKeys("""\
+      class Foo(object):
+        pass
+      def set_y(x):
+        x.y = ""
+      def f():
+        a = Foo()
+        set_y(a)
+        return a.y
+      def g():
+        b = Foo()
+        set_y(b)
+        return b.y
+      def append(x):
+        x.append(42)
+      def h():
+        append([""])
+        l = [""]
+        append(l)
+        return l
+    """)
+    self.assertMultiLineEqual(ty, keyed_ty)
+    self.assertIn("def g() -> str", keyed_ty)
+    self.assertIn("def h() -> List[Union[int, str]]", keyed_ty)
+
+  def testReturnArgument(self):
+    ty, keyed_ty = self._InferWithAndWithoutTypeKeys("""\
+      class Foo(object):
+        pass
+      def ident(x):
+        return x
+      def f():
+        a = ident(Foo())
+        b = ident(Foo())
+        a.x = 42
+        return b.x
+    """)
+    self.assertMultiLineEqual(ty, keyed_ty)
+
+  def testReturnNewInstance(self):
+    ty, keyed_ty = self._InferWithAndWithoutTypeKeys("""\
+      class Foo(object):
+        pass
+      def make(x):
+        return []
+      def f():
+        a = make(Foo())
+        a.append(1)
+        return a
+      def g():
+        return make(Foo())
+    """)
+    self.assertMultiLineEqual(ty, keyed_ty)
+    self.assertIn("def g() -> List[nothing]", keyed_ty)
+
+  def testConditions(self):
+    self.options.tweak(type_keyed_calls=True)
+    _, errors = self.InferWithErrors("""\
+      class Foo(object):
+        def __init__(self):
+          self._foo = 42 if __random__ else "hello world"
+        def get(self):
+          return self._foo
+      foo1 = Foo()
+      foo2 = Foo()
+      if isinstance(foo1.get(), str):
+        x = foo2.get().upper()  # line 9
+    """)
+    self.assertErrorLogIs(errors, [(9, "attribute-error", r"upper.*int")])
+
+  def testConstants(self):
+    ty, keyed_ty = self._InferWithAndWithoutTypeKeys("""\
+      import collections
+      def make(name):
+        return collections.namedtuple(name, ["x"])
+      A = make("A")
+      B = make("B")
+      def get(d, key):
+        return d[key]
+      x = get({"a": 1, "b": ""}, "a")
+      y = get({"a": 1, "b": ""}, "b")
+    """)
+    self.assertMultiLineEqual(ty, keyed_ty)
+
+
+test_base.main(globals(), __name__ == "__main__")
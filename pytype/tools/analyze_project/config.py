@@ -28,7 +28,9 @@ ITEMS = {
         'pytype_output', 'pytype_output', 'All pytype output goes here.'),
     'pythonpath': Item(
         '', '/path/to/project:/path/to/project',
-        'Paths to source code directories, separated by %r.' % os.pathsep)
+        'Paths to source code directories, separated by %r.' % os.pathsep),
+    'jobs': Item(
+        1, 1, 'Number of modules to analyze in parallel.'),
 }
 
 
@@ -36,7 +38,8 @@ def make_converters(cwd=None):
   """For items that need coaxing into their internal representations."""
   return {
       'output': lambda v: file_utils.expand_path(v, cwd),
-      'pythonpath': lambda v: file_utils.expand_pythonpath(v, cwd)
+      'pythonpath': lambda v: file_utils.expand_pythonpath(v, cwd),
+      'jobs': int,
   }
 
 
@@ -64,7 +67,8 @@ def Config(*extra_variables):  # pylint: disable=invalid-name
     copy in the final results in the right order.
     """
 
-    __slots__ = ('pythonpath', 'output', 'python_version') + extra_variables
+    __slots__ = (
+        'pythonpath', 'output', 'python_version', 'jobs') + extra_variables
 
     def populate_from(self, obj):
       """Populate self from another object's attributes."""
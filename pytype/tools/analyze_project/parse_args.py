@@ -125,7 +125,8 @@ def make_parser():
   types = config.make_converters()
   for short_arg, arg, dest in [('-V', '--python-version', 'python_version'),
                                ('-o', '--output', 'output'),
-                               ('-P', '--pythonpath', 'pythonpath')]:
+                               ('-P', '--pythonpath', 'pythonpath'),
+                               ('-j', '--jobs', 'jobs')]:
     parser.add_argument(short_arg, arg, dest=dest, type=types.get(dest),
                         action='store', default=config.ITEMS[dest].default,
                         help=config.ITEMS[dest].comment)
@@ -76,6 +76,10 @@ class TestParser(unittest.TestCase):
     self.assertSequenceEqual(self.parser.parse_args(
         ['--pythonpath', ':foo']).pythonpath, [d, os.path.join(d, 'foo')])
 
+  def test_jobs(self):
+    self.assertEqual(self.parser.parse_args(['-j', '4']).jobs, 4)
+    self.assertEqual(self.parser.parse_args(['--jobs', '4']).jobs, 4)
+
   def test_defaults(self):
     args = self.parser.parse_args([])
     for arg in ['python_version', 'output', 'pythonpath']:
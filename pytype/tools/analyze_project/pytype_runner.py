@@ -2,17 +2,28 @@
 
 from __future__ import print_function
 
+import collections
+import glob
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
 import sys
+import traceback
 
 from pytype import config as pytype_config
 from pytype import debug
 from pytype import file_utils
 from pytype import io
+from pytype import load_pytd
 from pytype import module_utils
+from pytype import utils
+from pytype.pytd import typeshed
 from pytype.tools.analyze_project import config
 
+from six.moves import queue
+
 
 # Generate a default pyi for dependencies not in the pythonpath.
 DEFAULT_PYI = """
@@ -20,6 +31,22 @@ from typing import Any
 def __getattr__(name) -> Any: ...
 """
 
+# Records the inputs of the last successful run over each module, so that
+# unchanged modules can be skipped. Lives in the output directory.
+MANIFEST_FILE = '.pytype_manifest.json'
+
+# Holds the precompiled builtins, so that they are only generated when pytype,
+# typeshed or the Python version changes. Lives in the output directory.
+BUILTINS_DIR = '.pytype_builtins'
+
+# Caches the bytecode of the analyzed sources, so that modules that are only
+# reanalyzed because a dependency changed aren't compiled again.
+BYTECODE_CACHE_DIR = '.pytype_bytecode'
+
+# Caches the parsed and resolved .pyi files, both the generated ones and
+# third-party ones, so that each is only parsed once across runs.
+PYI_CACHE_DIR = '.pytype_parsed_pyi'
+
 
 class Action(object):
   REPORT_ERRORS = 1
@@ -52,6 +79,63 @@ def deps_from_import_graph(import_graph):
           for files in import_graph.sorted_source_files()]
 
 
+def dependencies_from_import_graph(import_graph):
+  """Construct the PytypeRunner dependency map from an importlab.ImportGraph.
+
+  Args:
+    import_graph: An importlab.ImportGraph instance.
+
+  Returns:
+    A dict mapping the full path of each source file to the set of full paths
+    of the files it imports. Members of an import cycle depend on the
+    dependencies of the whole cycle.
+  """
+  def files(node):
+    # Import cycles are collapsed into nodes with a list of files.
+    return getattr(node, 'nodes', [node])
+  deps = {}
+  for node, node_deps in import_graph.deps_list():
+    dep_files = {f for dep in node_deps for f in files(dep)}  # pylint: disable=g-complex-comprehension
+    for f in files(node):
+      deps[f] = dep_files
+  return deps
+
+
+def _hash_file(filename):
+  """Returns a hash of the file's contents, or None if it can't be read."""
+  try:
+    with open(filename, 'rb') as f:
+      return hashlib.sha256(f.read()).hexdigest()
+  except IOError:
+    return None
+
+
+def _get_builtins_key(python_version):
+  """Compute a key that changes whenever the precompiled builtins would.
+
+  Args:
+    python_version: The Python version, as a (major, minor) tuple.
+
+  Returns:
+    A hex digest of the pytype version, the Python version, and the stubs that
+    go into the builtins for that version.
+  """
+  h = hashlib.sha256()
+  h.update(('%s %d.%d' % ((io.get_pytype_version(),) + python_version)).encode(
+      'utf-8'))
+  t = typeshed.Typeshed()
+  paths = (t.get_typeshed_paths(python_version) +
+           t.get_pytd_paths(python_version))
+  filenames = [os.path.join(t.root, 'tests', 'pytype_blacklist.txt')]
+  for path in paths:
+    for root, _, files in os.walk(path):
+      filenames.extend(os.path.join(root, f) for f in files)
+  for filename in sorted(filenames):
+    h.update(filename.encode('utf-8'))
+    h.update((_hash_file(filename) or '').encode('utf-8'))
+  return h.hexdigest()
+
+
 def _print_transient(msg):
   """Prints an overwritable terminal message.
 
@@ -66,21 +150,76 @@ def _print_transient(msg):
     print(msg + '\r', end='')
 
 
+# The PytypeRunner used by worker processes in parallel mode, and the queue on
+# which they report which group they are processing.
+_worker_runner = None
+_worker_started = None
+
+# How often, in seconds, the scheduler checks for failed workers.
+_POLL_INTERVAL = 1
+
+
+def _init_worker(runner, started):
+  global _worker_runner, _worker_started  # pylint: disable=global-statement
+  _worker_runner = runner
+  _worker_started = started
+
+
+def _process_group(index, group):
+  """Process a group of modules in a worker process.
+
+  Args:
+    index: The index of the group, passed back to the scheduler.
+    group: A list of (module, action) pairs.
+
+  Returns:
+    A tuple of the group index, whether all modules were processed without
+    errors, and a formatted traceback if processing failed, else None.
+  """
+  _worker_started.put((index, os.getpid()))
+  try:
+    ok = _worker_runner.process_group(group, transient=False)
+  except (Exception, SystemExit):  # pylint: disable=broad-except
+    return index, False, traceback.format_exc()
+  return index, ok, None
+
+
 class PytypeRunner(object):
   """Runs pytype over an import graph."""
 
-  def __init__(self, filenames, sorted_sources, conf):
+  def __init__(self, filenames, sorted_sources, conf, dependencies=None):
     self.filenames = set(filenames)  # files to type-check
     self.sorted_sources = sorted_sources  # all source modules
+    # Maps the full path of each source to the full paths of its imports.
+    # Needed to analyze modules in parallel and to skip unchanged modules.
+    self.dependencies = dependencies
+    self.jobs = getattr(conf, 'jobs', 1)
     self.pythonpath = conf.pythonpath
     self.python_version = conf.python_version
     self.pyi_dir = conf.output
     self.custom_options = {
         k: getattr(conf, k) for k in set(conf.__slots__) - set(config.ITEMS)}
+    self.manifest_file = os.path.join(self.pyi_dir, MANIFEST_FILE)
+    # Maps the full path of each source to the key of its last successful run.
+    self.manifest = {}
+    self._modules_by_path = {
+        m.full_path: m for group in sorted_sources for m in group}
+    self._transitive_deps = {}
+    self._output_hashes = {}
+    # Maps a loader key to the modules that the loader of the next module with
+    # that key can start with, so that the stubs of builtins, typeshed and
+    # already analyzed modules are only loaded once per process.
+    self._loader_modules = {}
+    # The precompiled builtins pickle passed to pytype, set up by run().
+    self.precompiled_builtins = None
 
   def get_pytype_args(self, module, report_errors):
     """Get the options for running pytype on the given module."""
-    return [
+    if self.precompiled_builtins:
+      builtins_args = ['--precompiled-builtins', self.precompiled_builtins]
+    else:
+      builtins_args = []
+    return builtins_args + [
         '-P', self.pyi_dir,
         '-V', self.python_version,
         '-o', self._output_file(module),
@@ -88,6 +227,8 @@ class PytypeRunner(object):
         '--module-name', module.name,
         '--analyze-annotated' if report_errors else '--no-report-errors',
         '--nofail',
+        '--bytecode-cache-dir', os.path.join(self.pyi_dir, BYTECODE_CACHE_DIR),
+        '--pyi-cache-dir', os.path.join(self.pyi_dir, PYI_CACHE_DIR),
         module.full_path,
     ]
 
@@ -95,6 +236,49 @@ class PytypeRunner(object):
     filename = module.name.replace('.', os.path.sep) + '.pyi'
     return os.path.join(self.pyi_dir, filename)
 
+  def get_precompiled_builtins(self):
+    """Get the precompiled builtins for our Python version, building if needed.
+
+    The pickle is named after a key covering everything that goes into it, so
+    an existing pickle is reused for as long as it is up to date. Pickles of
+    other versions are deleted when a new one is built.
+
+    Returns:
+      The path of the pickle, or None if it couldn't be built.
+    """
+    python_version = utils.split_version(self.python_version)
+    builtins_dir = os.path.join(self.pyi_dir, BUILTINS_DIR)
+    try:
+      key = _get_builtins_key(python_version)
+      filename = os.path.join(builtins_dir, 'builtins-%s.pickle' % key)
+      if os.path.exists(filename):
+        return filename
+      file_utils.makedirs(builtins_dir)
+    except (IOError, OSError) as e:
+      logging.error('Could not set up precompiled builtins: %s', e)
+      return None
+    print('Precompiling builtins for Python %s' % self.python_version)
+    # Write to a temporary file first, so that other pytype runs never see a
+    # partially written pickle.
+    tmp_filename = '%s.%d.tmp' % (filename, os.getpid())
+    try:
+      with debug.save_logging_level():
+        options = pytype_config.Options([
+            '--generate-builtins', tmp_filename, '-V', self.python_version,
+            '--generate-builtins-jobs', str(self.jobs)])
+        io.generate_builtins_pickle(options)
+      os.rename(tmp_filename, filename)
+    except Exception:  # pylint: disable=broad-except
+      logging.error('Could not precompile builtins:\n%s',
+                    traceback.format_exc())
+      if os.path.exists(tmp_filename):
+        os.remove(tmp_filename)
+      return None
+    for old in glob.glob(os.path.join(builtins_dir, 'builtins-*.pickle')):
+      if old != filename:
+        os.remove(old)
+    return filename
+
   def create_output_dir(self, module):
     # Create the output subdirectory for this file.
     target_dir = os.path.dirname(self._output_file(module))
@@ -127,30 +311,82 @@ class PytypeRunner(object):
       # TODO(rechen): Do this tweaking in get_pytype_args so it can be tested.
       if report_errors:
         options.tweak(**self.custom_options)
-      io.process_one_file(options)
+      return self._process_one_file(options)
+
+  def _process_one_file(self, options):
+    """Run pytype-single in-process, reusing the modules of earlier loaders."""
+    key = load_pytd.get_loader_key(options)
+    # Modules whose .pyi files were regenerated since they were loaded are
+    # dropped, along with the modules that depend on them.
+    modules = load_pytd.filter_reusable_modules(
+        self._loader_modules.get(key, {}))
+    loader = load_pytd.create_loader(options, modules)
+    ret = io.process_one_file(options, loader)
+    self._loader_modules[key] = loader.get_reusable_modules(include_files=True)
+    return ret
 
-  def process_module(self, module, action):
-    """Process a single module with the given action."""
+  def process_module(self, module, action, transient=True):
+    """Process a single module with the given action.
+
+    Args:
+      module: A module_utils.Module.
+      action: An Action.
+      transient: Whether to print a transient progress message.
+
+    Returns:
+      An exit code (0 means no error).
+    """
+    print_transient = _print_transient if transient else lambda msg: None
     if action == Action.REPORT_ERRORS:
       msg = '%s' % module.target
-      _print_transient(msg)
-      self.run_pytype(module, True)
+      print_transient(msg)
+      ret = self.run_pytype(module, True)
     elif action == Action.IGNORE_ERRORS:
       msg = '%s*' % module.target
-      _print_transient(msg)
-      self.run_pytype(module, False)
+      print_transient(msg)
+      ret = self.run_pytype(module, False)
     elif action == Action.GENERATE_DEFAULT:
       msg = '%s#' % module.target
-      _print_transient(msg)
+      print_transient(msg)
       self.write_default_pyi(module)
+      ret = 0
     else:
       logging.fatal('Unexpected action %r', action)
-      return
+      return 1
     # Clears the message by overwriting it with whitespace.
-    _print_transient(' ' * len(msg))
+    print_transient(' ' * len(msg))
+    return ret
+
+  def process_group(self, group, transient=True):
+    """Process a group of (module, action) pairs in order.
+
+    Args:
+      group: A list of (module, action) pairs.
+      transient: Whether to print transient progress messages.
+
+    Returns:
+      True if all modules were processed without errors, else False.
+    """
+    rets = [self.process_module(module, action, transient)
+            for module, action in group]
+    return not any(rets)
 
   def yield_sorted_modules(self):
     """Yield modules from our sorted source files."""
+    for group in self.get_sorted_groups():
+      for module, action in group:
+        yield module, action
+
+  def get_sorted_groups(self):
+    """Get the (module, action) pairs for each group of our sorted sources.
+
+    A group is a unit of work: its modules have to be processed serially, in
+    order, but only after all the groups it depends on have been processed.
+
+    Returns:
+      A list of non-empty lists of (module, action) pairs.
+    """
+    groups = []
     for group in self.sorted_sources:
       modules = []
       for module in group:
@@ -170,27 +406,284 @@ class PytypeRunner(object):
           report('Generating empty pyi for file not in pythonpath: %s', f)
           action = Action.GENERATE_DEFAULT
         modules.append((module, action))
-      if len(modules) == 1:
-        yield modules[0]
+      if len(modules) <= 1:
+        steps = modules
       else:
         # If we have a cycle we run pytype over the files twice, ignoring errors
         # the first time so that we don't fail on missing dependencies.
+        steps = []
         for module, action in modules:
           if action == Action.REPORT_ERRORS:
             action = Action.IGNORE_ERRORS
-          yield module, action
+          steps.append((module, action))
         for module, action in modules:
           # We don't need to run generate_default twice
           if action != Action.GENERATE_DEFAULT:
-            yield module, action
+            steps.append((module, action))
+      if steps:
+        groups.append(steps)
+    return groups
+
+  def get_group_dependencies(self, groups):
+    """Get the indices of the groups that each group depends on.
+
+    Args:
+      groups: A list of groups, as returned by get_sorted_groups().
+
+    Returns:
+      A list of sets of group indices, parallel to groups.
+    """
+    group_index = {}
+    for i, group in enumerate(groups):
+      for module, _ in group:
+        group_index[module.full_path] = i
+    group_deps = []
+    for i, group in enumerate(groups):
+      deps = set()
+      for module, _ in group:
+        for f in self.dependencies.get(module.full_path, ()):
+          # Dependencies that we don't process (e.g., non-Python files) don't
+          # need to be waited for.
+          if f in group_index and group_index[f] != i:
+            deps.add(group_index[f])
+      group_deps.append(deps)
+    return group_deps
+
+  def _get_transitive_deps(self, f):
+    """Get the full paths of all files that f depends on, directly or not."""
+    if f not in self._transitive_deps:
+      deps = set()
+      stack = [f]
+      while stack:
+        for dep in self.dependencies.get(stack.pop(), ()):
+          if dep not in deps:
+            deps.add(dep)
+            stack.append(dep)
+      deps.discard(f)
+      self._transitive_deps[f] = deps
+    return self._transitive_deps[f]
+
+  def _get_output_hash(self, module):
+    # A module's .pyi file doesn't change once the module's group is done, and
+    # we only look at it after that, so the hash can be cached.
+    if module.full_path not in self._output_hashes:
+      self._output_hashes[module.full_path] = _hash_file(
+          self._output_file(module))
+    return self._output_hashes[module.full_path]
+
+  def get_group_key(self, group):
+    """Compute a key that changes whenever the inputs of a group change.
+
+    The key covers the pytype version, the options and source of each module
+    in the group, and the .pyi files generated for all modules outside the
+    group that the group depends on, directly or transitively. (The .pyi files
+    of the group's own modules are derived from its sources.) Since the key
+    depends on the contents of the dependencies' .pyi files rather than on
+    their sources, a change to a dependency that leaves its .pyi file
+    byte-identical doesn't cause the group to be reanalyzed.
+
+    Args:
+      group: A list of (module, action) pairs.
+
+    Returns:
+      A hex digest.
+    """
+    h = hashlib.sha256()
+    def update(*values):
+      for v in values:
+        h.update(str(v).encode('utf-8'))
+    update(io.get_pytype_version(), sorted(self.custom_options.items()))
+    group_files = {module.full_path for module, _ in group}
+    deps = set()
+    for module, action in group:
+      update(action, _hash_file(module.full_path),
+             self.get_pytype_args(module, action == Action.REPORT_ERRORS))
+      deps |= self._get_transitive_deps(module.full_path)
+    for f in sorted(deps - group_files):
+      if f in self._modules_by_path:
+        update(f, self._get_output_hash(self._modules_by_path[f]))
+    return h.hexdigest()
+
+  def is_up_to_date(self, group, key):
+    return all(self.manifest.get(module.full_path) == key and
+               os.path.exists(self._output_file(module))
+               for module, _ in group)
+
+  def record_group(self, group, key, ok):
+    """Record the result of processing a group in the manifest."""
+    for module, _ in group:
+      # Modules with errors are always rerun, so that their errors are
+      # reported again.
+      if ok:
+        self.manifest[module.full_path] = key
+      else:
+        self.manifest.pop(module.full_path, None)
+
+  def load_manifest(self):
+    """Load the manifest of the previous run, if there is one."""
+    try:
+      with open(self.manifest_file) as f:
+        self.manifest = json.load(f)
+    except (IOError, ValueError):
+      self.manifest = {}
+
+  def save_manifest(self):
+    try:
+      with open(self.manifest_file, 'w') as f:
+        json.dump(self.manifest, f, indent=0, sort_keys=True)
+    except IOError:
+      logging.error('Could not write manifest: %s', self.manifest_file)
 
   def run(self):
     """Run pytype over the project."""
     logging.info('------------- Starting pytype run. -------------')
-    modules = list(self.yield_sorted_modules())
-    files_to_analyze = {m.full_path for m, _ in modules}
+    groups = self.get_sorted_groups()
+    files_to_analyze = {m.full_path for group in groups for m, _ in group}
     num_sources = len(self.filenames & files_to_analyze)
     print('Analyzing %d sources with %d dependencies' %
           (num_sources, len(files_to_analyze) - num_sources))
-    for module, action in modules:
-      self.process_module(module, action)
+    # Generating default pyi files doesn't need the builtins.
+    if any(action != Action.GENERATE_DEFAULT
+           for group in groups for _, action in group):
+      self.precompiled_builtins = self.get_precompiled_builtins()
+    if self.dependencies is None:
+      # Without dependency information, we can neither schedule modules in
+      # parallel nor tell whether they are up to date.
+      for group in groups:
+        self.process_group(group)
+      return
+    self.load_manifest()
+    try:
+      if self.jobs > 1:
+        self.run_parallel(groups)
+      else:
+        for group in groups:
+          key = self.get_group_key(group)
+          if self.is_up_to_date(group, key):
+            self._log_skipped(group)
+          else:
+            self.record_group(group, key, self.process_group(group))
+    finally:
+      self.save_manifest()
+
+  def _log_skipped(self, group):
+    logging.info('Skipping up-to-date module(s): %s',
+                 ', '.join(m.target for m, _ in group))
+
+  def run_parallel(self, groups):
+    """Process groups in a pool of self.jobs worker processes.
+
+    A group is scheduled as soon as all the groups it depends on are done, so
+    that the .pyi files it needs have been written. A group fails if its worker
+    process dies or its result can't be sent back.
+
+    Args:
+      groups: A list of groups, as returned by get_sorted_groups().
+    """
+    group_deps = self.get_group_dependencies(groups)
+    num_pending_deps = [len(deps) for deps in group_deps]
+    dependents = collections.defaultdict(list)
+    for i, deps in enumerate(group_deps):
+      for dep in deps:
+        dependents[dep].append(i)
+    keys = {}
+    results = {}  # group index -> AsyncResult, for groups sent to the pool
+    done = queue.Queue()
+    started = multiprocessing.Queue()
+    pool = multiprocessing.Pool(self.jobs, _init_worker, (self, started))
+    def schedule(i):
+      keys[i] = self.get_group_key(groups[i])
+      if self.is_up_to_date(groups[i], keys[i]):
+        self._log_skipped(groups[i])
+        done.put((i, True, None))
+      else:
+        results[i] = pool.apply_async(
+            _process_group, (i, groups[i]), callback=done.put)
+    try:
+      for i, num in enumerate(num_pending_deps):
+        if not num:
+          schedule(i)
+      for i, ok, error in self._wait_for_groups(len(groups), done, started,
+                                                results):
+        if error:
+          logging.error('Error processing %s:\n%s',
+                        ', '.join(m.target for m, _ in groups[i]), error)
+        else:
+          logging.info('Done: %s', ', '.join(m.target for m, _ in groups[i]))
+        self.record_group(groups[i], keys[i], ok)
+        for dependent in dependents[i]:
+          num_pending_deps[dependent] -= 1
+          if not num_pending_deps[dependent]:
+            schedule(dependent)
+    finally:
+      if all(result.ready() for result in results.values()):
+        pool.close()
+      else:
+        # We were interrupted or a worker died, and the pool would wait for
+        # the results of the groups it was processing forever.
+        pool.terminate()
+      pool.join()
+
+  def _wait_for_groups(self, num_groups, done, started, results):
+    """Yield (index, ok, error) for each group, as it finishes.
+
+    Instead of blocking on done, which would hang forever if a worker died
+    (and couldn't be interrupted with Ctrl-C under Python 2), this polls, and
+    reports a group as failed if its worker is gone or its result is an error.
+
+    Args:
+      num_groups: The number of groups to wait for.
+      done: A queue of the (index, ok, error) tuples of finished groups.
+      started: A multiprocessing queue of the (index, pid) pairs of groups that
+        a worker started processing.
+      results: A dictionary from the index of each group sent to the pool to
+        its AsyncResult.
+
+    Yields:
+      A tuple of the group index, whether it was processed without errors, and
+      an error message if processing failed, else None.
+    """
+    running = {}  # worker pid -> index of the last group it started
+    workers = {p.pid for p in multiprocessing.active_children()}
+    reported = set()
+    while len(reported) < num_groups:
+      try:
+        finished = [done.get(timeout=_POLL_INTERVAL)]
+      except queue.Empty:
+        finished = []
+        while True:
+          try:
+            i, pid = started.get_nowait()
+          except queue.Empty:
+            break
+          running[pid] = i
+        pending = sorted(i for i in results if i not in reported)
+        for i in pending:
+          result = results[i]
+          if result.ready() and not result.successful():
+            try:
+              result.get()
+            except Exception:  # pylint: disable=broad-except
+              finished.append((i, False, traceback.format_exc()))
+        live = {p.pid for p in multiprocessing.active_children()}
+        dead = workers - live
+        workers = live
+        for pid in dead:
+          i = running.pop(pid, None)
+          if i in pending:
+            finished.append(
+                (i, False, 'Worker process %d died while processing this '
+                 'group' % pid))
+          else:
+            # The worker died before its report of the group it took reached
+            # us, so fail every group that no live worker is known to process.
+            busy = {running[p] for p in live if p in running}
+            finished.extend(
+                (i, False, 'A worker process died; this group may have been '
+                 'lost with it') for i in pending if i not in busy)
+      for i, ok, error in finished:
+        if i in reported:
+          # A group we failed because of a dead worker finished after all.
+          continue
+        reported.add(i)
+        yield i, ok, error
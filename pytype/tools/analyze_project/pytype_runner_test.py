@@ -24,13 +24,24 @@ ImportlabModule = collections.namedtuple('_', 'path short_path module_name')
 class FakeImportGraph(object):
   """Just enough of the ImportGraph interface to run tests."""
 
-  def __init__(self, source_files, provenance):
+  def __init__(self, source_files, provenance, source_deps=None):
     self.source_files = source_files
     self.provenance = provenance
+    self.source_deps = source_deps or {}
 
   def sorted_source_files(self):
     return [[x] for x in self.source_files]
 
+  def deps_list(self):
+    return [(x, self.source_deps.get(x, [])) for x in self.source_files]
+
+
+class FakeNodeSet(object):
+  """Just enough of the importlab.graph.NodeSet interface to run tests."""
+
+  def __init__(self, nodes):
+    self.nodes = nodes
+
 
 class TestDepsFromImportGraph(unittest.TestCase):
   """Test deps_from_import_graph."""
@@ -53,6 +64,28 @@ class TestDepsFromImportGraph(unittest.TestCase):
     self.assertEqual(deps, expected)
 
 
+class TestDependenciesFromImportGraph(unittest.TestCase):
+  """Test dependencies_from_import_graph."""
+
+  def test_basic(self):
+    graph = FakeImportGraph(['/foo/a.py', '/foo/b.py'], {},
+                            {'/foo/b.py': ['/foo/a.py']})
+    deps = pytype_runner.dependencies_from_import_graph(graph)
+    self.assertEqual(deps, {'/foo/a.py': set(), '/foo/b.py': {'/foo/a.py'}})
+
+  def test_cycle(self):
+    cycle = FakeNodeSet(['/foo/b.py', '/foo/c.py'])
+    graph = FakeImportGraph(['/foo/a.py', cycle, '/foo/d.py'], {},
+                            {cycle: ['/foo/a.py'], '/foo/d.py': [cycle]})
+    deps = pytype_runner.dependencies_from_import_graph(graph)
+    self.assertEqual(deps, {
+        '/foo/a.py': set(),
+        '/foo/b.py': {'/foo/a.py'},
+        '/foo/c.py': {'/foo/a.py'},
+        '/foo/d.py': {'/foo/b.py', '/foo/c.py'},
+    })
+
+
 class TestBase(unittest.TestCase):
   """Base class for tests using a parser."""
 
@@ -91,6 +124,22 @@ class TestGetRunCmd(TestBase):
   def test_module_name(self):
     self.assertEqual(self.get_basic_options().module_name, 'bar')
 
+  def test_bytecode_cache(self):
+    self.assertEqual(
+        self.get_basic_options().bytecode_cache_dir,
+        os.path.join(self.runner.pyi_dir, pytype_runner.BYTECODE_CACHE_DIR))
+
+  def test_pyi_cache(self):
+    self.assertEqual(
+        self.get_basic_options().pyi_cache_dir,
+        os.path.join(self.runner.pyi_dir, pytype_runner.PYI_CACHE_DIR))
+
+  def test_precompiled_builtins(self):
+    self.assertIsNone(self.get_basic_options().precompiled_builtins)
+    self.runner.precompiled_builtins = '/tmp/builtins.pickle'
+    self.assertEqual(self.get_basic_options().precompiled_builtins,
+                     '/tmp/builtins.pickle')
+
   def test_error_reporting(self):
     # Disable error reporting
     options = self.get_basic_options(report_errors=False)
@@ -102,6 +151,54 @@ class TestGetRunCmd(TestBase):
     self.assertTrue(options.analyze_annotated)
 
 
+class TestPrecompiledBuiltins(TestBase):
+  """Tests for PytypeRunner.get_precompiled_builtins()."""
+
+  def setUp(self):
+    self.generated = []
+    self.generate_builtins_pickle = pytype_runner.io.generate_builtins_pickle
+    pytype_runner.io.generate_builtins_pickle = self.fake_generate
+
+  def tearDown(self):
+    pytype_runner.io.generate_builtins_pickle = self.generate_builtins_pickle
+
+  def fake_generate(self, options):
+    self.generated.append(options.generate_builtins)
+    self.jobs = options.generate_builtins_jobs
+    with open(options.generate_builtins, 'w') as f:
+      f.write('')
+
+  def test_reuse(self):
+    with file_utils.Tempdir() as d:
+      conf = self.parser.config_from_defaults()
+      conf.output = d.path
+      runner = pytype_runner.PytypeRunner([], [], conf)
+      filename = runner.get_precompiled_builtins()
+      self.assertTrue(os.path.exists(filename))
+      self.assertEqual(runner.get_precompiled_builtins(), filename)
+      self.assertEqual(len(self.generated), 1)
+
+  def test_remove_stale(self):
+    with file_utils.Tempdir() as d:
+      conf = self.parser.config_from_defaults()
+      conf.output = d.path
+      stale = d.create_file(
+          os.path.join(pytype_runner.BUILTINS_DIR, 'builtins-0.pickle'))
+      runner = pytype_runner.PytypeRunner([], [], conf)
+      filename = runner.get_precompiled_builtins()
+      self.assertTrue(os.path.exists(filename))
+      self.assertFalse(os.path.exists(stale))
+
+  def test_jobs(self):
+    with file_utils.Tempdir() as d:
+      conf = self.parser.config_from_defaults()
+      conf.output = d.path
+      conf.jobs = 3
+      runner = pytype_runner.PytypeRunner([], [], conf)
+      runner.get_precompiled_builtins()
+      self.assertEqual(self.jobs, 3)
+
+
 class TestYieldSortedModules(TestBase):
   """Tests for PytypeRunner.yield_sorted_modules()."""
 
@@ -185,5 +282,176 @@ class TestYieldSortedModules(TestBase):
         [(external, 'bar/baz.py', 'bar.baz', Action.GENERATE_DEFAULT)])
 
 
+class TestParallel(TestBase):
+  """Tests for running PytypeRunner with multiple jobs."""
+
+  def setUp(self):
+    self.conf = self.parser.config_from_defaults()
+    self.conf.jobs = 2
+    self.d = file_utils.expand_path('foo/').rstrip(os.sep) + os.sep
+    self.conf.pythonpath = [self.d]
+    self.a = Module(self.d, 'a.py', 'a')
+    self.b = Module(self.d, 'b.py', 'b')
+    self.c = Module(self.d, 'c.py', 'c')
+    self.e = Module(self.d, 'e.so', 'e')
+
+  def test_group_dependencies(self):
+    dependencies = {
+        self.b.full_path: {self.a.full_path, self.e.full_path},
+        self.c.full_path: {self.a.full_path, self.b.full_path},
+    }
+    runner = pytype_runner.PytypeRunner(
+        [], [[self.e], [self.a], [self.b], [self.c]], self.conf,
+        dependencies=dependencies)
+    groups = runner.get_sorted_groups()
+    # The non-Python file is skipped, so it is neither a group nor a
+    # dependency.
+    self.assertEqual([[m for m, _ in group] for group in groups],
+                     [[self.a], [self.b], [self.c]])
+    self.assertEqual(runner.get_group_dependencies(groups),
+                     [set(), {0}, {0, 1}])
+
+  def test_cycle_is_one_group(self):
+    dependencies = {
+        self.a.full_path: {self.b.full_path},
+        self.b.full_path: {self.a.full_path},
+        self.c.full_path: {self.a.full_path, self.b.full_path},
+    }
+    runner = pytype_runner.PytypeRunner(
+        [], [[self.a, self.b], [self.c]], self.conf, dependencies=dependencies)
+    groups = runner.get_sorted_groups()
+    self.assertEqual([[m for m, _ in group] for group in groups],
+                     [[self.a, self.b, self.a, self.b], [self.c]])
+    self.assertEqual(runner.get_group_dependencies(groups), [set(), {0}])
+
+  def test_run(self):
+    with file_utils.Tempdir() as d:
+      self.conf.output = d.path
+      # Files outside the pythonpath only get default pyi files, so we can run
+      # the scheduler without invoking pytype.
+      self.conf.pythonpath = []
+      dependencies = {
+          self.b.full_path: {self.a.full_path},
+          self.c.full_path: {self.a.full_path},
+      }
+      runner = pytype_runner.PytypeRunner(
+          [], [[self.a], [self.b], [self.c]], self.conf,
+          dependencies=dependencies)
+      runner.run()
+      for name in ('a', 'b', 'c'):
+        with open(os.path.join(d.path, name + '.pyi')) as f:
+          self.assertEqual(f.read(), pytype_runner.DEFAULT_PYI)
+
+
+class RecordingRunner(pytype_runner.PytypeRunner):
+  """A PytypeRunner that records modules instead of running pytype on them."""
+
+  def __init__(self, *args, **kwargs):
+    super(RecordingRunner, self).__init__(*args, **kwargs)
+    self.processed = []
+    self.pyi = {}  # contents of the generated pyi files
+    self.errors = set()  # names of modules with errors
+    self.crashes = set()  # names of modules whose worker process dies
+
+  def get_precompiled_builtins(self):
+    return None
+
+  def process_module(self, module, action, transient=True):
+    if module.name in self.crashes:
+      os._exit(1)  # pylint: disable=protected-access
+    self.processed.append(module.name)
+    self.create_output_dir(module)
+    with open(self._output_file(module), 'w') as f:
+      f.write(self.pyi.get(module.name, ''))
+    return int(module.name in self.errors)
+
+
+class TestIncremental(TestBase):
+  """Tests for skipping up-to-date modules."""
+
+  def setUp(self):
+    self.tempdir = file_utils.Tempdir()
+    self.d = self.tempdir.__enter__()
+    self.d.create_file('src/a.py', 'x = 1')
+    self.d.create_file('src/b.py', 'import a')
+    self.d.create_file('src/c.py', 'import b')
+    src = os.path.join(self.d.path, 'src') + os.sep
+    self.conf = self.parser.config_from_defaults()
+    self.conf.output = os.path.join(self.d.path, 'out')
+    self.conf.pythonpath = [src]
+    self.a = Module(src, 'a.py', 'a')
+    self.b = Module(src, 'b.py', 'b')
+    self.c = Module(src, 'c.py', 'c')
+    self.dependencies = {
+        self.b.full_path: {self.a.full_path},
+        self.c.full_path: {self.b.full_path},
+    }
+
+  def tearDown(self):
+    self.tempdir.__exit__(None, None, None)
+
+  def run_pytype(self, pyi=None, errors=(), crashes=()):
+    runner = RecordingRunner(
+        [m.full_path for m in (self.a, self.b, self.c)],
+        [[self.a], [self.b], [self.c]], self.conf,
+        dependencies=self.dependencies)
+    runner.pyi = pyi or {}
+    runner.errors = set(errors)
+    runner.crashes = set(crashes)
+    runner.run()
+    return runner.processed
+
+  def test_no_change(self):
+    self.assertEqual(self.run_pytype(), ['a', 'b', 'c'])
+    self.assertEqual(self.run_pytype(), [])
+
+  def test_source_change(self):
+    self.run_pytype()
+    self.d.create_file('src/c.py', 'import b\ny = 2')
+    self.assertEqual(self.run_pytype(), ['c'])
+
+  def test_pyi_change(self):
+    self.run_pytype()
+    self.d.create_file('src/a.py', 'x = ""')
+    # c depends on a transitively, through b.
+    self.assertEqual(self.run_pytype(pyi={'a': 'x: str'}), ['a', 'b', 'c'])
+
+  def test_unchanged_pyi(self):
+    self.run_pytype(pyi={'a': 'x: int'})
+    self.d.create_file('src/a.py', 'x = 2')
+    # The pyi of a is the same as before, so b and c are up to date.
+    self.assertEqual(self.run_pytype(pyi={'a': 'x: int'}), ['a'])
+
+  def test_unchanged_pyi_in_chain(self):
+    pyi = {'a': 'x: int', 'b': 'import a'}
+    self.run_pytype(pyi=pyi)
+    self.d.create_file('src/b.py', 'import a\ny = 2')
+    self.assertEqual(self.run_pytype(pyi=pyi), ['b'])
+
+  def test_options_change(self):
+    self.run_pytype()
+    self.conf.disable = ['import-error']
+    self.assertEqual(self.run_pytype(), ['a', 'b', 'c'])
+
+  def test_errors(self):
+    self.assertEqual(self.run_pytype(errors={'b'}), ['a', 'b', 'c'])
+    # Modules with errors are rerun so that the errors are reported again.
+    self.assertEqual(self.run_pytype(errors={'b'}), ['b'])
+    self.assertEqual(self.run_pytype(), ['b'])
+    self.assertEqual(self.run_pytype(), [])
+
+  def test_missing_output(self):
+    self.run_pytype()
+    os.remove(os.path.join(self.conf.output, 'b.pyi'))
+    self.assertEqual(self.run_pytype(), ['b'])
+
+  def test_worker_dies(self):
+    self.conf.jobs = 2
+    # The group whose worker died fails instead of hanging the run.
+    self.run_pytype(crashes={'b'})
+    self.conf.jobs = 1
+    self.assertEqual(self.run_pytype(), ['b', 'c'])
+
+
 if __name__ == '__main__':
   unittest.main()
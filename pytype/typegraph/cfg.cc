@@ -2,6 +2,7 @@
 #include <structseq.h>
 
 #include <unordered_map>
+#include <unordered_set>
 #include <utility>
 
 #include "cfg_assert.h"
@@ -9,7 +10,7 @@
 
 namespace typegraph = devtools_python_typegraph;
 
-static const char* kModuleName = "cfg";
+static const char* kModuleName = "cfg_ext";
 
 #if PY_MAJOR_VERSION >= 3
 #  define PyString_Check(s) (PyBytes_Check(s) || PyUnicode_Check(s))
@@ -46,6 +47,8 @@ static PyObject* k_variables;
 static PyObject* k_program;
 static PyObject* k_id;
 static PyObject* k_next_variable_id;
+static PyObject* k_binding_count;
+static PyObject* k_solver_query_count;
 static PyObject* k_condition;
 static PyObject* k_default_data;
 
@@ -55,6 +58,10 @@ typedef struct {
   // To preserve object identity, we remember which C structure we wrapped and
   // the PyObject that wraps it.
   std::unordered_map<const void*, PyObject*>* cache;
+  // The objects that bindings of this program were created for. The program
+  // holds one reference to each, and reports them to the garbage collector,
+  // since abstract values usually point back to their program.
+  std::unordered_set<PyObject*>* data;
 } PyProgramObj;
 
 typedef struct {
@@ -99,17 +106,36 @@ static void RemoveFromCache(PyProgramObj* program, void* key) {
   program->cache->erase(key);
 }
 
+// Keeps data alive for as long as the program, which may bind it.
+static void KeepData(PyProgramObj* program, PyObject* data) {
+  if (program->data->insert(data).second)
+    Py_INCREF(data);
+}
+
+// PyList_Append and PySet_Add don't steal the reference to the item, but the
+// Wrap* functions and PyStructSequence_New return new references.
+static void AppendNew(PyObject* list, PyObject* item) {
+  PyList_Append(list, item);
+  Py_DECREF(item);
+}
+
+static void AddNew(PyObject* set, PyObject* item) {
+  PySet_Add(set, item);
+  Py_DECREF(item);
+}
+
 static PyObject* WrapCFGNode(PyProgramObj* program,
                              typegraph::CFGNode* cfg_node) {
   PyObject* cached = FindInCache(program, cfg_node);
   if (cached)
     return cached;
-  PyCFGNodeObj* py_cfg_node = PyObject_New(PyCFGNodeObj, &PyCFGNode);
+  PyCFGNodeObj* py_cfg_node = PyObject_GC_New(PyCFGNodeObj, &PyCFGNode);
   py_cfg_node->cfg_node = cfg_node;
   py_cfg_node->program = program;
   Py_INCREF(program);  // DECREF in CFGNodeDealloc
   PyObject* obj = reinterpret_cast<PyObject*>(py_cfg_node);
   (*program->cache)[cfg_node] = obj;
+  PyObject_GC_Track(obj);
   return obj;
 }
 
@@ -117,12 +143,13 @@ static PyObject* WrapBinding(PyProgramObj* program, typegraph::Binding* attr) {
   PyObject* cached = FindInCache(program, attr);
   if (cached)
     return cached;
-  PyBindingObj* py_attr = PyObject_New(PyBindingObj, &PyBinding);
+  PyBindingObj* py_attr = PyObject_GC_New(PyBindingObj, &PyBinding);
   py_attr->attr = attr;
   py_attr->program = program;
   Py_INCREF(program);  // DECREF in BindingDealloc
   PyObject* obj = reinterpret_cast<PyObject*>(py_attr);
   (*program->cache)[attr] = obj;
+  PyObject_GC_Track(obj);
   return obj;
 }
 
@@ -130,12 +157,13 @@ static PyObject* WrapVariable(PyProgramObj* program, typegraph::Variable* u) {
   PyObject* cached = FindInCache(program, u);
   if (cached)
     return cached;
-  PyVariableObj* py_variable = PyObject_New(PyVariableObj, &PyVariable);
+  PyVariableObj* py_variable = PyObject_GC_New(PyVariableObj, &PyVariable);
   py_variable->u = u;
   py_variable->program = program;
   Py_INCREF(program);  // DECREF in VariableDealloc
   PyObject* obj = reinterpret_cast<PyObject*>(py_variable);
   (*program->cache)[u] = obj;
+  PyObject_GC_Track(obj);
   return obj;
 }
 
@@ -196,9 +224,24 @@ static bool IsCFGNodeOrNone(PyObject* obj, typegraph::CFGNode** ret) {
 static void ProgramDealloc(PyObject* self) {
   CFG_ASSERT(self && Py_TYPE(self) == &PyProgram);
   PyProgramObj* program = reinterpret_cast<PyProgramObj*>(self);
+  PyObject_GC_UnTrack(self);
   delete program->cache;
+  Py_XDECREF(reinterpret_cast<PyObject*>(program->program->default_data()));
   delete program->program;
-  PyObject_Del(self);
+  for (PyObject* data : *program->data) {
+    Py_DECREF(data);
+  }
+  delete program->data;
+  PyObject_GC_Del(self);
+}
+
+static int ProgramTraverse(PyObject* self, visitproc visit, void* arg) {
+  PyProgramObj* program = reinterpret_cast<PyProgramObj*>(self);
+  Py_VISIT(reinterpret_cast<PyObject*>(program->program->default_data()));
+  for (PyObject* data : *program->data) {
+    Py_VISIT(data);
+  }
+  return 0;
 }
 
 static PyObject* ProgramGetAttro(PyObject* self, PyObject* attr) {
@@ -207,14 +250,14 @@ static PyObject* ProgramGetAttro(PyObject* self, PyObject* attr) {
   if (PyObject_RichCompareBool(attr, k_cfg_nodes, Py_EQ) > 0) {
     PyObject* list = PyList_New(0);
     for (const auto& method : program->program->cfg_nodes()) {
-      PyList_Append(list, WrapCFGNode(program, method.get()));
+      AppendNew(list, WrapCFGNode(program, method.get()));
     }
     return list;
   } else if (PyObject_RichCompareBool(attr, k_variables, Py_EQ) > 0) {
     PyObject* set = PySet_New(0);
     for (const auto& n : program->program->cfg_nodes()) {
       for (auto b : n->bindings()) {
-        PySet_Add(set, WrapVariable(program, b->variable()));
+        AddNew(set, WrapVariable(program, b->variable()));
       }
     }
     return set;
@@ -227,11 +270,12 @@ static PyObject* ProgramGetAttro(PyObject* self, PyObject* attr) {
     }
   } else if (PyObject_RichCompareBool(attr, k_next_variable_id, Py_EQ) > 0) {
     return PyInt_FromSize_t(program->program->next_variable_id());
+  } else if (PyObject_RichCompareBool(attr, k_binding_count, Py_EQ) > 0) {
+    return PyInt_FromSize_t(program->program->binding_count());
+  } else if (PyObject_RichCompareBool(attr, k_solver_query_count, Py_EQ) > 0) {
+    return PyInt_FromSize_t(program->program->solver_query_count());
   } else if (PyObject_RichCompareBool(attr, k_default_data, Py_EQ) > 0) {
     auto data = reinterpret_cast<PyObject*>(program->program->default_data());
-    if (!data) {
-      Py_RETURN_NONE;
-    }
     Py_INCREF(data);
     return data;
   }
@@ -255,7 +299,7 @@ static int ProgramSetAttro(PyObject* self, PyObject* attr, PyObject* val) {
     }
     return 0;
   } else if (PyObject_RichCompareBool(attr, k_default_data, Py_EQ) > 0) {
-    Py_XDECREF(program->program->default_data());
+    Py_DECREF(reinterpret_cast<PyObject*>(program->program->default_data()));
     Py_INCREF(val);
     program->program->set_default_data(val);
     return 0;
@@ -267,9 +311,15 @@ static PyObject* ProgramNew(PyTypeObject* type,
                             PyObject* args, PyObject* kwargs) {
   if (!PyArg_ParseTuple(args, ""))
     return nullptr;
-  PyProgramObj* program = PyObject_New(PyProgramObj, &PyProgram);
+  PyProgramObj* program = PyObject_GC_New(PyProgramObj, &PyProgram);
   program->cache = new std::unordered_map<const void*, PyObject*>;
+  program->data = new std::unordered_set<PyObject*>;
   program->program = new typegraph::Program;
+  // Like in cfg_py, default_data starts out as None. Variables that grow past
+  // MAX_VAR_SIZE bind it, so it must never be a null pointer.
+  Py_INCREF(Py_None);
+  program->program->set_default_data(Py_None);
+  PyObject_GC_Track(program);
   return reinterpret_cast<PyObject*>(program);
 }
 
@@ -359,8 +409,12 @@ static PyObject* NewVariable(PyProgramObj* self,
   if (bindings == Py_None)
     bindings = nullptr;
 
-  if (bindings && !PyObject_GetIter(bindings))
-    return nullptr;  // propagate error raised by PyObject_GetIter
+  if (bindings) {
+    PyObject* bind_iter = PyObject_GetIter(bindings);
+    if (!bind_iter)
+      return nullptr;  // propagate error raised by PyObject_GetIter
+    Py_DECREF(bind_iter);
+  }
 
   typegraph::CFGNode* where;
   if (!IsCFGNodeOrNone(where_obj, &where)) {
@@ -379,11 +433,11 @@ static PyObject* NewVariable(PyProgramObj* self,
     PyObject* item;
     PyObject* bind_iter = PyObject_GetIter(bindings);
     while ((item = PyIter_Next(bind_iter))) {
-      // PyIter_Next returns a new reference, which will be owned by AddBinding.
-      // That means we don't need to INCREF or DECREF item.
+      KeepData(self, item);
       typegraph::Binding* attr = u->AddBinding(item);
       typegraph::Origin* origin = attr->AddOrigin(where);
       origin->AddSourceSet(ParseBindingList(source_set));
+      Py_DECREF(item);  // PyIter_Next returns a new reference.
     }
     Py_DECREF(bind_iter);
     if (PyErr_Occurred()) {
@@ -441,7 +495,11 @@ PyTypeObject PyProgram = {
   tp_basicsize : sizeof(PyProgramObj),
   tp_itemsize : 0,
   tp_dealloc : ProgramDealloc,
+#if PY_VERSION_HEX >= 0x03080000  // 3.8
+  tp_vectorcall_offset : 0,
+#else
   tp_print : nullptr,
+#endif
   tp_getattr : nullptr,
   tp_setattr : nullptr,
 #if PY_VERSION_HEX >= 0x03050000  // 3.5
@@ -459,9 +517,9 @@ PyTypeObject PyProgram = {
   tp_getattro : ProgramGetAttro,
   tp_setattro : ProgramSetAttro,
   tp_as_buffer : nullptr,
-  tp_flags : 0,
+  tp_flags : Py_TPFLAGS_HAVE_GC,
   tp_doc : program_doc,
-  tp_traverse : nullptr,
+  tp_traverse : ProgramTraverse,
   tp_clear : nullptr,
   tp_richcompare : nullptr,
   tp_weaklistoffset : 0,
@@ -490,19 +548,19 @@ static PyObject* CFGNodeGetAttro(PyObject* self, PyObject* attr) {
   if (PyObject_RichCompareBool(attr, k_incoming, Py_EQ) > 0) {
     PyObject* list = PyList_New(0);
     for (typegraph::CFGNode* node : cfg_node->cfg_node->incoming()) {
-      PyList_Append(list, WrapCFGNode(program, node));
+      AppendNew(list, WrapCFGNode(program, node));
     }
     return list;
   } else if (PyObject_RichCompareBool(attr, k_outgoing, Py_EQ) > 0) {
     PyObject* list = PyList_New(0);
     for (typegraph::CFGNode* node : cfg_node->cfg_node->outgoing()) {
-      PyList_Append(list, WrapCFGNode(program, node));
+      AppendNew(list, WrapCFGNode(program, node));
     }
     return list;
   } else if (PyObject_RichCompareBool(attr, k_bindings, Py_EQ) > 0) {
     PyObject* list = PyList_New(0);
     for (typegraph::Binding* v : cfg_node->cfg_node->bindings()) {
-      PyList_Append(list, WrapBinding(program, v));
+      AppendNew(list, WrapBinding(program, v));
     }
     return list;
   } else if (PyObject_RichCompareBool(attr, k_name, Py_EQ) > 0) {
@@ -545,9 +603,15 @@ static int CFGNodeSetAttro(PyObject* self, PyObject* attr, PyObject* val) {
 static void CFGNodeDealloc(PyObject* self) {
   CFG_ASSERT(self && Py_TYPE(self) == &PyCFGNode);
   PyCFGNodeObj* cfg_node = reinterpret_cast<PyCFGNodeObj*>(self);
+  PyObject_GC_UnTrack(self);
   RemoveFromCache(cfg_node->program, cfg_node->cfg_node);
   Py_DECREF(cfg_node->program);
-  PyObject_Del(self);
+  PyObject_GC_Del(self);
+}
+
+static int CFGNodeTraverse(PyObject* self, visitproc visit, void* arg) {
+  Py_VISIT(reinterpret_cast<PyCFGNodeObj*>(self)->program);
+  return 0;
 }
 
 static PyObject* CFGNodeRepr(PyObject* self) {
@@ -696,7 +760,11 @@ PyTypeObject PyCFGNode = {
   tp_basicsize : sizeof(PyCFGNodeObj),
   tp_itemsize : 0,
   tp_dealloc : CFGNodeDealloc,
+#if PY_VERSION_HEX >= 0x03080000  // 3.8
+  tp_vectorcall_offset : 0,
+#else
   tp_print : nullptr,
+#endif
   tp_getattr : nullptr,
   tp_setattr : nullptr,
 #if PY_VERSION_HEX >= 0x03050000  // 3.5
@@ -714,9 +782,9 @@ PyTypeObject PyCFGNode = {
   tp_getattro : CFGNodeGetAttro,
   tp_setattro : CFGNodeSetAttro,
   tp_as_buffer : nullptr,
-  tp_flags : 0,
+  tp_flags : Py_TPFLAGS_HAVE_GC,
   tp_doc : cfg_node_doc,
-  tp_traverse : nullptr,
+  tp_traverse : CFGNodeTraverse,
   tp_clear : nullptr,
   tp_richcompare : nullptr,
   tp_weaklistoffset : 0,
@@ -727,11 +795,9 @@ PyTypeObject PyCFGNode = {
 
 // --- Origin --------------------------------------------------------------
 
-static PyTypeObject PyOrigin = {
-  // initialized in inittypegraph
-  PyVarObject_HEAD_INIT(nullptr, 0)
-  tp_name: nullptr
-};
+// Initialized in InitModule. This has to be all zeros until then, since newer
+// versions of Python refuse to initialize a type that already has a refcount.
+static PyTypeObject PyOrigin;
 
 PyDoc_STRVAR(origin_doc,
              "An \"origin\" is an explanation of how a binding was "
@@ -755,9 +821,15 @@ static PyStructSequence_Desc origin_desc = {
 static void BindingDealloc(PyObject* self) {
   CFG_ASSERT(self && Py_TYPE(self) == &PyBinding);
   PyBindingObj* attr = reinterpret_cast<PyBindingObj*>(self);
+  PyObject_GC_UnTrack(self);
   RemoveFromCache(attr->program, attr->attr);
   Py_DECREF(attr->program);
-  PyObject_Del(self);
+  PyObject_GC_Del(self);
+}
+
+static int BindingTraverse(PyObject* self, visitproc visit, void* arg) {
+  Py_VISIT(reinterpret_cast<PyBindingObj*>(self)->program);
+  return 0;
 }
 
 static PyObject* BindingRepr(PyObject* self) {
@@ -794,12 +866,12 @@ static PyObject* BindingGetAttro(PyObject* self, PyObject* attr) {
       for (const typegraph::SourceSet& source_set : origin->source_sets) {
         PyObject* py_source_set = PySet_New(0);
         for (typegraph::Binding* source : source_set) {
-          PySet_Add(py_source_set, WrapBinding(program, source));
+          AddNew(py_source_set, WrapBinding(program, source));
         }
-        PyList_Append(py_source_sets, py_source_set);
+        AppendNew(py_source_sets, py_source_set);
       }
       PyStructSequence_SET_ITEM(py_origin, 1, py_source_sets);
-      PyList_Append(py_origins, py_origin);
+      AppendNew(py_origins, py_origin);
     }
     return py_origins;
   } else if (PyObject_RichCompareBool(attr, k_data, Py_EQ) > 0) {
@@ -917,7 +989,11 @@ PyTypeObject PyBinding = {
   tp_basicsize : sizeof(PyBindingObj),
   tp_itemsize : 0,
   tp_dealloc : BindingDealloc,
+#if PY_VERSION_HEX >= 0x03080000  // 3.8
+  tp_vectorcall_offset : 0,
+#else
   tp_print : nullptr,
+#endif
   tp_getattr : nullptr,
   tp_setattr : nullptr,
 #if PY_VERSION_HEX >= 0x03050000  // 3.5
@@ -935,9 +1011,9 @@ PyTypeObject PyBinding = {
   tp_getattro : BindingGetAttro,
   tp_setattro : nullptr,
   tp_as_buffer : nullptr,
-  tp_flags : 0,
+  tp_flags : Py_TPFLAGS_HAVE_GC,
   tp_doc : binding_doc,
-  tp_traverse : nullptr,
+  tp_traverse : BindingTraverse,
   tp_clear : nullptr,
   tp_richcompare : nullptr,
   tp_weaklistoffset : 0,
@@ -951,9 +1027,15 @@ PyTypeObject PyBinding = {
 static void VariableDealloc(PyObject* self) {
   CFG_ASSERT(self && Py_TYPE(self) == &PyVariable);
   PyVariableObj* u = reinterpret_cast<PyVariableObj*>(self);
+  PyObject_GC_UnTrack(self);
   RemoveFromCache(u->program, u->u);
   Py_DECREF(u->program);
-  PyObject_Del(self);
+  PyObject_GC_Del(self);
+}
+
+static int VariableTraverse(PyObject* self, visitproc visit, void* arg) {
+  Py_VISIT(reinterpret_cast<PyVariableObj*>(self)->program);
+  return 0;
 }
 
 static PyObject* VariableRepr(PyObject* self) {
@@ -970,15 +1052,13 @@ static PyObject* VariableGetAttro(PyObject* self, PyObject* attr) {
   if (PyObject_RichCompareBool(attr, k_bindings, Py_EQ) > 0) {
     PyObject* list = PyList_New(0);
     for (const auto& attr : u->u->bindings()) {
-      PyList_Append(list, WrapBinding(program, attr.get()));
+      AppendNew(list, WrapBinding(program, attr.get()));
     }
     return list;
   } else if (PyObject_RichCompareBool(attr, k_data, Py_EQ) > 0) {
     PyObject* list = PyList_New(0);
     for (const auto& attr : u->u->bindings()) {
-      PyObject* data = reinterpret_cast<PyObject*>(attr->data());
-      Py_INCREF(data);
-      PyList_Append(list, data);
+      PyList_Append(list, reinterpret_cast<PyObject*>(attr->data()));
     }
     return list;
   } else if (PyObject_RichCompareBool(attr, k_id, Py_EQ) > 0) {
@@ -1020,7 +1100,7 @@ static PyObject* VariablePrune(PyVariableObj* self,
   auto bindings = self->u->Prune(cfg_node);
   PyObject* list = PyList_New(0);
   for (typegraph::Binding* attr : bindings) {
-    PyList_Append(list, WrapBinding(self->program, attr));
+    AppendNew(list, WrapBinding(self->program, attr));
   }
   return list;
 }
@@ -1044,9 +1124,7 @@ static PyObject* VariablePruneData(PyVariableObj* self,
   auto bindings = self->u->Prune(cfg_node);
   PyObject* list = PyList_New(0);
   for (typegraph::Binding* attr : bindings) {
-    PyObject* data = reinterpret_cast<PyObject*>(attr->data());
-    Py_INCREF(data);
-    PyList_Append(list, data);
+    PyList_Append(list, reinterpret_cast<PyObject*>(attr->data()));
   }
   return list;
 }
@@ -1068,7 +1146,7 @@ static PyObject* VariableFilter(PyVariableObj* self,
   auto bindings = self->u->Filter(cfg_node->cfg_node);
   PyObject* list = PyList_New(0);
   for (typegraph::Binding* attr : bindings) {
-    PyList_Append(list, WrapBinding(program, attr));
+    AppendNew(list, WrapBinding(program, attr));
   }
   return list;
 }
@@ -1087,9 +1165,7 @@ static PyObject* VariableFilteredData(PyVariableObj* self,
   auto bindings = self->u->FilteredData(cfg_node->cfg_node);
   PyObject* list = PyList_New(0);
   for (void* attr_data : bindings) {
-    PyObject* data = reinterpret_cast<PyObject*>(attr_data);
-    Py_INCREF(data);
-    PyList_Append(list, data);
+    PyList_Append(list, reinterpret_cast<PyObject*>(attr_data));
   }
   return list;
 }
@@ -1131,7 +1207,7 @@ static PyObject* VariableAddBinding(PyVariableObj* self, PyObject* args,
   if (!ContainerToSourceSet(&source_set, program))
     return nullptr;
 
-  Py_INCREF(data);
+  KeepData(program, data);
   typegraph::Binding* attr = self->u->AddBinding(data);
   if (where && source_set) {
     typegraph::Origin* origin = attr->AddOrigin(where);
@@ -1297,7 +1373,11 @@ PyTypeObject PyVariable = {
   tp_basicsize : sizeof(PyVariableObj),
   tp_itemsize : 0,
   tp_dealloc : VariableDealloc,
+#if PY_VERSION_HEX >= 0x03080000  // 3.8
+  tp_vectorcall_offset : 0,
+#else
   tp_print : nullptr,
+#endif
   tp_getattr : nullptr,
   tp_setattr : nullptr,
 #if PY_VERSION_HEX >= 0x03050000  // 3.5
@@ -1315,9 +1395,9 @@ PyTypeObject PyVariable = {
   tp_getattro : VariableGetAttro,
   tp_setattro : VariableSetAttro,
   tp_as_buffer : nullptr,
-  tp_flags : 0,
+  tp_flags : Py_TPFLAGS_HAVE_GC,
   tp_doc : variable_doc,
-  tp_traverse : nullptr,
+  tp_traverse : VariableTraverse,
   tp_clear : nullptr,
   tp_richcompare : nullptr,
   tp_weaklistoffset : 0,
@@ -1357,8 +1437,14 @@ static struct PyModuleDef typegraph_moduledef = {
 
 static PyObject* InitModule(PyObject* module) {
   PyObject* module_dict = PyModule_GetDict(module);
-  if (PyOrigin.tp_name == 0)
+  if (PyOrigin.tp_name == 0) {
+#if PY_MAJOR_VERSION >= 3
+    if (PyStructSequence_InitType2(&PyOrigin, &origin_desc) < 0)
+      return nullptr;
+#else
     PyStructSequence_InitType(&PyOrigin, &origin_desc);
+#endif
+  }
   PyDict_SetItemString(module_dict, "Program",
                        reinterpret_cast<PyObject*>(&PyProgram));
   PyDict_SetItemString(module_dict, "CFGNode",
@@ -1404,6 +1490,10 @@ static PyObject* InitModule(PyObject* module) {
   k_id = PyString_FromString("id");
   Py_XDECREF(k_next_variable_id);
   k_next_variable_id = PyString_FromString("next_variable_id");
+  Py_XDECREF(k_binding_count);
+  k_binding_count = PyString_FromString("binding_count");
+  Py_XDECREF(k_solver_query_count);
+  k_solver_query_count = PyString_FromString("solver_query_count");
   Py_XDECREF(k_condition);
   k_condition = PyString_FromString("condition");
   Py_XDECREF(k_default_data);
@@ -1411,19 +1501,28 @@ static PyObject* InitModule(PyObject* module) {
   return module;
 }
 
+static bool ReadyTypes() {
+  return (PyType_Ready(&PyProgram) >= 0 &&
+          PyType_Ready(&PyCFGNode) >= 0 &&
+          PyType_Ready(&PyVariable) >= 0 &&
+          PyType_Ready(&PyBinding) >= 0);
+}
+
 #if PY_MAJOR_VERSION >= 3
-PyMODINIT_FUNC PyInit_cfg(void) {
+PyMODINIT_FUNC PyInit_cfg_ext(void) {
+  if (!ReadyTypes())
+    return nullptr;
   PyObject* module = PyModule_Create(&typegraph_moduledef);
+  if (!module)
+    return nullptr;
   return InitModule(module);
 }
 #else
-PyMODINIT_FUNC initcfg(void) {
+PyMODINIT_FUNC initcfg_ext(void) {
   PyObject* module = Py_InitModule3(
       kModuleName, typegraph_methods, typegraph_doc);
-  PyType_Ready(&PyProgram);
-  PyType_Ready(&PyCFGNode);
-  PyType_Ready(&PyVariable);
-  PyType_Ready(&PyBinding);
+  if (!module || !ReadyTypes())
+    return;
   InitModule(module);
 }
 #endif
@@ -0,0 +1,66 @@
+"""Benchmark for the C++ and Python implementations of the typegraph.
+
+Builds the same synthetic program with both implementations: a chain of
+diamond-shaped branches, each of which rebinds a set of variables. Then times
+the queries the solver answers for pytype, i.e. HasCombination, Filter and
+FilteredData at the end of the chain.
+
+Usage:
+  python -m pytype.typegraph.cfg_benchmark
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from pytype.typegraph import cfg
+from pytype.typegraph import cfg_py
+
+
+def _build(module, num_branches, num_variables):
+  """Build a program with num_branches diamonds and num_variables variables."""
+  p = module.Program()
+  node = p.NewCFGNode("root")
+  variables = [p.NewVariable() for _ in range(num_variables)]
+  for i in range(num_branches):
+    left = node.ConnectNew("left%d" % i)
+    right = node.ConnectNew("right%d" % i)
+    for j, v in enumerate(variables):
+      # Make each binding depend on the previous binding of another variable,
+      # so that the solver has to walk back through the graph.
+      source_set = variables[j - 1].bindings[-2:]
+      v.AddBinding((i, j, "left"), source_set=source_set[:1], where=left)
+      v.AddBinding((i, j, "right"), source_set=source_set[1:], where=right)
+    node = left.ConnectNew("join%d" % i)
+    right.ConnectTo(node)
+  return p, node, variables
+
+
+def _query(node, variables):
+  for v in variables:
+    for b in v.Filter(node):
+      node.HasCombination([b])
+    v.FilteredData(node)
+
+
+def main():
+  implementations = [("python", cfg_py)]
+  if cfg.cfg_ext:
+    implementations.append(("c++", cfg.cfg_ext))
+  else:
+    print("cfg_ext is not available, only timing cfg_py.")
+  number = 3
+  for num_branches, num_variables in ((10, 10), (50, 10), (50, 50)):
+    print("%d branches, %d variables:" % (num_branches, num_variables))
+    for name, module in implementations:
+      build = lambda: _build(module, num_branches, num_variables)  # pylint: disable=cell-var-from-loop
+      build_seconds = min(timeit.repeat(build, number=number, repeat=3))
+      _, node, variables = build()
+      query = lambda: _query(node, variables)  # pylint: disable=cell-var-from-loop
+      query_seconds = min(timeit.repeat(query, number=number, repeat=3))
+      print("  %-6s  build %8.2f ms  query %8.2f ms" % (
+          name, build_seconds / number * 1e3, query_seconds / number * 1e3))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,37 @@
+"""Run the cfg tests against both the C++ and the Python typegraph."""
+
+from pytype.typegraph import cfg
+from pytype.typegraph import cfg_py
+from pytype.typegraph import cfg_test
+
+import unittest
+
+
+class _ImplementationMixin(object):
+  """Runs cfg_test.CFGTest with cfg_test.cfg replaced by IMPLEMENTATION."""
+
+  IMPLEMENTATION = None
+
+  def setUp(self):
+    super(_ImplementationMixin, self).setUp()
+    self._cfg = cfg_test.cfg
+    cfg_test.cfg = self.IMPLEMENTATION
+
+  def tearDown(self):
+    cfg_test.cfg = self._cfg
+    super(_ImplementationMixin, self).tearDown()
+
+
+@unittest.skipIf(cfg.cfg_ext is None, "cfg_ext is not available")
+class CFGExtTest(_ImplementationMixin, cfg_test.CFGTest):
+
+  IMPLEMENTATION = cfg.cfg_ext
+
+
+class CFGPyTest(_ImplementationMixin, cfg_test.CFGTest):
+
+  IMPLEMENTATION = cfg_py
+
+
+if __name__ == "__main__":
+  unittest.main()
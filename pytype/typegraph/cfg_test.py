@@ -1,5 +1,8 @@
 """Test for the cfg Python extension module."""
 
+import gc
+import weakref
+
 from pytype.typegraph import cfg
 
 import six
@@ -91,6 +94,20 @@ class CFGTest(unittest.TestCase):
     d.AddBinding("v2", source_set=[], where=node2)
     self.assertEqual(len(d.bindings), 2)
 
+  def testCounts(self):
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    x = p.NewVariable()
+    a = x.AddBinding("a", source_set=[], where=n1)
+    x.AddBinding("b", source_set=[], where=n1)
+    x.AddBinding("a", source_set=[], where=n2)
+    self.assertEqual(p.binding_count, 2)
+    self.assertEqual(p.solver_query_count, 0)
+    a.IsVisible(n2)
+    n2.HasCombination([a])
+    self.assertEqual(p.solver_query_count, 2)
+
   def testHasSource(self):
     p = cfg.Program()
     n0, n1, n2 = p.NewCFGNode("n0"), p.NewCFGNode("n1"), p.NewCFGNode("n2")
@@ -860,6 +877,16 @@ class CFGTest(unittest.TestCase):
     p.default_data = 1
     self.assertEqual(p.default_data, 1)
 
+  def testVariableSizeLimit(self):
+    # Bindings past the size limit all share the program's default_data.
+    p = cfg.Program()
+    n = p.NewCFGNode()
+    v = p.NewVariable()
+    for i in range(100):
+      v.AddBinding(i, [], n)
+    self.assertLess(len(v.bindings), 100)
+    self.assertIn(None, v.FilteredData(n))
+
   def testConditionConflict(self):
     # v1 = x or y or z  # node_in
     # condition = v1 is x  # node_in
@@ -911,6 +938,20 @@ class CFGTest(unittest.TestCase):
     b_out = p.NewVariable().AddBinding("x", [bx], node_out)
     self.assertFalse(b_out.IsVisible(node_out))
 
+  def testCollectCycles(self):
+    # Abstract values point back to the program through their variables.
+    class Data(object):
+      pass
+    p = cfg.Program()
+    n = p.NewCFGNode("n")
+    data = Data()
+    data.variable = p.NewVariable([data], [], n)
+    data.variable.AddBinding(Data(), [], n)
+    ref = weakref.ref(data)
+    del p, n, data
+    gc.collect()
+    self.assertIsNone(ref())
+
 
 if __name__ == "__main__":
   unittest.main()
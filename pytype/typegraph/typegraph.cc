@@ -45,12 +45,15 @@ size_t Program::CountCFGNodes() const { return cfg_nodes_.size(); }
 Program::Program()
     : entrypoint_(nullptr),
       next_variable_id_(0),
+      binding_count_(0),
+      solver_query_count_(0),
       backward_reachability_(memory_util::make_unique<ReachabilityAnalyzer>()),
       default_data_(nullptr) {}
 
 Program::~Program() {}
 
 Solver* Program::GetSolver() {
+  solver_query_count_ += 1;
   if (solver_ == nullptr) solver_ = memory_util::make_unique<Solver>(this);
   return solver_.get();
 }
@@ -220,6 +223,7 @@ Binding* Variable::FindOrAddBinding(void* data) {
   auto it = data_to_binding_.find(data);
   if (it == data_to_binding_.end()) {
     program_->InvalidateSolver();
+    program_->CountBinding();
     auto binding =
         std::unique_ptr<Binding>(new Binding(this->program_, this, data));
     Binding* bp = binding.get();
@@ -60,6 +60,10 @@ class Program {
     return cfg_nodes_;
   }
   size_t next_variable_id() { return next_variable_id_; }
+  // For profiling: the number of bindings created and of solver queries run.
+  size_t binding_count() const { return binding_count_; }
+  size_t solver_query_count() const { return solver_query_count_; }
+  void CountBinding() { binding_count_ += 1; }
   void* default_data() const { return default_data_; }
   void set_default_data(void* new_default) { default_data_ = new_default; }
 
@@ -69,6 +73,7 @@ class Program {
   // For testing purposes. Client code should use GetSolver.
   Solver* solver() { return this->solver_.get(); }
 
+  // Every solver query gets the solver through this method.
   Solver* GetSolver();
   void InvalidateSolver();
 
@@ -77,6 +82,8 @@ class Program {
  private:
   CFGNode* entrypoint_;
   size_t next_variable_id_;
+  size_t binding_count_;
+  size_t solver_query_count_;
   std::unique_ptr<ReachabilityAnalyzer> backward_reachability_;
   // For deallocation, and for node counting:
   std::vector<std::unique_ptr<CFGNode>> cfg_nodes_;
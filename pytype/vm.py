@@ -17,9 +17,11 @@ import re
 
 from pytype import abc_overlay
 from pytype import abstract
+from pytype import analysis_profiler
 from pytype import annotations_util
 from pytype import attribute
 from pytype import blocks
+from pytype import budget
 from pytype import collections_overlay
 from pytype import compare
 from pytype import convert
@@ -31,9 +33,11 @@ from pytype import metrics
 from pytype import six_overlay
 from pytype import special_builtins
 from pytype import state as frame_state
+from pytype import summary_cache
 from pytype import sys_overlay
 from pytype import typing
 from pytype import utils
+from pytype.pyc import bytecode_cache
 from pytype.pyc import loadmarshal
 from pytype.pyc import opcodes
 from pytype.pyc import pyc
@@ -60,7 +64,8 @@ repper = repr_obj.repr
 
 Block = collections.namedtuple("Block", ["type", "op", "handler", "level"])
 
-_opcode_counter = metrics.MapCounter("vm_opcode")
+_opcode_counter = metrics.ArrayCounter(
+    "vm_opcode", [cls.__name__ for cls in opcodes.OPCODE_CLASSES])
 
 # Collection of module overlays, used in _import_module to fetch an overlay
 # instead of the module itself. Memoized in the vm itself.
@@ -154,6 +159,24 @@ class VirtualMachine(object):
     self.filename = None
     self.director = None
     self._analyzing = False  # Are we in self.analyze()?
+    if options.bytecode_cache_dir:
+      self._bytecode_cache = bytecode_cache.BytecodeCache(
+          options.bytecode_cache_dir, options.bytecode_cache_size << 20)
+    else:
+      self._bytecode_cache = None
+    # Summaries would lose the calls and unknowns that the function records.
+    if (options.function_summary_dir and not generate_unknowns and
+        not store_all_calls):
+      self.summary_cache = summary_cache.SummaryCache(
+          options.function_summary_dir)
+    else:
+      self.summary_cache = None
+    self.budget = budget.AnalysisBudget(options.analysis_budget,
+                                        options.function_analysis_budget)
+    if options.analysis_profile or options.analysis_profile_folded:
+      self.profiler = analysis_profiler.AnalysisProfiler(self.program)
+    else:
+      self.profiler = None
 
     # Map from builtin names to canonical objects.
     self.special_builtins = {
@@ -183,17 +206,32 @@ class VirtualMachine(object):
     # Memoize which overlays are loaded.
     self.loaded_overlays = {}
 
+    # The byte_* method of each opcode, indexed by the opcode's INDEX.
+    self._opcode_handlers = [getattr(self, "byte_%s" % cls.__name__, None)
+                             for cls in opcodes.OPCODE_CLASSES]
+
   def lookup_builtin(self, name):
     try:
       return self.loader.builtins.Lookup(name)
     except KeyError:
       return self.loader.typing.Lookup(name)
 
+  def _get_maximum_depth(self):
+    """Get the maximum depth, which is 1 once the analysis budget runs out."""
+    if self.budget.exhausted():
+      return min(self.maximum_depth, 1)
+    return self.maximum_depth
+
   def remaining_depth(self):
-    return self.maximum_depth - len(self.frames)
+    return self._get_maximum_depth() - len(self.frames)
 
   def is_at_maximum_depth(self):
-    return len(self.frames) > self.maximum_depth
+    if len(self.frames) > self.maximum_depth:
+      return True
+    if len(self.frames) > self._get_maximum_depth():
+      self.budget.cut_calls += 1
+      return True
+    return False
 
   def run_instruction(self, op, state):
     """Run a single bytecode instruction.
@@ -208,13 +246,13 @@ class VirtualMachine(object):
       FrameState right after this instruction that should roll over to the
       subsequent instruction.
     """
-    _opcode_counter.inc(op.name)
+    _opcode_counter.inc(op.INDEX)
     self.frame.current_opcode = op
     if log.isEnabledFor(logging.INFO):
       self.log_opcode(op, state)
     try:
       # dispatch
-      bytecode_fn = getattr(self, "byte_%s" % op.name, None)
+      bytecode_fn = self._opcode_handlers[op.INDEX]
       if bytecode_fn is None:
         raise VirtualMachineError("Unknown opcode: %s" % op.name)
       state = bytecode_fn(state, op)
@@ -243,8 +281,11 @@ class VirtualMachine(object):
   def run_frame(self, frame, node):
     """Run a frame (typically belonging to a method)."""
     self.push_frame(frame)
+    if self.profiler:
+      self.profiler.enter(analysis_profiler.get_label(frame.f_code))
     frame.states[frame.f_code.co_code[0]] = frame_state.FrameState.init(node,
                                                                         self)
+    num_opcodes = 0
     can_return = False
     return_nodes = []
     for block in frame.f_code.order:
@@ -257,6 +298,7 @@ class VirtualMachine(object):
       op = None
       for op in block:
         state = self.run_instruction(op, state)
+        num_opcodes += 1
         if state.why:
           # we can't process this block any further
           break
@@ -270,6 +312,8 @@ class VirtualMachine(object):
         state = state.forward_cfg_node()
         frame.states[op.next] = state.merge_into(frame.states.get(op.next))
     self.pop_frame(frame)
+    if self.profiler:
+      self.profiler.exit(num_opcodes)
     if not return_nodes:
       # Happens if the function never returns. (E.g. an infinite loop)
       assert not frame.return_variable.bindings
@@ -624,7 +668,7 @@ class VirtualMachine(object):
     code = pyc.compile_src(
         src, python_version=self.python_version,
         python_exe=self.options.python_exe,
-        filename=filename, mode=mode)
+        filename=filename, mode=mode, cache=self._bytecode_cache)
     return blocks.process_code(code, self.director.type_comments)
 
   def run_bytecode(self, node, code, f_globals=None, f_locals=None):
@@ -661,7 +705,11 @@ class VirtualMachine(object):
           self.filename, line, self.director.type_comments[line][1])
 
     node = self.root_cfg_node.ConnectNew("init")
+    cut_calls = self.budget.cut_calls
     node, f_globals, f_locals, _ = self.run_bytecode(node, code)
+    if self.budget.cut_calls > cut_calls:
+      self.errorlog.analysis_truncated(
+          self.filename, 1, "module-level code", skipped=False)
     logging.info("Done running bytecode, postprocessing globals")
     # Check for abstract methods on non-abstract classes.
     for val, frames in self.concrete_classes:
@@ -0,0 +1,63 @@
+"""Benchmark for the per-opcode overhead of VirtualMachine.run_instruction.
+
+Compares the dispatch table that run_instruction uses to find the byte_*
+method of an opcode and count it with the name-based lookup it replaced.
+
+Usage:
+  python -m pytype.vm_benchmark
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from pytype import config
+from pytype import errors
+from pytype import load_pytd
+from pytype import metrics
+from pytype import vm
+from pytype.pyc import opcodes
+
+
+def _make_opcodes():
+  ops = []
+  for cls in opcodes.OPCODE_CLASSES:
+    if issubclass(cls, opcodes.OpcodeWithArg):
+      ops.append(cls(0, 1, 0, None))
+    else:
+      ops.append(cls(0, 1))
+  return ops
+
+
+def main():
+  options = config.Options.create()
+  loader = load_pytd.create_loader(options)
+  v = vm.VirtualMachine(errors.ErrorLog(), options, loader=loader)
+  ops = _make_opcodes()
+  # pylint: disable=protected-access
+  handlers = v._opcode_handlers
+  array_counter = vm._opcode_counter
+  map_counter = metrics.MapCounter("vm_opcode_by_name")
+
+  def by_name():
+    for op in ops:
+      map_counter.inc(op.name)
+      getattr(v, "byte_%s" % op.name, None)
+
+  def by_index():
+    for op in ops:
+      array_counter.inc(op.INDEX)
+      handlers[op.INDEX]  # pylint: disable=pointless-statement
+
+  number = 2000
+  for enabled in (False, True):
+    metrics._prepare_for_test(enabled=enabled)  # pylint: disable=protected-access
+    print("metrics %s:" % ("enabled" if enabled else "disabled"))
+    for name, f in (("by name", by_name), ("by index", by_index)):
+      seconds = min(timeit.repeat(f, number=number, repeat=5))
+      print("  %-8s  %6.1f ns/opcode" % (
+          name, seconds / number / len(ops) * 1e9))
+
+
+if __name__ == "__main__":
+  main()
@@ -99,6 +99,19 @@ parser_ext = Extension(
 )
 
 
+cfg_ext = Extension(
+    'pytype.typegraph.cfg_ext',
+    sources=[
+        'pytype/typegraph/cfg.cc',
+        'pytype/typegraph/reachable.cc',
+        'pytype/typegraph/solver.cc',
+        'pytype/typegraph/typegraph.cc',
+    ],
+    extra_compile_args=extra_compile_args,
+    extra_link_args=extra_link_args
+)
+
+
 # Read the long-description from a file.
 with io.open(os.path.join(here, 'DESCRIPTION.rst'), encoding='utf-8') as f:
   long_description = '\n' + f.read()
@@ -151,5 +164,5 @@ setup(
         'Programming Language :: Python :: Implementation :: CPython',
         'Topic :: Software Development',
     ],
-    ext_modules=[parser_ext],
+    ext_modules=[parser_ext, cfg_ext],
 )